@@ -5,11 +5,16 @@ from .core import (
     BaseResource,
     ResourceInterface,
     resource,
+    alias,
+    LazyResource,
+    Deadline,
     )
 from .decorators import (
     decorator,
     preprocessor,
     postprocessor,
+    concurrency_limit,
+    rate_limit,
 )
 from .http import (
     Site,
@@ -17,10 +22,26 @@ from .http import (
     PathResolver,
     page,
     )
+from .message import (
+    MessageResolver,
+    RpcResolver,
+    message,
+    page_and_message,
+    procedure,
+    page_and_procedure,
+    )
 from .exceptions import (
     PathRewrite,
     CompletionRedirect,
     )
+from .limits import (
+    ConcurrencyLimit,
+    RateLimit,
+    )
+from .routetable import (
+    RouteTable,
+    RouteTableMixin,
+    )
 from .util import (
     DictResourceMixin,
     )
@@ -32,18 +53,36 @@ __all__ = [
     'BaseResource',
     'ResourceInterface',
     'resource',
+    'alias',
+    'LazyResource',
+    'Deadline',
     # http
     'Site',
     'MethodResolver',
     'PathResolver',
     'page',
+    # message
+    'MessageResolver',
+    'RpcResolver',
+    'message',
+    'page_and_message',
+    'procedure',
+    'page_and_procedure',
     # decorators
     'decorator',
     'preprocessor',
     'postprocessor',
+    'concurrency_limit',
+    'rate_limit',
     # exceptions
     'PathRewrite',
     'CompletionRedirect',
+    # limits
+    'ConcurrencyLimit',
+    'RateLimit',
+    # routetable
+    'RouteTable',
+    'RouteTableMixin',
     # util
     'DictResourceMixin',
     ]
@@ -51,7 +90,13 @@ __all__ = [
 
 class Resource(BaseResource):
     http_resolver = PathResolver()
+    websocket_resolver = MessageResolver()
+    rpc_resolver = RpcResolver()
 
 
 class DictResource(DictResourceMixin, Resource):
     pass
+
+
+class RouteTableResource(RouteTableMixin, Resource):
+    pass
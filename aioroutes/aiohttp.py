@@ -2,33 +2,142 @@ import asyncio
 import logging
 import aiohttp.server
 
-from .http import BaseHTTPRequest, FORM_CONTENT_TYPE
+from .util import cached_slot
+from .http import CompactHTTPRequest, Cookies, StreamingBody
+from .http import FORM_CONTENT_TYPE, split_path
 
 
 log = logging.getLogger(__name__)
 
 
-class Request(BaseHTTPRequest):
+class Request(CompactHTTPRequest):
+    """Request of the aiohttp server
+
+    Headers are taken from ``raw_headers`` of the message when aiohttp
+    provides them, so they are decoded only when looked up.
+    """
+    __slots__ = ('_proto',)
 
     def __init__(self, proto, message):
-        self.uri = message.path
-        self.content_type = message.headers.get('CONTENT-TYPE', None)
-        self.cookie = ''
-        if 'COOKIE' in message.headers:
-            self.cookie = ','.join(message.headers.getall('COOKIE'))
-        super().__init__()
+        self._proto = proto
+        super().__init__(message.method, message.path,
+            getattr(message, 'raw_headers', None) or message.headers,
+            proto.disconnected, proto.remote_addr)
+
+    def reset(self, message):
+        super().reset(message.method, message.path,
+            getattr(message, 'raw_headers', None) or message.headers,
+            self._proto.disconnected, self._proto.remote_addr)
+
+    @cached_slot
+    def cookies(self):
+        return self._proto.get_cookies(self.cookie)
 
 
 class HttpProto(aiohttp.server.ServerHttpProtocol):
+    """Serves the site over HTTP
+
+    When ``websocket_site`` (a :class:`MessageSite`) is passed, requests to
+    ``websocket_path`` are upgraded to websocket and each text message is
+    dispatched by that site.
+
+    With ``recycle_requests=True`` a single request object is reused for all
+    requests of the keep-alive connection. Leaves must not keep the request
+    object after returning in this case.
+    """
 
-    def __init__(self, site, **settings):
+    def __init__(self, site, *, websocket_site=None,
+                 websocket_path='/websocket', recycle_requests=False,
+                 **settings):
         self.__site = site
+        self.__websocket_site = websocket_site
+        self.__websocket_path = websocket_path
+        self.__recycle_requests = recycle_requests
+        self.__request = None
+        self.__cookies = None
+        self.disconnected = asyncio.Future(loop=settings.get('loop'))
+        self.remote_addr = None
         super().__init__(**settings)
 
+    def connection_made(self, transport):
+        peername = transport.get_extra_info('peername')
+        if isinstance(peername, tuple):  # not a unix socket
+            self.remote_addr = peername[0]
+        super().connection_made(transport)
+
+    def connection_lost(self, exc):
+        if not self.disconnected.done():
+            self.disconnected.set_result(None)
+        super().connection_lost(exc)
+
+    def get_cookies(self, header):
+        """Returns parsed cookies, reusing ones from previous request
+
+        Clients usually send exactly the same cookies for every request on
+        the keep-alive connection, so we don't parse them again
+        """
+        cookies = self.__cookies
+        if cookies is None or cookies.header != header:
+            cookies = self.__cookies = Cookies(header)
+        return cookies
+
+    @asyncio.coroutine
+    def handle_websocket(self, req, message):
+        from aiohttp import websocket
+        status, headers, parser, writer = websocket.do_handshake(
+            message.method, message.headers, self.transport)
+        resp = aiohttp.Response(self.writer, status, message.version)
+        resp.add_headers(*headers)
+        resp.send_headers()
+        queue = self.reader.set_parser(parser)
+        conn = self.__websocket_site.connect(req)
+        tasks = set()
+
+        @asyncio.coroutine
+        def reply(data):
+            try:
+                text = yield from conn.handle(data)
+                writer.send(text.decode('utf-8'))
+            except Exception as e:
+                log.exception("Error handling message", exc_info=e)
+
+        try:
+            while True:
+                try:
+                    msg = yield from queue.read()
+                except aiohttp.EofStream:
+                    break
+                if msg.tp == websocket.MSG_PING:
+                    writer.pong()
+                elif msg.tp == websocket.MSG_CLOSE:
+                    writer.close()
+                    break
+                elif msg.tp == websocket.MSG_TEXT:
+                    # messages are processed concurrently, the reply is
+                    # matched to the request by id
+                    task = asyncio.ensure_future(reply(msg.data))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
     @asyncio.coroutine
     def handle_request(self, message, payload):
         try:
-            req = Request(self, message)
+            req = self.__request
+            if req is None:
+                req = Request(self, message)
+                if self.__recycle_requests:
+                    self.__request = req
+            else:
+                req.reset(message)
+            if (self.__websocket_site is not None
+                    and req.path_segments == split_path(self.__websocket_path)
+                    and message.headers.get('UPGRADE', '').lower()
+                        == 'websocket'):
+                yield from self.handle_websocket(req, message)
+                return
             if req.content_type == FORM_CONTENT_TYPE:
                 req.body = yield from payload.read()
             else:
@@ -45,9 +154,26 @@ class HttpProto(aiohttp.server.ServerHttpProtocol):
             if isinstance(headers, dict):
                 headers = headers.items()
             resp.add_headers(*headers)
-            resp.add_header('CONTENT-LENGTH', str(len(data)))
-            resp.send_headers()
-            resp.write(data)
+            if message.method == 'HEAD':
+                # served by GET leaf, so body may be here, but not sent
+                if (not isinstance(data, StreamingBody)
+                        and 'CONTENT-LENGTH' not in resp.headers):
+                    resp.add_header('CONTENT-LENGTH', str(len(data)))
+                resp.send_headers()
+            elif isinstance(data, StreamingBody):
+                resp.enable_chunked_encoding()
+                resp.send_headers()
+                while True:
+                    chunk = yield from data.read()
+                    if not chunk:
+                        break
+                    resp.write(chunk)
+                    yield from self.writer.drain()
+            else:
+                if 'CONTENT-LENGTH' not in resp.headers:
+                    resp.add_header('CONTENT-LENGTH', str(len(data)))
+                resp.send_headers()
+                resp.write(data)
             resp.write_eof()
         except Exception as e:
             log.exception("Exception while processing request", exc_info=e)
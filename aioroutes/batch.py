@@ -0,0 +1,151 @@
+import json
+import asyncio
+
+from . import page, Resource
+from .core import Context
+from .util import cached_property
+from .http import BaseHTTPRequest, FormArguments, StreamingBody, read_body
+from .exceptions import BadRequest
+from .jsonify import default_encoder, JSON_CONTENT_TYPE
+
+
+class SubRequest(BaseHTTPRequest):
+    """Single item of the batch
+
+    Headers, cookies and the disconnection future are the ones of the
+    parent request. The ``args`` are used as form arguments (in addition to
+    the query string of the ``uri``).
+    """
+
+    def __init__(self, parent, method, uri, args=None):
+        self.parent = parent
+        self.method = method
+        self.uri = uri
+        self.content_type = None
+        self.body = b''
+        self.headers = parent.headers
+        self.disconnected = parent.disconnected
+        self.remote_addr = getattr(parent, 'remote_addr', None)
+        if args:
+            self.form_arguments = FormArguments.from_pairs(_pairs(args),
+                self.target[1].encode('utf-8'))
+
+    @cached_property
+    def cookie(self):
+        return getattr(self.parent, 'cookie', '')
+
+    @cached_property
+    def cookies(self):
+        return self.parent.cookies
+
+
+def _pairs(args):
+    for key, value in args.items():
+        if not isinstance(value, list):
+            value = [value]
+        for item in value:
+            if not isinstance(item, str):
+                item = json.dumps(item)
+            yield key, item
+
+
+class BatchResource(Resource):
+    """Resolves many requests in a single round trip
+
+    Mount it anywhere in the site, then POST a JSON array of requests,
+    each is either ``[method, path, args]`` or an object with the same
+    keys::
+
+        [["GET", "/user/1"], {"method": "GET", "path": "/feed",
+                              "args": {"limit": 10}}]
+
+    The response is a JSON array of ``{"status", "headers", "body"}``
+    objects in the same order. JSON bodies are embedded as is, other
+    bodies are strings.
+
+    Sub-requests run concurrently, at most ``concurrency`` at once. They
+    share cookies and request scoped stickers of the batch request, so e.g.
+    the current user is fetched only once. Errors are reported per item.
+    """
+
+    def __init__(self, *, max_items=50, concurrency=8, methods=('GET',)):
+        self.max_items = max_items
+        self.concurrency = concurrency
+        self.methods = frozenset(methods)
+
+    @page
+    def index(self, ctx: Context):
+        body = yield from read_body(ctx.request)
+        try:
+            items = json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise BadRequest()
+        if not isinstance(items, list) or len(items) > self.max_items:
+            raise BadRequest()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = yield from asyncio.gather(*[
+            self.dispatch_item(ctx, semaphore, item) for item in items])
+        return (200, [('Content-Type', JSON_CONTENT_TYPE)],
+                b'[' + b','.join(results) + b']')
+
+    def parse_item(self, item):
+        if isinstance(item, dict):
+            method = item.get('method', 'GET')
+            path = item.get('path')
+            args = item.get('args')
+        elif isinstance(item, list) and 2 <= len(item) <= 3:
+            method, path, *args = item
+            args = args[0] if args else None
+        else:
+            raise BadRequest()
+        if (not isinstance(method, str) or method.upper() not in self.methods
+                or not isinstance(path, str) or not path.startswith('/')
+                or args is not None and not isinstance(args, dict)):
+            raise BadRequest()
+        return method.upper(), path, args
+
+    @asyncio.coroutine
+    def dispatch_item(self, ctx, semaphore, item):
+        site = ctx.site
+        try:
+            method, path, args = self.parse_item(item)
+        except BadRequest as e:
+            result = yield from site.error_page(e)
+        else:
+            yield from semaphore.acquire()
+            try:
+                request = SubRequest(ctx.request, method, path, args)
+                subctx = site._make_context(request)
+                subctx.stickers = ctx.stickers
+                subctx.response_headers = ctx.response_headers
+                result = yield from site._safe_dispatch(request, subctx)
+            finally:
+                semaphore.release()
+        status, headers, body = yield from site.make_response(result)
+        return (yield from self.encode_item(status, headers, body))
+
+    @asyncio.coroutine
+    def encode_item(self, status, headers, body):
+        if isinstance(headers, dict):
+            headers = headers.items()
+        headers = [list(pair) for pair in headers]
+        if isinstance(body, StreamingBody):
+            chunks = []
+            while True:
+                chunk = yield from body.read()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            body = b''.join(chunks)
+        ctype = ''
+        for name, value in headers:
+            if name.lower() == 'content-type':
+                ctype = value.split(';')[0].strip().lower()
+        if ctype != JSON_CONTENT_TYPE:
+            body = default_encoder.encode(body.decode('utf-8', 'replace'))
+        elif not body:
+            body = b'null'
+        return b''.join([
+            b'{"status":', str(status).split()[0].encode('ascii'),
+            b',"headers":', default_encoder.encode(headers),
+            b',"body":', body, b'}'])
@@ -0,0 +1,357 @@
+"""Capture of the real traffic and replaying it against a site
+
+Pass :class:`Capture` to the ``Site`` to record a sample of requests::
+
+    capture = Capture('/var/tmp/traffic.{}.cap'.format(os.getpid()),
+                      sample=0.01)
+    site = Site(resources=[Root()], capture=capture)
+
+Only the shape of the request is kept: method, uri, a few headers, body of
+urlencoded forms (other bodies only by size), the time request came, time
+it was processed and the response status. Values of sensitive query and form
+arguments, headers and cookies are replaced by ``REDACTED`` (see
+:class:`Capture` for the options).
+
+The file is a sequence of records, each is a 4-byte big-endian length
+followed by a :mod:`marshal`'ed tuple (fields of :class:`Record`). The file
+is only appended to, use a file per process.
+
+Then replay it in-process against the site of each build and compare::
+
+    python -m aioroutes.capture replay traffic.cap myapp.main:site \\
+        --output old.lat
+    python -m aioroutes.capture replay traffic.cap myapp.main:site \\
+        --output new.lat
+    python -m aioroutes.capture compare old.lat new.lat
+
+Note that ``marshal`` format may change between python versions, replay with
+the same python version which captured the traffic.
+"""
+import sys
+import time
+import struct
+import random
+import marshal
+import asyncio
+import argparse
+import logging
+import importlib
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode
+
+from .http import FORM_CONTENT_TYPE
+from .testing import Client, LoadReport, PERCENTILES
+
+
+log = logging.getLogger(__name__)
+
+LENGTH = struct.Struct('!I')
+MAX_RECORD_SIZE = 1 << 20
+REDACTED = 'REDACTED'
+CAPTURE_HEADERS = ('Accept', 'Accept-Encoding', 'Accept-Language',
+                   'Content-Type', 'Cookie', 'Authorization',
+                   'If-None-Match', 'X-Requested-With')
+REDACT_HEADERS = ('Authorization',)
+REDACT_COOKIES = True
+REDACT_PARAMS = ('password', 'passwd', 'token', 'secret', 'key',
+                 'api_key', 'access_token', 'session')
+
+Record = namedtuple('Record', ['offset', 'method', 'uri', 'headers',
+                               'body', 'body_size', 'duration', 'status'])
+Record.__doc__ = """A captured request
+
+``offset`` is seconds since the capture started, ``headers`` is a tuple of
+``(name, value)`` pairs, ``body`` is the urlencoded form or ``None`` (then
+``body_size`` is length of the original body), ``duration`` is number of
+seconds the site processed the request (not including sending streaming
+body), ``status`` is the response status as returned by the leaf.
+"""
+
+
+def _redact_pairs(pairs, names):
+    return [(name, REDACTED if name.lower() in names else value)
+            for name, value in pairs]
+
+
+def _redact_cookie(header):
+    cookies = []
+    for item in header.split(';'):
+        name, eq, _ = item.strip().partition('=')
+        cookies.append(name + eq + REDACTED if eq else name)
+    return '; '.join(cookies)
+
+
+class Capture(object):
+    """Writes sampled requests to the file
+
+    :param sample: fraction of requests recorded (chosen at random)
+    :param limit: stop recording after that number of records
+    :param headers: names of headers recorded
+    :param redact_headers: names of headers which values are replaced
+    :param redact_cookies: replace values (but not names) of cookies
+    :param redact_params: names of query and form arguments which values
+        are replaced
+    :param redact: function called with a :class:`Record` after the rest of
+        redaction, returns a (modified) record or ``None`` to skip it
+
+    Records are buffered, call :meth:`close` (or :meth:`flush`) to write
+    them out.
+    """
+
+    def __init__(self, path, *, sample=1.0, limit=None,
+                 headers=CAPTURE_HEADERS, redact_headers=REDACT_HEADERS,
+                 redact_cookies=REDACT_COOKIES, redact_params=REDACT_PARAMS,
+                 redact=None, buffer_size=65536):
+        self.path = path
+        self.rate = sample
+        self.limit = limit
+        self.headers = tuple(headers)
+        self.redact_headers = frozenset(h.lower() for h in redact_headers)
+        self.redact_cookies = redact_cookies
+        self.redact_params = frozenset(p.lower() for p in redact_params)
+        self.redact = redact
+        self.count = 0
+        self.started = time.monotonic()
+        self.file = open(path, 'ab', buffering=buffer_size)
+
+    def sample(self):
+        """Returns ``True`` if the next request should be recorded"""
+        if self.file is None:
+            return False
+        if self.limit is not None and self.count >= self.limit:
+            return False
+        return self.rate >= 1 or random.random() < self.rate
+
+    def begin(self, request):
+        """Remembers the request before it's dispatched
+
+        Uri may be changed by internal redirects, so it's captured first
+        """
+        return (time.monotonic(), getattr(request, 'method', 'GET'),
+                request.uri, getattr(request, 'body', None))
+
+    def finish(self, entry, request, status):
+        """Writes the record of the request processed"""
+        try:
+            self._finish(entry, request, status)
+        except Exception:
+            log.exception("Can't capture request %r", request)
+
+    def _finish(self, entry, request, status):
+        started, method, uri, body = entry
+        duration = time.monotonic() - started
+        headers = getattr(request, 'headers', None) or {}
+        pairs = []
+        for name in self.headers:
+            value = headers.get(name)
+            if value is None:
+                continue
+            if name.lower() in self.redact_headers:
+                value = REDACTED
+            elif self.redact_cookies and name.lower() == 'cookie':
+                value = _redact_cookie(value)
+            pairs.append((name, value))
+        if body is not None and getattr(request, 'content_type',
+                                        None) == FORM_CONTENT_TYPE:
+            body_size = len(body)
+            body = self.redact_query(body.decode('utf-8', 'replace'))
+        else:
+            body = None
+            try:
+                body_size = int(headers.get('Content-Length') or 0)
+            except ValueError:
+                body_size = 0
+        path, qmark, query = uri.partition('?')
+        if query:
+            uri = path + qmark + self.redact_query(query)
+        if not isinstance(status, str):
+            status = int(status)  # e.g. HTTPStatus isn't marshallable
+        record = Record(started - self.started, method, uri, tuple(pairs),
+                        body, body_size, duration, status)
+        if self.redact is not None:
+            record = self.redact(record)
+            if record is None:
+                return
+        self.write(record)
+
+    def redact_query(self, query):
+        if not self.redact_params:
+            return query
+        pairs = parse_qsl(query, keep_blank_values=True)
+        if not any(name.lower() in self.redact_params for name, _ in pairs):
+            return query
+        return urlencode(_redact_pairs(pairs, self.redact_params))
+
+    def write(self, record):
+        data = marshal.dumps(tuple(record))
+        self.file.write(LENGTH.pack(len(data)) + data)
+        self.count += 1
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_records(path):
+    """Yields :class:`Record` objects from the capture file
+
+    An incomplete record at the end of the file (process was killed while
+    writing it) is ignored.
+    """
+    with open(path, 'rb') as f:
+        while True:
+            head = f.read(LENGTH.size)
+            if len(head) < LENGTH.size:
+                return
+            size, = LENGTH.unpack(head)
+            if size > MAX_RECORD_SIZE:
+                raise ValueError("Record of {} bytes in {!r}, file is "
+                                 "corrupted".format(size, path))
+            data = f.read(size)
+            if len(data) < size:
+                return
+            yield Record(*marshal.loads(data))
+
+
+def _request_args(record):
+    body = record.body
+    if body is not None:
+        body = body.encode('utf-8')
+    elif record.body_size:
+        body = b'\0' * record.body_size
+    return {'headers': record.headers, 'body': body}
+
+
+@asyncio.coroutine
+def replay(client, records, *, rate=1.0, concurrency=100):
+    """Sends captured requests with the client, returns the LoadReport
+
+    With ``rate`` requests are sent at the times they were captured,
+    ``rate=2`` sends them twice as fast (note that only a sample was
+    captured, use ``rate=1/sample`` to get the original number of requests
+    per second). Requests are not waiting for each other in this case, the
+    ``concurrency`` of the report is the maximum number of requests in
+    flight. With ``rate=None`` requests are sent as fast as possible by
+    ``concurrency`` workers.
+    """
+    clock = time.perf_counter
+    records = iter(records)
+    if rate is None:
+        report = LoadReport(concurrency)
+        start = clock()
+
+        @asyncio.coroutine
+        def worker():
+            for record in records:
+                yield from report.measure(client, record.method, record.uri,
+                                          **_request_args(record))
+                yield from asyncio.sleep(0)  # same as in testing.load
+
+        yield from asyncio.gather(*[worker() for _ in range(concurrency)])
+        report.seconds = clock() - start
+        return report
+    report = LoadReport(0)
+    tasks = set()
+    start = clock()
+    first = None
+    for record in records:
+        if first is None:
+            first = record.offset
+        delay = start + (record.offset - first) / rate - clock()
+        if delay > 0:
+            yield from asyncio.sleep(delay)
+        task = asyncio.ensure_future(report.measure(client, record.method,
+            record.uri, **_request_args(record)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        report.concurrency = max(report.concurrency, len(tasks))
+    if tasks:
+        yield from asyncio.wait(tasks)
+    report.seconds = clock() - start
+    return report
+
+
+def compare(base, new):
+    """Formats a table comparing two reports of :func:`replay` (or load)"""
+    rows = [('requests', base.count, new.count, '{:.0f}'),
+            ('throughput', base.throughput, new.throughput, '{:.1f}'),
+            ('errors', base.errors, new.errors, '{:.0f}')]
+    for p in PERCENTILES:
+        rows.append(('p{} ms'.format(p), base.percentile(p) * 1000,
+                     new.percentile(p) * 1000, '{:.3f}'))
+    lines = ['{:12s} {:>12s} {:>12s} {:>8s}'.format(
+        '', 'base', 'new', 'change')]
+    for name, a, b, fmt in rows:
+        change = '{:+.1%}'.format(b / a - 1) if a else ''
+        lines.append('{:12s} {:>12s} {:>12s} {:>8s}'.format(
+            name, fmt.format(a), fmt.format(b), change))
+    return '\n'.join(lines)
+
+
+def import_site(target):
+    """Imports ``module:attribute``, calls it if it's not a site"""
+    modname, _, attr = target.partition(':')
+    value = importlib.import_module(modname)
+    for name in attr.split('.') if attr else ():
+        value = getattr(value, name)
+    if not hasattr(value, 'dispatch') and callable(value):
+        value = value()
+    return value
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='python -m aioroutes.capture',
+        description="Shows, replays captured traffic and compares results")
+    sub = ap.add_subparsers(dest='command')
+    sub.required = True
+    show = sub.add_parser('show', help="Print captured records")
+    show.add_argument('file')
+    play = sub.add_parser('replay', help="Replay traffic against the site")
+    play.add_argument('file')
+    play.add_argument('site', help="The site or a factory as module:name")
+    play.add_argument('--rate', type=float, default=1.0,
+        help="Speed relative to the captured traffic (default %(default)s)")
+    play.add_argument('--fast', action='store_true',
+        help="Send requests as fast as possible, ignoring the timing")
+    play.add_argument('--concurrency', type=int, default=100,
+        help="Number of requests in flight with --fast")
+    play.add_argument('--warmup', action='store_true',
+        help="Call Site.warmup() before replaying")
+    play.add_argument('--output', help="Save the report to compare later")
+    cmp = sub.add_parser('compare', help="Compare two saved reports")
+    cmp.add_argument('base')
+    cmp.add_argument('new')
+    options = ap.parse_args(argv)
+
+    if options.command == 'show':
+        for rec in read_records(options.file):
+            print('{:10.3f} {:6s} {} -> {} in {:.1f} ms'.format(rec.offset,
+                rec.method, rec.uri, rec.status, rec.duration * 1000))
+    elif options.command == 'replay':
+        site = import_site(options.site)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            if options.warmup:
+                loop.run_until_complete(site.warmup(trace_memory=False))
+            report = loop.run_until_complete(replay(Client(site),
+                read_records(options.file),
+                rate=None if options.fast else options.rate,
+                concurrency=options.concurrency))
+        finally:
+            loop.close()
+        print(report.format())
+        if options.output:
+            report.save(options.output)
+    else:
+        print(compare(LoadReport.read(options.base),
+                      LoadReport.read(options.new)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
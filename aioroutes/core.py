@@ -1,12 +1,18 @@
 import abc
+import types
+import inspect
 import logging
 import asyncio
+import importlib
+import threading
+from time import monotonic
 from functools import partial
+from urllib.parse import quote
 
 from .util import marker_object
-from .exceptions import OutOfScopeError
+from .exceptions import OutOfScopeError, PathRewrite, GatewayTimeout
 from .scope import Scope
-from .signature import compile_signature
+from .signature import LazySignature, Sticker
 
 
 log = logging.getLogger(__name__)
@@ -14,6 +20,7 @@ log = logging.getLogger(__name__)
 LEAF_KIND = marker_object('leaf')
 RESOURCE_METHOD_KIND = marker_object('resource_method')
 RESOURCE_KIND = marker_object('resource')
+LAZY_KIND = marker_object('lazy')
 GENERIC_SCOPE = Scope('generic')
 
 # Helps to return result ealier, i.e. in preprocessor
@@ -67,6 +74,8 @@ class BaseResolver(metaclass=abc.ABCMeta):
             self._consumed(ctx, val)
         elif kind is RESOURCE_KIND:
             pass
+        elif kind is LAZY_KIND:
+            node = node.load()
         else:
             raise RuntimeError("Wrong kind {!r}".format(kind))
         ctx.resource_path.append(node)
@@ -158,6 +167,10 @@ class ResourceInterface(metaclass=abc.ABCMeta):
     def get_resolver_for_scope(self, scope):
         return getattr(self, scope.name + '_resolver', None)
 
+    def _aio_children(self):
+        """Yields (name, child) pairs for children known without request"""
+        return ()
+
 
 class BaseResource(ResourceInterface):
     _aio_kind = RESOURCE_KIND
@@ -176,13 +189,228 @@ class BaseResource(ResourceInterface):
             return target
         raise OutOfScopeError()
 
+    def _aio_children(self):
+        for name in dir(self):
+            if name.startswith('_'):
+                continue
+            value = inspect.getattr_static(self, name, None)
+            if isinstance(value, alias):
+                yield name, value
+                continue
+            kind = getattr(value, '_aio_kind', None)
+            if kind is None:
+                continue
+            if kind is LEAF_KIND or kind is RESOURCE_METHOD_KIND:
+                value = getattr(self, name)  # bound method
+            yield name, value
+
+
+def walk(resources):
+    """Yields (path, resource) for every resource reachable without request
+
+    Resources returned by resource methods can't be found this way, as well
+    as children of resources with custom ``resolve_local``
+    """
+    seen = set()
+    stack = [((), res) for res in reversed(resources)]
+    while stack:
+        path, node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        yield path, node
+        children = getattr(node, '_aio_children', None)
+        if children is None:
+            continue
+        for name, child in reversed(list(children())):
+            if getattr(child, '_aio_kind', None) is RESOURCE_KIND:
+                stack.append((path + (name,), child))
+
+
+class alias(object):
+    """Makes attribute an alias to another resource or leaf
+
+    The path is either absolute (resolved starting from resources of the
+    site) or relative to the resource that contains alias::
+
+        class Child(Resource):
+            index = alias('page1')
+            old_page = alias('/child/page1')
+
+    When the path can be traversed without a request (i.e. there are no
+    resource methods on the way) the :class:`Site` replaces alias by the
+    target at startup, so it costs nothing. Otherwise absolute aliases fall
+    back to raising :class:`PathRewrite`. Relative aliases in resources
+    the site doesn't know (e.g. returned by resource methods) are resolved
+    on first access and cached in the instance.
+    """
+    name = None
+
+    def __init__(self, path):
+        self.path = path
+
+        def rewrite(owner, *args, **kwargs):
+            raise PathRewrite('/'.join([self.path.rstrip('/')]
+                + [quote(a, safe='') for a in args]))
+        self._rewrite = endpoint(rewrite, scopes=[GENERIC_SCOPE])
+
+    def __repr__(self):
+        return '<alias {!r}>'.format(self.path)
+
+    def __set_name__(self, cls, name):
+        self.name = name
+
+    def _name_in(self, cls):
+        # __set_name__ is called only on python >= 3.6
+        for klass in cls.__mro__:
+            for name, value in vars(klass).items():
+                if value is self:
+                    self.name = name
+                    return name
+        return None
+
+    def __get__(self, owner, cls):
+        if owner is None:
+            return self
+        if self.path.startswith('/'):
+            return types.MethodType(self._rewrite, owner)
+        # relative alias in a resource which is not known to the site
+        target = self.find(owner, ())
+        if target is None:
+            raise RuntimeError("Can't resolve {!r} in {!r}"
+                .format(self, owner))
+        name = self.name or self._name_in(cls)
+        if name is not None and hasattr(owner, '__dict__'):
+            owner.__dict__[name] = target  # instance attribute wins
+        return target
+
+    def bind(self, owner, name, roots):
+        """Replaces alias in the owner by the target if it's found"""
+        target = self.find(owner, roots)
+        if target is None:
+            if not self.path.startswith('/'):
+                raise RuntimeError("Can't resolve {!r} in {!r}"
+                    .format(self, owner))
+            log.debug("%r in %r is resolved at runtime", self, owner)
+            return None
+        owner.__dict__[name] = target
+        return target
+
+    def find(self, owner, roots, _resolving=frozenset()):
+        key = (id(owner), id(self))
+        if key in _resolving:
+            raise RuntimeError("Cyclic alias {!r}".format(self))
+        _resolving = _resolving | {key}
+        segments = [seg for seg in self.path.split('/') if seg]
+        if self.path.startswith('/'):
+            starts = roots
+        else:
+            starts = [owner]
+        for node in starts:
+            target = self._follow(node, segments, roots, _resolving)
+            if target is not None:
+                return target
+        return None
+
+    @staticmethod
+    def _follow(node, segments, roots, resolving):
+        for i, name in enumerate(segments):
+            children = getattr(node, '_aio_children', None)
+            if children is None:
+                return None
+            child = dict(children()).get(name)
+            if isinstance(child, alias):
+                child = child.find(node, roots, resolving)
+            elif isinstance(child, LazyResource):
+                child = child.value  # None unless already loaded
+            kind = getattr(child, '_aio_kind', None)
+            if kind is LEAF_KIND:
+                if i == len(segments) - 1:
+                    return child
+                return None  # we don't know what to do with the tail
+            elif kind is not RESOURCE_KIND:
+                return None  # can't traverse it without a request
+            node = child
+        return node
+
+
+class LazyResource(object):
+    """Resource which is imported and created on first request to it
+
+    The target is ``'module:attribute'``, if attribute is a class it's
+    instantiated with the rest of the arguments::
+
+        class Root(Resource):
+            admin = LazyResource('myapp.admin:Admin')
+
+    It can also be used as a value of :class:`DictResource`. The subtree is
+    created once and shared by all owners. It's indexed by the :class:`Site`
+    (aliases bound, etc.) when loaded, so the first request to the subtree
+    pays for the import and indexing.
+    """
+    _aio_kind = LAZY_KIND
+    _aio_scope = frozenset([GENERIC_SCOPE])
+
+    def __init__(self, target, *args, **kwargs):
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.value = None
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return '<LazyResource {!r}{}>'.format(self.target,
+            '' if self.value is None else ' loaded')
+
+    def subscribe(self, callback):
+        """Calls ``callback(value)`` when (or if already) resource is loaded
+        """
+        with self._lock:
+            if self.value is None:
+                self._listeners.append(callback)
+                return
+        callback(self.value)
+
+    def load(self):
+        value = self.value
+        if value is not None:
+            return value
+        # lock is needed when several threads run event loops (or resolve
+        # in executor), for single loop there is no switch inside
+        with self._lock:
+            if self.value is not None:
+                return self.value
+            modname, _, attr = self.target.partition(':')
+            value = importlib.import_module(modname)
+            for name in attr.split('.') if attr else ():
+                value = getattr(value, name)
+            if isinstance(value, type):
+                value = value(*self.args, **self.kwargs)
+            if getattr(value, '_aio_kind', None) is not RESOURCE_KIND:
+                raise RuntimeError("{!r} is not a resource".format(value))
+            # resource is created once even if some listener fails
+            self.value = value
+            listeners = self._listeners
+            self._listeners = []
+            error = None
+            for callback in listeners:
+                try:
+                    callback(value)
+                except Exception as e:
+                    if error is None:
+                        error = e
+            if error is not None:
+                raise error
+            return value
+
 
 def resource(fun, *, scopes=frozenset([GENERIC_SCOPE])):
     """Decorator to denote a method which returns resource to be traversed"""
     fun = asyncio.coroutine(fun)
     fun._aio_kind = RESOURCE_METHOD_KIND
     fun._aio_scope = frozenset(scopes)
-    fun._aio_sig = compile_signature(fun, partial=True)
+    fun._aio_sig = LazySignature(fun, partial=True)
     return fun
 
 
@@ -193,27 +421,132 @@ def endpoint(fun, *, scopes):
         fun._aio_post = []
     fun._aio_kind = LEAF_KIND
     fun._aio_scope = frozenset(scopes)
-    fun._aio_sig = compile_signature(fun, partial=False)
+    fun._aio_sig = LazySignature(fun, partial=False)
     return fun
 
 
+@Sticker.register
+class Deadline(object):
+    """Time budget of the request
+
+    Use it as a sticker to find out how much time is left for the request,
+    for example to pass a timeout to the database query::
+
+        @page
+        def search(self, q, deadline: Deadline):
+            rows = yield from db.query(q, timeout=deadline.remaining())
+
+    The :class:`Site` cancels request when deadline is reached anyway, this
+    is only useful to avoid starting work which can't be finished in time.
+    """
+
+    def __init__(self, when=None, *, loop=None):
+        self.when = when
+        self.loop = loop
+
+    def remaining(self):
+        """Number of seconds left or None if there is no deadline"""
+        if self.when is None:
+            return None
+        return max(self.when - self.loop.time(), 0.0)
+
+    @property
+    def expired(self):
+        return self.when is not None and self.loop.time() >= self.when
+
+    def check(self):
+        """Raises GatewayTimeout if deadline is already reached"""
+        if self.expired:
+            raise GatewayTimeout()
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        return resolver.deadline
+
+
+NO_DEADLINE = Deadline()
+
+
+@Sticker.register
 class Context(object):
 
-    def __init__(self, request, scope):
+    def __init__(self, request, scope, site=None):
         self.request = request
         self.scope = scope
+        self.site = site
         self.scope_set = frozenset([GENERIC_SCOPE, scope])
         self.resource_path = []
         self.stickers = {}
         self.artifacts = {}
+        # headers added to the response whatever leaf returns, None if the
+        # site can't send headers (messages, rpc calls)
+        self.response_headers = []
         self.args = ()
         self.kwargs = {}
+        self.leaf = None
+        self.phases = []
+        self.deadline = NO_DEADLINE
+        self.aborted = None
+
+    def abort(self, reason, task):
+        """Cancels the request processing task
+
+        The ``reason`` is put into ``aborted`` attribute, so that site can
+        distinguish it from other kinds of cancellation.
+        """
+        if self.aborted is None:
+            self.aborted = reason
+            task.cancel()
 
     def start(self, resource, *args, **kwargs):
         self.resource_path = [resource]
         self.args = args
         self.kwargs = kwargs
+        self.leaf = None
         self.artifacts.clear()
+        self.enter_phase('resolve')
+
+    def enter_phase(self, name):
+        """Marks the start of the next phase of request processing
+
+        Phases are only timestamps, the time spent in phase is calculated
+        when somebody is interested (see :class:`SlowRequestWatchdog`)
+        """
+        self.phases.append((name, monotonic()))
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        return resolver
+
+    @asyncio.coroutine
+    def get_sticker(self, cls):
+        """Returns sticker of class ``cls`` creating it once per request
+
+        Used for stickers having ``request_scoped = True``. While sticker is
+        being created, the future is stored, so that concurrent sub-requests
+        wait for it instead of creating it again.
+        """
+        future = self.stickers.get(cls)
+        if future is not None:
+            if future.done():  # common case, don't suspend
+                return future.result()
+            return (yield from future)
+        future = self.stickers[cls] = asyncio.Future()
+        try:
+            value = yield from cls.create(self)
+        except asyncio.CancelledError:
+            del self.stickers[cls]
+            future.cancel()
+            raise
+        except Exception as e:
+            del self.stickers[cls]
+            future.set_exception(e)
+            future.exception()  # waiters get it, no "never retrieved" log
+            raise
+        future.set_result(value)
+        return value
 
     def set_args(self, args):
         self.args = args
@@ -221,8 +554,19 @@ class Context(object):
     def set_kwargs(self, kwargs):
         self.kwargs = kwargs
 
+    @asyncio.coroutine
+    def check_rate_limits(self, limits):
+        for limit in limits:
+            if isinstance(limit, str):
+                limit = self.site.get_limit(limit)
+            yield from limit.check(self)
+
     @asyncio.coroutine
     def dispatch_resource(self, fun, args, kw):
+        self.enter_phase('resource')
+        rate_limits = getattr(fun, '_aio_rate_limits', None)
+        if rate_limits is not None:
+            yield from self.check_rate_limits(rate_limits)
         owner = fun.__self__
         preproc = getattr(fun, '_aio_pre', ())
         result = None
@@ -250,12 +594,31 @@ class Context(object):
                     resource = yield from fun(*args, **kw)
                     return resource, tail
         else:
+            self.enter_phase('postprocess')
             for proc in fun._aio_post:
                 result = yield from proc(owner, self, result)
             return _INTERRUPT, result
 
     @asyncio.coroutine
     def dispatch_leaf(self, fun, args, kw):
+        rate_limits = getattr(fun, '_aio_rate_limits', None)
+        if rate_limits is not None:
+            yield from self.check_rate_limits(rate_limits)
+        limit = getattr(fun, '_aio_limit', None)
+        if limit is None:
+            return (yield from self._dispatch_leaf(fun, args, kw))
+        if isinstance(limit, str):
+            limit = self.site.get_limit(limit)
+        self.enter_phase('queue')
+        yield from limit.acquire()
+        try:
+            return (yield from self._dispatch_leaf(fun, args, kw))
+        finally:
+            limit.release()
+
+    @asyncio.coroutine
+    def _dispatch_leaf(self, fun, args, kw):
+        self.enter_phase('leaf')
         owner = fun.__self__
         preproc = getattr(fun, '_aio_pre', ())
         result = None
@@ -278,6 +641,7 @@ class Context(object):
                     raise OutOfScopeError(self.scope)
                 else:
                     result = yield from fun(*args, **kw)
+        self.enter_phase('postprocess')
         for proc in fun._aio_post:
             result = yield from proc(owner, self, result)
         return result
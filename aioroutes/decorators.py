@@ -3,6 +3,7 @@ import asyncio
 from functools import partial
 
 from .exceptions import OutOfScopeError
+from .limits import ConcurrencyLimit, RateLimit
 
 
 log = logging.getLogger(__name__)
@@ -78,3 +79,67 @@ def decorator(fun):
         fun._aio_deco_callee = callee
         return fun
     return wrapper
+
+
+def concurrency_limit(limit, **kwargs):
+    """Limits number of simultaneous requests to the leaf
+
+    The ``limit`` is either a number of requests allowed to run at once
+    (other keyword arguments are passed to :class:`ConcurrencyLimit`), an
+    instance of :class:`ConcurrencyLimit` or a name of the limit configured
+    in the :class:`Site`. The latter is useful to share a limit between
+    several leaves::
+
+        site = Site(resources=[Root()], limits={
+            'reports': ConcurrencyLimit(4, queue_size=16, timeout=5),
+        })
+
+        class Root(Resource):
+
+            @concurrency_limit('reports')
+            @page
+            def report(self):
+                ...
+    """
+    if isinstance(limit, int):
+        limit = ConcurrencyLimit(limit, **kwargs)
+    else:
+        assert not kwargs, "Keyword arguments work only for numeric limit"
+    def wrapper(fun):
+        fun._aio_limit = limit
+        return fun
+    return wrapper
+
+
+def rate_limit(limit, burst=None, **kwargs):
+    """Limits rate of requests to the leaf (or resource) per client
+
+    The ``limit`` is either a number of requests per second (other
+    arguments are passed to :class:`RateLimit`), an instance of
+    :class:`RateLimit` or a name of the limit configured in the
+    :class:`Site`::
+
+        class Root(Resource):
+
+            @rate_limit(0.2, burst=5)
+            @page
+            def login(self, name: str, password: str):
+                ...
+
+    Limits are checked before preprocessors, stickers and concurrency limit.
+    Several limits may be applied to the same leaf (e.g. per address and
+    per user), and the limits of the site (see ``rate_limits`` of the
+    :class:`Site`) are checked for every request before resolving it.
+    """
+    if not isinstance(limit, (RateLimit, str)):
+        limit = RateLimit(limit, burst, **kwargs)
+    else:
+        assert burst is None and not kwargs, \
+            "Keyword arguments work only for numeric limit"
+    def wrapper(fun):
+        limits = getattr(fun, '_aio_rate_limits', None)
+        if limits is None:
+            limits = fun._aio_rate_limits = []
+        limits.insert(0, limit)
+        return fun
+    return wrapper
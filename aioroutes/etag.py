@@ -0,0 +1,126 @@
+import re
+import asyncio
+import hashlib
+from functools import partial
+
+from .http import StreamingBody
+from .exceptions import NotModified
+from .decorators import postprocessor, preprocessor
+
+
+ETAG_RE = re.compile(r'\s*(?:(W/)?("[^"]*")|(\*))\s*(?:,|$)')
+ETAG_ARTIFACT = 'etag'
+
+
+def parse_if_none_match(value):
+    """Returns a set of opaque tags (with quotes, without ``W/``)
+
+    The ``*`` is returned as is. Malformed header is treated as absent
+    """
+    if not value:
+        return frozenset()
+    result = set()
+    pos = 0
+    while pos < len(value):
+        m = ETAG_RE.match(value, pos)
+        if m is None or m.end() == pos:
+            return frozenset()
+        result.add(m.group(2) or m.group(3))
+        pos = m.end()
+    return frozenset(result)
+
+
+def matches(request, etag):
+    """Weak comparison of ``If-None-Match`` with the entity tag"""
+    headers = getattr(request, 'headers', None) or {}
+    tags = parse_if_none_match(headers.get('If-None-Match'))
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    return '*' in tags or etag in tags
+
+
+def strong_etag(body):
+    return '"{}"'.format(hashlib.sha1(body).hexdigest())
+
+
+def weak_etag(version):
+    if isinstance(version, bytes):
+        version = version.decode('ascii', 'replace')
+    return 'W/"{}"'.format(str(version).replace('"', ''))
+
+
+def _cache_headers(etag, cache_control):
+    headers = [('ETag', etag)]
+    if cache_control is not None:
+        headers.append(('Cache-Control', cache_control))
+    return headers
+
+
+def etag(fun=None, *, version=None, cache_control=None):
+    """Adds ``ETag`` to the response and answers ``If-None-Match`` with 304
+
+    Without ``version`` the strong tag is the hash of the response body, so
+    the leaf is still run, but the body isn't sent if client has it
+    already. Should be applied after the serializing postprocessor::
+
+        @etag
+        @jsonify
+        @page
+        def feed(self):
+            ...
+
+    With ``version`` the weak tag is made of the value it returns. It's
+    called with the same arguments as a preprocessor (i.e. as the leaf
+    itself, before arguments are converted). When the tag matches, the
+    leaf is not run at all::
+
+        @etag(version=lambda self, resolver, **kw: self.feed_version)
+        @jsonify
+        @page
+        def feed(self):
+            ...
+
+    If ``version`` returns ``None`` the response has no tag. Streaming
+    bodies and responses with status other than 200 are passed as is.
+    """
+    if fun is None:
+        return partial(etag, version=version, cache_control=cache_control)
+
+    if version is not None:
+        version = asyncio.coroutine(version)
+
+        @preprocessor(fun)
+        def check_version(self, resolver, *args, **kwargs):
+            key = yield from version(self, resolver, *args, **kwargs)
+            if key is None:
+                return None
+            tag = weak_etag(key)
+            if matches(resolver.request, tag):
+                raise NotModified(tag, _cache_headers(tag, cache_control)[1:])
+            resolver.artifacts[ETAG_ARTIFACT] = tag
+            return None
+
+    @postprocessor(fun)
+    def add_etag(self, resolver, result):
+        if isinstance(result, (str, bytes)):
+            result = (200, [], result)
+        elif not isinstance(result, (tuple, list)) or len(result) != 3:
+            return result
+        status, headers, body = result
+        if (isinstance(body, StreamingBody)
+                or int(str(status).split()[0]) != 200):
+            return result
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        if isinstance(headers, dict):
+            headers = headers.items()
+        tag = resolver.artifacts.get(ETAG_ARTIFACT)
+        if tag is None:
+            if version is not None:
+                return result  # version is None, don't tag at all
+            tag = strong_etag(body)
+            if matches(resolver.request, tag):
+                raise NotModified(tag, _cache_headers(tag, cache_control)[1:])
+        return (status, list(headers) + _cache_headers(tag, cache_control),
+                body)
+    return fun
@@ -1,4 +1,5 @@
 import abc
+from math import ceil
 
 
 class WebException(Exception):
@@ -9,6 +10,23 @@ class WebException(Exception):
         pass
 
 
+class BadRequest(WebException):
+
+    def default_response(self):
+        return (400,
+                [('Content-Type', 'text/html')],
+                b'<!DOCTYPE html>'
+                b'<html>'
+                    b'<head>'
+                        b'<title>400 Bad Request</title>'
+                    b'</head>'
+                    b'<body>'
+                    b'<h1>400 Bad Request</h1>'
+                    b'</body>'
+                b'</html>'
+                )
+
+
 class Forbidden(WebException):
 
     def default_response(self):
@@ -62,9 +80,18 @@ class NotFound(WebException):
 
 class MethodNotAllowed(WebException):
 
+    def __init__(self, allowed=None):
+        self.allowed = allowed
+
+    def headers(self):
+        headers = [('Content-Type', 'text/html')]
+        if self.allowed is not None:
+            headers.append(('Allow', ', '.join(self.allowed)))
+        return headers
+
     def default_response(self):
         return (405,
-                [('Content-Type', 'text/html')],
+                self.headers(),
                 b'<!DOCTYPE html>'
                 b'<html>'
                     b'<head>'
@@ -77,6 +104,91 @@ class MethodNotAllowed(WebException):
                 )
 
 
+class ServiceUnavailable(WebException):
+
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after
+
+    def headers(self):
+        headers = [('Content-Type', 'text/html')]
+        if self.retry_after is not None:
+            headers.append(('Retry-After',
+                            str(int(ceil(self.retry_after)))))
+        return headers
+
+    def default_response(self):
+        return (503,
+                self.headers(),
+                b'<!DOCTYPE html>'
+                b'<html>'
+                    b'<head>'
+                        b'<title>503 Service Unavailable</title>'
+                    b'</head>'
+                    b'<body>'
+                    b'<h1>503 Service Unavailable</h1>'
+                    b'</body>'
+                b'</html>'
+                )
+
+
+class TooManyRequests(WebException):
+
+    def __init__(self, retry_after=None):
+        self.retry_after = retry_after
+
+    def headers(self):
+        headers = [('Content-Type', 'text/html')]
+        if self.retry_after is not None:
+            headers.append(('Retry-After',
+                            str(int(ceil(self.retry_after)))))
+        return headers
+
+    def default_response(self):
+        return (429,
+                self.headers(),
+                b'<!DOCTYPE html>'
+                b'<html>'
+                    b'<head>'
+                        b'<title>429 Too Many Requests</title>'
+                    b'</head>'
+                    b'<body>'
+                    b'<h1>429 Too Many Requests</h1>'
+                    b'</body>'
+                b'</html>'
+                )
+
+
+class GatewayTimeout(WebException):
+
+    def default_response(self):
+        return (504,
+                [('Content-Type', 'text/html')],
+                b'<!DOCTYPE html>'
+                b'<html>'
+                    b'<head>'
+                        b'<title>504 Gateway Timeout</title>'
+                    b'</head>'
+                    b'<body>'
+                    b'<h1>504 Gateway Timeout</h1>'
+                    b'</body>'
+                b'</html>'
+                )
+
+
+class NotModified(WebException):
+    """Sent when the ``If-None-Match`` header matches the entity tag
+
+    Has no body, only the ``ETag`` and caching headers are sent.
+    """
+
+    def __init__(self, etag, headers=()):
+        self.etag = etag
+        self.extra_headers = list(headers)
+
+    def default_response(self):
+        return (304, [('ETag', self.etag)] + self.extra_headers, b'')
+
+
 class Redirect(WebException):
 
     def __init__(self, location, status_code, status_text=None):
@@ -149,6 +261,5 @@ class PathRewrite(InternalRedirect):
         self.new_path = new_path
 
     def update_request(self, request):
-        request.uri = self.new_path
-        del request.parsed_uri
+        request.set_uri(self.new_path)
 
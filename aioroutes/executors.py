@@ -0,0 +1,346 @@
+import os
+import asyncio
+import tempfile
+import threading
+import importlib
+from functools import wraps
+
+from .limits import ConcurrencyLimit
+
+
+# What to do when all workers of the pool are busy and queue is full
+WAIT = 'wait'  # wait until there is a room in the queue
+REJECT = 'reject'  # return 503 Service Unavailable
+CALLER_RUNS = 'caller_runs'  # run the function in the event loop thread
+
+# Large results of process pool are passed through files in this directory
+SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+_pools = {}
+_preload = {}  # pool name -> set of modules, filled by in_process decorator
+
+
+class BasePool(object):
+    """Common part of thread and process pools
+
+    At most ``max_workers + queue_size`` calls are submitted to the pool at
+    any time, what happens to the call above that is determined by
+    ``policy`` (:data:`WAIT`, :data:`REJECT` or :data:`CALLER_RUNS`).
+    With :data:`WAIT` policy at most ``wait_queue`` requests wait for
+    ``wait_timeout`` seconds, before returning 503 to the client.
+
+    Pool registers itself by name on creation, so it can be referred to by
+    decorators.
+    """
+
+    def __init__(self, name, max_workers, *, queue_size=None,
+                 policy=WAIT, wait_queue=1000, wait_timeout=None,
+                 retry_after=1):
+        if queue_size is None:
+            queue_size = max_workers * 4
+        assert policy in (WAIT, REJECT, CALLER_RUNS), policy
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.policy = policy
+        self.caller_runs = 0
+        self._limit = ConcurrencyLimit(max_workers + queue_size,
+            queue_size=wait_queue if policy == WAIT else 0,
+            timeout=wait_timeout, retry_after=retry_after)
+        self._executor = None
+        _pools[name] = self
+
+    def __repr__(self):
+        return '<{} {!r} running {}/{} queued {}/{}>'.format(
+            self.__class__.__name__, self.name,
+            self.running, self.max_workers,
+            self.queue_depth, self.queue_size)
+
+    @property
+    def pending(self):
+        """Number of calls submitted to the pool and not finished yet"""
+        return self._limit.inflight
+
+    @property
+    def queue_depth(self):
+        """Number of calls submitted to the pool and not started yet"""
+        return max(self._limit.inflight - self.running, 0)
+
+    @property
+    def waiting(self):
+        """Number of calls waiting to be submitted (with WAIT policy)"""
+        return self._limit.queue_depth
+
+    @property
+    def saturation(self):
+        return self._limit.inflight / self._limit.max_inflight
+
+    @property
+    def rejected(self):
+        return self._limit.shed_count + self._limit.timeout_count
+
+    def _finished(self, loop, cfuture):
+        loop.call_soon_threadsafe(self._limit.release)
+
+    def _result(self, value):
+        return value
+
+    def _discard(self, cfuture):
+        """Called when the result of the call is not needed any more"""
+
+    @asyncio.coroutine
+    def run(self, fun, *args, **kwargs):
+        """Runs ``fun`` in the pool and returns its result"""
+        limit = self._limit
+        if (self.policy == CALLER_RUNS
+                and limit.inflight >= limit.max_inflight):
+            self.caller_runs += 1
+            # in_process passes its wrapper, which is a coroutine
+            fun = getattr(fun, '_aio_process_target', fun)
+            return fun(*args, **kwargs)
+        yield from limit.acquire()
+        loop = asyncio.get_event_loop()
+        try:
+            cfuture = self._submit(fun, args, kwargs)
+        except BaseException:
+            limit.release()
+            raise
+        # slot is freed when worker finishes rather than when the request
+        # is done, so cancelled requests are still accounted while running
+        cfuture.add_done_callback(lambda f: self._finished(loop, f))
+        try:
+            value = yield from asyncio.wrap_future(cfuture, loop=loop)
+        except asyncio.CancelledError:
+            # worker may still be running (or the result is already here)
+            cfuture.add_done_callback(self._discard)
+            raise
+        return self._result(value)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+class ThreadPool(BasePool):
+    """Named and bounded pool of threads to run blocking endpoints
+
+    See :class:`BasePool` for the description of arguments::
+
+        ThreadPool('images', max_workers=4, queue_size=16)
+    """
+
+    def __init__(self, name, max_workers=4, **kwargs):
+        super().__init__(name, max_workers, **kwargs)
+        self.running = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def _call(self, fun, args, kwargs):
+        with self._lock:
+            self.running += 1
+        try:
+            return fun(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _submit(self, fun, args, kwargs):
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(self.max_workers)
+        return self._executor.submit(self._call, fun, args, kwargs)
+
+
+class _SharedResult(object):
+    """Bytes passed from worker process through shared memory file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def store(cls, data):
+        fd, path = tempfile.mkstemp(prefix='aioroutes-',
+                                    dir=SHARED_MEMORY_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return cls(path)
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        finally:
+            os.unlink(self.path)
+
+    def unlink(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _preload_modules(modules):
+    for name in modules:
+        importlib.import_module(name)
+
+
+def _process_call(ref, args, kwargs, threshold):
+    module, qualname = ref
+    fun = importlib.import_module(module)
+    for name in qualname.split('.'):
+        fun = getattr(fun, name)
+    fun = getattr(fun, '_aio_process_target', fun)
+    result = fun(*args, **kwargs)
+    if (threshold is not None and isinstance(result, bytes)
+            and len(result) >= threshold):
+        return _SharedResult.store(result)
+    return result
+
+
+class ProcessPool(BasePool):
+    """Named and bounded pool of processes for CPU-bound endpoints
+
+    Function is looked up in the worker by module and qualified name, so it
+    must be defined at the module level (methods of module-level classes
+    are okay). Arguments, including the resource itself, are pickled.
+    Bytes results larger than ``shared_memory_threshold`` are passed back
+    through a file in ``/dev/shm`` instead of a pipe.
+
+    Processes are started on first use. In prefork servers call
+    :meth:`start` in each child after fork, pool created before fork is
+    thrown away in the child anyway. Modules containing endpoints decorated
+    with :func:`in_process` (and ones in ``preload``) are imported when
+    worker process starts.
+    """
+
+    def __init__(self, name, max_workers=None, *, preload=(),
+                 shared_memory_threshold=64*1024, **kwargs):
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        super().__init__(name, max_workers, **kwargs)
+        self.preload = set(preload)
+        self.shared_memory_threshold = shared_memory_threshold
+        if SHARED_MEMORY_DIR is None:
+            self.shared_memory_threshold = None
+        self._pid = None
+
+    @property
+    def running(self):
+        return min(self._limit.inflight, self.max_workers)
+
+    def start(self):
+        """Starts worker processes"""
+        if self._executor is not None and self._pid != os.getpid():
+            self._executor = None  # inherited from parent process by fork
+        if self._executor is not None:
+            return self._executor
+        from concurrent.futures import ProcessPoolExecutor
+        modules = sorted(self.preload | _preload.get(self.name, set()))
+        try:
+            executor = ProcessPoolExecutor(self.max_workers,
+                initializer=_preload_modules, initargs=(modules,))
+        except TypeError:  # python < 3.7
+            executor = ProcessPoolExecutor(self.max_workers)
+            for i in range(self.max_workers):
+                executor.submit(_preload_modules, modules)
+        self._executor = executor
+        self._pid = os.getpid()
+        return executor
+
+    def _submit(self, fun, args, kwargs):
+        return self.start().submit(_process_call,
+            (fun.__module__, fun.__qualname__), args, kwargs,
+            self.shared_memory_threshold)
+
+    def _result(self, value):
+        if isinstance(value, _SharedResult):
+            return value.load()
+        return value
+
+    def _discard(self, cfuture):
+        if cfuture.cancelled() or cfuture.exception() is not None:
+            return
+        value = cfuture.result()
+        if isinstance(value, _SharedResult):
+            value.unlink()
+
+    def shutdown(self, wait=True):
+        if self._pid == os.getpid():
+            super().shutdown(wait=wait)
+        self._executor = None
+
+
+def get_pool(name):
+    """Returns pool by name
+
+    The ``default`` thread pool and ``processes`` process pool are created
+    on demand
+    """
+    try:
+        return _pools[name]
+    except KeyError:
+        if name == 'default':
+            return ThreadPool('default')
+        if name == 'processes':
+            return ProcessPool('processes')
+        raise RuntimeError("No executor pool {!r} configured".format(name))
+
+
+def _check_function(fun):
+    if asyncio.iscoroutinefunction(fun):
+        raise TypeError("{!r} is a coroutine, put executor decorator "
+                        "right above the function definition".format(fun))
+
+
+def in_executor(pool='default'):
+    """Runs the body of the endpoint in the thread pool
+
+    Only the function itself is run in thread, stickers are created and
+    postprocessors are run in the event loop. Decorator must be the
+    innermost one (i.e. right above the ``def``)::
+
+        @page
+        @in_executor(pool='images')
+        def thumbnail(self, image_id: int):
+            return make_thumbnail(image_id)
+    """
+    def decorator(fun):
+        _check_function(fun)
+
+        @wraps(fun)
+        @asyncio.coroutine
+        def wrapper(*args, **kwargs):
+            return (yield from get_pool(pool).run(fun, *args, **kwargs))
+        wrapper._aio_pool = pool
+        return wrapper
+    return decorator
+
+
+def blocking(fun):
+    """Runs the body of the endpoint in the default thread pool"""
+    return in_executor()(fun)
+
+
+def in_process(pool='processes'):
+    """Runs the body of the endpoint in the process pool
+
+    Works like :func:`in_executor` but for :class:`ProcessPool`, see its
+    documentation for restrictions.
+    """
+    def decorator(fun):
+        _check_function(fun)
+        if '<locals>' in fun.__qualname__:
+            raise TypeError("{!r} can't be found by worker process, "
+                            "it must be defined at module level".format(fun))
+        _preload.setdefault(pool, set()).add(fun.__module__)
+
+        @wraps(fun)
+        @asyncio.coroutine
+        def wrapper(*args, **kwargs):
+            return (yield from get_pool(pool).run(wrapper, *args, **kwargs))
+        wrapper._aio_pool = pool
+        wrapper._aio_process_target = fun
+        return wrapper
+    return decorator
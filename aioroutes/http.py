@@ -1,22 +1,32 @@
+import re
 import asyncio
+import inspect
 import logging
 from operator import attrgetter
-from urllib.parse import urlparse, parse_qsl
-from http.cookies import SimpleCookie
+from functools import lru_cache, partial
+from types import MappingProxyType
+from collections.abc import Mapping
+from urllib.parse import urlparse, unquote, unquote_to_bytes
 
-from .util import cached_property
-from .core import Context
+from .util import cached_property, cached_slot, current_task, NOT_CACHED
+from .core import Context, Deadline
 from .core import ValueResolver, HierarchicalResolver
-from .core import Scope, endpoint, resource
+from .core import Scope, endpoint, resource, walk, alias
+from .core import LEAF_KIND, LAZY_KIND, GENERIC_SCOPE
 from .exceptions import NotFound, InternalRedirect, InternalError
 from .exceptions import WebException, OutOfScopeError, MethodNotAllowed
+from .exceptions import GatewayTimeout
 from .request import BaseRequest
+from .reverse import Reverser
+from .signature import LazySignature
 
 
 log = logging.getLogger(__name__)
 
 HTTP = Scope('http')
 FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+PATH_CACHE_SIZE = 1024
+COOKIE_ESCAPE_RE = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))')
 
 
 class PathResolver(HierarchicalResolver):
@@ -28,23 +38,80 @@ class PathResolver(HierarchicalResolver):
 
     @staticmethod
     def get_path(ctx):
-        path = ctx.request.parsed_uri.path.strip('/')
-        if path:
-            path = path.split('/')
-        else:
-            path = []
-        return path
+        return list(ctx.request.path_segments)
+
 
+class AllowTable(object):
+    """Methods allowed by the resource, see :class:`MethodResolver`"""
+
+    def __init__(self, leaves):
+        self.names = {name: name for name in leaves}
+        if 'GET' in self.names and 'HEAD' not in self.names:
+            self.names['HEAD'] = 'GET'
+        self.methods = tuple(sorted(set(self.names) | {'OPTIONS'}))
+        self.header = ', '.join(self.methods)
+
+    @classmethod
+    def from_class(cls, resource_class, scope_set):
+        leaves = []
+        for name in dir(resource_class):
+            if not name.isupper() or not name.isidentifier():
+                continue
+            value = inspect.getattr_static(resource_class, name, None)
+            scope = getattr(value, '_aio_scope', None)
+            if (getattr(value, '_aio_kind', None) is not None
+                    and scope is not None and scope.intersection(scope_set)):
+                leaves.append(name)
+        return cls(leaves)
 
 
 class MethodResolver(ValueResolver):
+    """Resolves the method of the request to the leaf of the same name
+
+    Leaves are named by the method in upper case (``GET``, ``POST``...).
+    The :class:`AllowTable` is built once per resource class, so ``OPTIONS``
+    is answered without trying to resolve. Methods missing in the table are
+    still looked up by ``resolve_local`` (resource may provide leaves
+    dynamically) and 405 with the ``Allow`` header is returned if there is
+    no leaf. ``HEAD`` is served by the ``GET`` leaf unless there is a
+    ``HEAD`` one. The server doesn't send the body in this case, but the
+    leaf may check ``request.method == 'HEAD'`` and skip building the body,
+    returning only the ``Content-Length`` header.
+    """
+
+    def __init__(self):
+        self._tables = {}
 
     def get_value(self, ctx):
         return ctx.request.method.upper()
 
+    def get_allow_table(self, ctx):
+        return self.allow_table(type(ctx.resource_path[-1]), ctx.scope_set)
+
+    def allow_table(self, resource_class, scope_set):
+        key = resource_class, scope_set
+        table = self._tables.get(key)
+        if table is None:
+            table = AllowTable.from_class(resource_class, scope_set)
+            self._tables[key] = table
+        return table
+
+    def warmup(self, resource, scope):
+        self.allow_table(type(resource), frozenset([GENERIC_SCOPE, scope]))
+
+    @asyncio.coroutine
+    def resolve(self, ctx):
+        table = self.get_allow_table(ctx)
+        method = self.get_value(ctx)
+        name = table.names.get(method)
+        if name is None:
+            if method == 'OPTIONS':
+                return (200, [('Allow', table.header)], b'')
+            name = method  # child_not_found raises 405 if there is no leaf
+        return (yield from self._base_resolve(ctx, name))
+
     def child_not_found(self, ctx, name):
-        # TODO(tailhook) enumerate allowed methods
-        raise MethodNotAllowed()
+        raise MethodNotAllowed(self.get_allow_table(ctx).methods)
 
 
 def http_resource(fun):
@@ -57,18 +124,164 @@ def page(fun):
     return endpoint(fun, scopes=[HTTP])
 
 
+class StreamingBody(object):
+    """Response body which is sent to the client chunk by chunk
+
+    Return it instead of bytes in the ``(status, headers, body)`` triple.
+    The server calls :meth:`read` until it returns an empty bytes object
+    and sends each chunk as soon as it's ready, using chunked transfer
+    encoding. Subclasses override :meth:`read`, or just pass an iterable
+    of bytes to constructor.
+    """
+
+    def __init__(self, chunks=()):
+        self._chunks = iter(chunks)
+
+    @asyncio.coroutine
+    def read(self):
+        for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return b''
+
+
 class Site(object):
     site_scope = HTTP
     positional_arguments_factory = staticmethod(PathResolver.get_path)  # sorry
     keyword_arguments_factory = attrgetter('request.form_arguments')
     context_factory = Context
 
-    def __init__(self, *, resources=()):
+    def __init__(self, *, resources=(), watchdog=None, limits=None,
+                 timeout=None, timeout_header=None, capture=None,
+                 rate_limits=()):
         self.resources = resources
+        self.watchdog = watchdog
+        # a sample of requests is written to the capture for replaying
+        # later, see aioroutes.capture
+        self.capture = capture
+        self.limits = dict(limits or ())
+        # RateLimit objects checked for every request before resolving it
+        self.rate_limits = list(rate_limits)
+        # request is cancelled with 504 Gateway Timeout when it's running
+        # for more than timeout seconds, client may ask for lower timeout
+        # by sending the number of seconds in the timeout_header
+        self.timeout = timeout
+        self.timeout_header = timeout_header
+        # number of times request was resolved again because of
+        # InternalRedirect (i.e. PathRewrite that is not resolved statically)
+        self.redispatch_count = 0
+        for path, res in walk(self.resources):
+            self._index_resource(path, res)
+
+    def _index_resource(self, path, resource):
+        """Prepares resource found at ``path`` for serving requests"""
+        children = getattr(resource, '_aio_children', None)
+        if children is None:
+            return
+        for name, child in children():
+            if isinstance(child, alias):
+                child.bind(resource, name, self.resources)
+                continue
+            kind = getattr(child, '_aio_kind', None)
+            # fail early on misconfiguration of named limits
+            for limit in getattr(child, '_aio_rate_limits', ()):
+                if isinstance(limit, str):
+                    self.get_limit(limit)
+            if kind is LEAF_KIND:
+                limit = getattr(child, '_aio_limit', None)
+                if isinstance(limit, str):
+                    self.get_limit(limit)
+            elif kind is LAZY_KIND:
+                child.subscribe(partial(self._index_subtree, path + (name,)))
+
+    def compile_signatures(self):
+        """Compiles signatures of all statically known leaves and resources
+
+        Signatures are compiled on the first call by default, call this
+        in master process before fork (or at warmup) so the first requests
+        don't pay for it. Returns number of signatures compiled.
+        """
+        count = 0
+        for path, res in walk(self.resources):
+            children = getattr(res, '_aio_children', None)
+            if children is None:
+                continue
+            for name, child in children():
+                sig = getattr(child, '_aio_sig', None)
+                if isinstance(sig, LazySignature):
+                    sig.compile()
+                    count += 1
+        return count
 
     @asyncio.coroutine
-    def _resolve(self, request):
-        ctx = self.context_factory(request, self.site_scope)
+    def warmup(self, urls=(), *, load_lazy=True, trace_memory=True):
+        """Prepares the site to serve requests at full speed
+
+        Loads lazy subtrees, compiles signatures, builds indexes (url
+        builders, allow tables), then dispatches ``urls`` (strings or
+        request objects) to fill in caches. Returns
+        :class:`~aioroutes.warmup.WarmupReport` of the time and memory spent
+        per phase and per subtree::
+
+            report = yield from site.warmup(['/', '/news'])
+            log.info("Warmup:\n%s", report.format())
+
+        Call it before accepting connections (e.g. in master process before
+        forking workers).
+        """
+        from .warmup import warmup
+        return (yield from warmup(self, urls, load_lazy=load_lazy,
+                                  trace_memory=trace_memory))
+
+    def warmup_request(self, uri):
+        """Makes a request object to replay ``uri`` at :meth:`warmup`"""
+        from .warmup import WarmupRequest
+        return WarmupRequest(uri)
+
+    @cached_property
+    def reverser(self):
+        return Reverser(self.resources, self.site_scope)
+
+    def url_for(self, target, *args, **kwargs):
+        """Builds url for the leaf with the arguments
+
+        The ``target`` is a (bound) leaf method, a resource (url of its index
+        page), or a path of the leaf. Required positional arguments of the
+        leaf are put in the path, others into the query string::
+
+            site.url_for(root.forum.topic, 123, page=2)
+            # -> '/forum/topic/123?page=2'
+            site.url_for('/forum/topic', 123)
+
+        Builders are compiled on first use, use :meth:`url_builder` to skip
+        the lookup in a tight loop.
+        """
+        return self.reverser.builder(target)(*args, **kwargs)
+
+    def url_builder(self, target):
+        """Returns function which builds url for the target from arguments
+        """
+        return self.reverser.builder(target)
+
+    def _index_subtree(self, path, resource):
+        for subpath, res in walk([resource]):
+            self._index_resource(path + subpath, res)
+
+    def get_limit(self, name):
+        """Returns concurrency limit configured for the site by name"""
+        try:
+            return self.limits[name]
+        except KeyError:
+            raise RuntimeError("No concurrency limit {!r} configured"
+                .format(name))
+
+    def _make_context(self, request):
+        return self.context_factory(request, self.site_scope, site=self)
+
+    @asyncio.coroutine
+    def _resolve(self, request, ctx=None):
+        if ctx is None:
+            ctx = self._make_context(request)
         for i in self.resources:
             ctx.start(i,
                 *self.positional_arguments_factory(ctx),
@@ -82,24 +295,90 @@ class Site(object):
         else:
             raise NotFound()
 
-    def _safe_dispatch(self, request):
-        while True:
+    def get_timeout(self, request):
+        """Returns time budget of the request in seconds or None"""
+        timeout = self.timeout
+        if self.timeout_header is not None:
+            value = getattr(request, 'headers', {}).get(self.timeout_header)
             try:
-                result = yield from self._resolve(request)
-            except InternalRedirect as e:
-                e.update_request(request)
-                continue
-            except Exception as e:
-                if not isinstance(e, WebException):
-                    log.exception("Can't process request %r", request)
-                    e = InternalError(e)
+                value = float(value) if value else None
+            except ValueError:
+                value = None
+            if value is not None and value > 0:
+                if timeout is None or value < timeout:
+                    timeout = value
+        return timeout
+
+    def _arm(self, ctx, request):
+        """Starts watching request, returns list of functions to stop it"""
+        stop = []
+        if self.watchdog is not None:
+            timer = self.watchdog.watch(ctx)
+            if timer is not None:
+                stop.append(timer.cancel)
+        timeout = self.get_timeout(request)
+        disconnected = getattr(request, 'disconnected', None)
+        if timeout is None and disconnected is None:
+            return stop
+        loop = asyncio.get_event_loop()
+        task = current_task(loop=loop)
+        if task is None:
+            return stop
+        if timeout is not None:
+            ctx.deadline = Deadline(loop.time() + timeout, loop=loop)
+            stop.append(loop.call_at(ctx.deadline.when,
+                ctx.abort, 'deadline', task).cancel)
+        if disconnected is not None:
+            def callback(fut):
+                ctx.abort('disconnected', task)
+            disconnected.add_done_callback(callback)
+            stop.append(partial(disconnected.remove_done_callback, callback))
+        return stop
+
+    @asyncio.coroutine
+    def _safe_dispatch(self, request, ctx=None):
+        if ctx is None:
+            ctx = self._make_context(request)
+        stop = self._arm(ctx, request)
+        rate_limits = self.rate_limits  # not checked again on redispatch
+        try:
+            while True:
                 try:
-                    return (yield from self.error_page(e))
-                except Exception:
-                    log.exception("Can't make error page for %r", e)
-                    return e.default_response()
-            else:
-                return result
+                    if rate_limits:
+                        yield from ctx.check_rate_limits(rate_limits)
+                        rate_limits = ()
+                    result = yield from self._resolve(request, ctx)
+                except InternalRedirect as e:
+                    self.redispatch_count += 1
+                    # request scoped stickers (e.g. session) are kept, they
+                    # don't depend on the uri
+                    e.update_request(request)
+                    continue
+                except asyncio.CancelledError:
+                    if ctx.aborted is None:
+                        raise
+                    task = current_task()
+                    if hasattr(task, 'uncancel'):  # python >= 3.11
+                        task.uncancel()
+                    log.debug("Request %r is aborted: %s",
+                        request, ctx.aborted)
+                    error = GatewayTimeout()
+                except Exception as e:
+                    if not isinstance(e, WebException):
+                        log.exception("Can't process request %r", request)
+                        e = InternalError(e)
+                    error = e
+                else:
+                    return result
+                break
+        finally:
+            for fun in stop:
+                fun()
+        try:
+            return (yield from self.error_page(error))
+        except Exception:
+            log.exception("Can't make error page for %r", error)
+            return error.default_response()
 
     @asyncio.coroutine
     def error_page(self, e):
@@ -107,14 +386,32 @@ class Site(object):
 
     @asyncio.coroutine
     def dispatch(self, req):
-        result = yield from self._safe_dispatch(req)
+        ctx = self._make_context(req)
+        capture = self.capture
+        entry = None
+        if capture is not None and capture.sample():
+            entry = capture.begin(req)
+        result = yield from self._safe_dispatch(req, ctx)
+        result = yield from self.make_response(result)
+        if ctx.response_headers:  # e.g. cookie set by session sticker
+            status, headers, body = result
+            if isinstance(headers, dict):
+                headers = headers.items()
+            result = [status, list(headers) + ctx.response_headers, body]
+        if entry is not None:
+            capture.finish(entry, req, result[0])
+        return result
+
+    @asyncio.coroutine
+    def make_response(self, result):
+        """Converts the value returned by the leaf to a response triple"""
         responsemeth = getattr(result, 'http_response', None)
         if responsemeth is not None:
             if asyncio.iscoroutinefunction(responsemeth):
                 result = yield from responsemeth()
             else:
                 result = result.http_response()
-        if isinstance(result, (str, bytes)):
+        if isinstance(result, (str, bytes, StreamingBody)):
             if isinstance(result, str):
                 result = result.encode('utf-8')
             result = [200, (), result]
@@ -126,6 +423,51 @@ class Site(object):
         return result
 
 
+@asyncio.coroutine
+def read_body(request):
+    """Returns the body of the request, reading the payload if needed
+
+    Only urlencoded forms are read by the server before dispatching
+    """
+    body = getattr(request, 'body', None)
+    if body is None:
+        payload = getattr(request, 'payload', None)
+        if payload is None:
+            body = b''
+        else:
+            body = yield from payload.read()
+        request.body = body
+    return body
+
+
+def split_target(uri):
+    """Splits request target into path and query string
+
+    It's much cheaper than ``urlparse`` for the usual origin-form targets
+    like ``/path?query``, other forms are passed to ``urlparse`` anyway.
+    """
+    if not uri.startswith('/'):
+        parsed = urlparse(uri)
+        return parsed.path, parsed.query
+    if '#' in uri:
+        uri = uri.partition('#')[0]
+    path, _, query = uri.partition('?')
+    return path, query
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def split_path(path):
+    """Returns tuple of percent-decoded path segments
+
+    Results are cached as paths of hot urls are the same for many requests
+    """
+    path = path.strip('/')
+    if not path:
+        return ()
+    return tuple(unquote(seg) if '%' in seg else seg
+                 for seg in path.split('/'))
+
+
 class LegacyMultiDict(object):
     """Utilitary class which wrap dict to make it suitable for old utilities
     like wtforms"""
@@ -156,6 +498,170 @@ class LegacyMultiDict(object):
         return len(self._dic)
 
 
+class FormArguments(Mapping):
+    """Query string and urlencoded form arguments, parsed lazily
+
+    Raw data is split into pairs on first access, values are percent-decoded
+    only when looked up. Like a dict it returns the last value for the key,
+    use :meth:`getlist` to get all of them (so it can be used in place of
+    :class:`LegacyMultiDict`)
+    """
+
+    def __init__(self, query=b'', body=b'', encoding='utf-8'):
+        self.encoding = encoding
+        self._query = query
+        self._body = body
+        self._keys = None
+        self._values = None
+        self._index = None
+
+    def _parse(self):
+        keys = []
+        values = []
+        index = {}
+        for data in (self._query, self._body):
+            if not data:
+                continue
+            for pair in data.split(b'&'):
+                key, _, value = pair.partition(b'=')
+                if not value:
+                    continue  # blank values are skipped just like parse_qsl
+                key = self._decode(key)
+                index[key] = len(values)
+                keys.append(key)
+                values.append(value)
+        self._query = self._body = None
+        self._keys = keys
+        self._values = values
+        self._index = index
+        return index
+
+    def _decode(self, raw):
+        if b'+' in raw:
+            raw = raw.replace(b'+', b' ')
+        if b'%' in raw:
+            raw = unquote_to_bytes(raw)
+        return raw.decode(self.encoding, 'replace')
+
+    def _value(self, i):
+        value = self._values[i]
+        if isinstance(value, bytes):
+            value = self._values[i] = self._decode(value)
+        return value
+
+    def __getitem__(self, k):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return self._value(index[k])
+
+    def __contains__(self, k):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return k in index
+
+    def __iter__(self):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return iter(index)
+
+    def __len__(self):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return len(index)
+
+    @classmethod
+    def from_pairs(cls, pairs, query=b''):
+        """Arguments from already decoded pairs (and optional query string)
+        """
+        self = cls(query)
+        self._parse()
+        for key, value in pairs:
+            self._index[key] = len(self._values)
+            self._keys.append(key)
+            self._values.append(value)
+        return self
+
+    def getlist(self, k):
+        if k not in self:
+            raise KeyError(k)
+        return [self._value(i) for i, key in enumerate(self._keys)
+                if key == k]
+
+
+def _cookie_unescape(match):
+    octal, char = match.groups()
+    if octal:
+        return chr(int(octal, 8))
+    return char
+
+
+class Cookies(Mapping):
+    """Cookies sent by client, parsed lazily
+
+    The header is split into names and raw values on first access, values
+    are unquoted only when looked up. The object is read-only, so it may be
+    shared between the requests having exactly the same ``Cookie`` header.
+    """
+
+    def __init__(self, header):
+        self.header = header
+        self._values = None
+        self._index = None
+        self._decoded = {}
+
+    def _parse(self):
+        values = []
+        index = {}
+        for pair in self.header.split(';'):
+            name, eq, value = pair.partition('=')
+            if not eq:
+                continue
+            name = name.strip()
+            if not name:
+                continue
+            index[name] = len(values)  # last one wins like in SimpleCookie
+            values.append(value)
+        self._values = values
+        self._index = index
+        return index
+
+    def __getitem__(self, name):
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+        index = self._index
+        if index is None:
+            index = self._parse()
+        value = self._values[index[name]].strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = COOKIE_ESCAPE_RE.sub(_cookie_unescape, value[1:-1])
+        self._decoded[name] = value
+        return value
+
+    def __contains__(self, name):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return name in index
+
+    def __iter__(self):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return iter(index)
+
+    def __len__(self):
+        index = self._index
+        if index is None:
+            index = self._parse()
+        return len(index)
+
+
 class BaseHTTPRequest(BaseRequest):
     """Base request object
 
@@ -167,38 +673,187 @@ class BaseHTTPRequest(BaseRequest):
     * cookie: str
     * body: bytes (used only for form-urlencoded content-type)
 
+    Optionally it may populate:
+    * headers: mapping of request headers
+    * disconnected: future which is done when client closes connection
+    * remote_addr: address of the client (used for rate limits)
+
     """
+    __slots__ = ()  # subclasses without slots have __dict__ as usual
+    headers = MappingProxyType({})
+    disconnected = None
+    remote_addr = None
+
+    # properties which must be recalculated when uri is changed
+    uri_properties = ('parsed_uri', 'target', 'path_segments')
+
+    def set_uri(self, uri):
+        self.uri = uri
+        for name in self.uri_properties:
+            self.__dict__.pop(name, None)
 
     @cached_property
     def parsed_uri(self):
         return urlparse(self.uri)
 
+    @cached_property
+    def target(self):
+        """A (path, query) pair"""
+        return split_target(self.uri)
+
+    @cached_property
+    def path_segments(self):
+        return split_path(self.target[0])
+
     @cached_property
     def form_arguments(self):
-        arguments = {}
+        query = b''
         if hasattr(self, 'uri'):
-            arguments.update(parse_qsl(self.parsed_uri.query))
+            query = self.target[1].encode('utf-8')
         body = getattr(self, 'body', None)
-        if body and self.content_type == FORM_CONTENT_TYPE:
-            arguments.update(parse_qsl(self.body.decode('ascii')))
-        return arguments
+        if not body or self.content_type != FORM_CONTENT_TYPE:
+            body = b''
+        return FormArguments(query, body)
 
-    @cached_property
+    @property
     def legacy_arguments(self):
-        arguments = LegacyMultiDict()
-        if hasattr(self, 'uri'):
-            arguments.update(parse_qsl(self.parsed_uri.query))
-        body = getattr(self, 'body', None)
-        if body and self.content_type == FORM_CONTENT_TYPE:
-            arguments.update(parse_qsl(self.body.decode('ascii')))
-        return arguments
+        return self.form_arguments
 
     @cached_property
     def cookies(self):
-        cobj = SimpleCookie(self.cookie)
-        return dict((k, cobj[k].value) for k in cobj)
+        return Cookies(self.cookie)
 
     @classmethod
     @asyncio.coroutine
     def create(cls, resolver):
         return resolver.request
+
+
+def _latin1(value):
+    if isinstance(value, bytes):
+        return value.decode('latin-1')
+    return value
+
+
+class RawHeaders(Mapping):
+    """Request headers kept as received, decoded on access
+
+    The ``pairs`` is a sequence of ``(name, value)`` pairs, either bytes or
+    strings. Lookup is case-insensitive. There is no index, a request has
+    just a few headers and only a couple of them are looked up, so scanning
+    is cheaper than building a dict (and keeps no extra memory). Only the
+    values looked up are decoded. When header is repeated the first value
+    is returned, use :meth:`getall` to get all of them.
+    """
+    __slots__ = ('pairs', '_bytes')
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self._bytes = bool(pairs) and isinstance(pairs[0][0], bytes)
+
+    def _matching(self, name):
+        key = name.lower()
+        if self._bytes:
+            key = key.encode('latin-1')
+        size = len(key)
+        for pname, value in self.pairs:
+            if len(pname) == size and pname.lower() == key:
+                yield value
+
+    def __getitem__(self, name):
+        for value in self._matching(name):
+            return _latin1(value)
+        raise KeyError(name)
+
+    def __contains__(self, name):
+        if not isinstance(name, str):
+            return False
+        for _ in self._matching(name):
+            return True
+        return False
+
+    def _names(self):
+        seen = set()
+        for name, _ in self.pairs:
+            name = _latin1(name).lower()
+            if name not in seen:
+                seen.add(name)
+                yield name
+
+    def __iter__(self):
+        return self._names()
+
+    def __len__(self):
+        return sum(1 for _ in self._names())
+
+    def getall(self, name, default=()):
+        result = [_latin1(value) for value in self._matching(name)]
+        return result or default
+
+
+class CompactHTTPRequest(BaseHTTPRequest):
+    """Request object with slots instead of ``__dict__``
+
+    Headers are kept raw (see :class:`RawHeaders`), ``content_type``,
+    ``cookie`` and everything else are calculated on first access. No
+    attributes can be added to the object (except ``body`` and ``payload``
+    which are ``None`` until set by server).
+
+    The server may reuse the object for the next request on the same
+    connection by calling :meth:`reset`. So leaf must not keep the request
+    after it returned (copy values it needs instead).
+    """
+    __slots__ = ('method', 'uri', 'raw_headers', 'disconnected',
+                 'remote_addr', 'body', 'payload',
+                 '_headers', '_content_type', '_cookie', '_cookies',
+                 '_parsed_uri', '_target', '_path_segments', '_form_arguments')
+
+    def __init__(self, method, uri, raw_headers=(), disconnected=None,
+                 remote_addr=None):
+        self.method = method
+        self.uri = uri
+        self.raw_headers = raw_headers
+        self.disconnected = disconnected
+        self.remote_addr = remote_addr
+        self.body = None
+        self.payload = None
+        self._headers = self._content_type = NOT_CACHED
+        self._cookie = self._cookies = NOT_CACHED
+        self._parsed_uri = self._target = self._path_segments = NOT_CACHED
+        self._form_arguments = NOT_CACHED
+
+    def reset(self, method, uri, raw_headers=(), disconnected=None,
+              remote_addr=None):
+        """Prepares object to be used for the next request"""
+        CompactHTTPRequest.__init__(self, method, uri, raw_headers,
+                                    disconnected, remote_addr)
+
+    def set_uri(self, uri):
+        self.uri = uri
+        for name in self.uri_properties:
+            setattr(self, '_' + name, NOT_CACHED)
+
+    parsed_uri = cached_slot(BaseHTTPRequest.parsed_uri.function)
+    target = cached_slot(BaseHTTPRequest.target.function)
+    path_segments = cached_slot(BaseHTTPRequest.path_segments.function)
+    form_arguments = cached_slot(BaseHTTPRequest.form_arguments.function)
+    cookies = cached_slot(BaseHTTPRequest.cookies.function)
+
+    @cached_slot
+    def headers(self):
+        raw = self.raw_headers
+        if isinstance(raw, Mapping):  # already parsed by the server
+            return raw
+        return RawHeaders(raw)
+
+    @cached_slot
+    def content_type(self):
+        return self.headers.get('Content-Type')
+
+    @cached_slot
+    def cookie(self):
+        headers = self.headers
+        getall = getattr(headers, 'getall', None)
+        if getall is not None:
+            return '; '.join(getall('Cookie', ()))
+        return headers.get('Cookie', '')
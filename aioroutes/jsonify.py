@@ -0,0 +1,165 @@
+import json
+import asyncio
+from functools import partial
+from http.client import responses
+
+from .util import marker_object
+from .http import StreamingBody
+from .decorators import postprocessor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_CONTENT_TYPE = 'application/json'
+STREAM_CHUNK_SIZE = 64*1024
+
+_END = marker_object('END')
+
+
+class JSONEncoder(object):
+    """Encodes values directly to utf-8 encoded bytes
+
+    Uses ``orjson`` when it's installed (unless ``fast=False``), falling back
+    to the standard library encoder for values it can't handle (like
+    integers longer than 64 bits or non-string dict keys).
+    """
+
+    def __init__(self, *, default=None, fast=True):
+        self.default = default
+        self._fast = orjson if fast else None
+        self._stdlib = json.JSONEncoder(ensure_ascii=False,
+            separators=(',', ':'), default=default)
+
+    def encode(self, value):
+        if self._fast is not None:
+            try:
+                return self._fast.dumps(value, default=self.default)
+            except TypeError:
+                pass
+        return self._stdlib.encode(value).encode('utf-8')
+
+
+default_encoder = JSONEncoder()
+
+
+def _await(awaitable):
+    """Returns iterator to ``yield from`` for any awaitable"""
+    await_ = getattr(awaitable, '__await__', None)
+    return awaitable if await_ is None else await_()
+
+
+class JSONStream(StreamingBody):
+    """Encodes a sequence as JSON array incrementally
+
+    The ``items`` is any iterable or an asynchronous iterator. Items of
+    plain iterables are batched into chunks of roughly ``chunk_size`` bytes,
+    for asynchronous iterators every item is sent as soon as it's ready.
+    """
+
+    def __init__(self, items, *, encoder=None, chunk_size=STREAM_CHUNK_SIZE):
+        self.encoder = encoder or default_encoder
+        self.chunk_size = chunk_size
+        if hasattr(items, '__aiter__'):
+            self._aiter = items.__aiter__()
+            self._iter = None
+        else:
+            self._aiter = None
+            self._iter = iter(items)
+        self._started = False
+        self._done = False
+
+    @asyncio.coroutine
+    def _next(self):
+        if self._iter is not None:
+            return next(self._iter, _END)
+        try:
+            return (yield from _await(self._aiter.__anext__()))
+        except StopAsyncIteration:
+            return _END
+
+    @asyncio.coroutine
+    def read(self):
+        if self._done:
+            return b''
+        buf = bytearray()
+        if not self._started:
+            buf += b'['
+        while len(buf) < self.chunk_size:
+            item = yield from self._next()
+            if item is _END:
+                buf += b']'
+                self._done = True
+                break
+            if self._started:
+                buf += b','
+            self._started = True
+            buf += self.encoder.encode(item)
+            if self._aiter is not None:
+                break
+        return bytes(buf)
+
+
+def jsonify(fun=None, *, stream=False, encoder=None,
+            content_type=JSON_CONTENT_TYPE):
+    """Postprocessor that serializes the return value of the leaf to JSON
+
+    The response is a ``(status, headers, body)`` triple with the body
+    already encoded to bytes::
+
+        @jsonify
+        @page
+        def user(self, uid: int):
+            return {'id': uid, 'name': 'John'}
+
+    With ``stream=True`` lists, iterators and asynchronous iterators are
+    sent as a JSON array item by item (see :class:`JSONStream`), other
+    values are encoded as usual. Note that generator object returned from a
+    leaf is run as a coroutine, so either return ``map`` or alike, or wrap
+    the generator into :class:`JSONStream` yourself.
+    """
+    if fun is None:
+        return partial(jsonify, stream=stream, encoder=encoder,
+                       content_type=content_type)
+    if encoder is None:
+        encoder = default_encoder
+
+    @postprocessor(fun)
+    def jsonify_result(self, resolver, value):
+        if isinstance(value, StreamingBody):
+            body = value
+        elif stream and not isinstance(value, (dict, str, bytes)) and (
+                hasattr(value, '__iter__') or hasattr(value, '__aiter__')):
+            body = JSONStream(value, encoder=encoder)
+        else:
+            body = encoder.encode(value)
+        return (200, [('Content-Type', content_type)], body)
+    return fun
+
+
+def error_page(exc):
+    """Renders :class:`WebException` as JSON object
+
+    Status and headers (e.g. ``Location`` or ``Retry-After``) are the same
+    as in the default response, only body is replaced. Use it in the
+    site::
+
+        class JSONSite(Site):
+
+            @asyncio.coroutine
+            def error_page(self, e):
+                return jsonify.error_page(e)
+    """
+    status, headers, body = exc.default_response()
+    code = int(str(status).split()[0])
+    if code == 304:
+        return status, headers, body  # must not have a body
+    headers = [(name, value) for name, value in headers
+               if name.lower() != 'content-type']
+    headers.insert(0, ('Content-Type', JSON_CONTENT_TYPE))
+    return (status, headers, default_encoder.encode({'error': {
+        'status': code,
+        'message': responses.get(code, 'Error'),
+        }}))
@@ -0,0 +1,184 @@
+import asyncio
+from math import ceil
+from time import monotonic
+from array import array
+from collections import deque
+
+from .exceptions import ServiceUnavailable, TooManyRequests
+
+
+class ConcurrencyLimit(object):
+    """Limits number of requests processed by a route simultaneously
+
+    When there are already ``max_inflight`` requests in progress, new ones
+    wait in the queue of ``queue_size`` at most ``timeout`` seconds. When
+    queue is full or timeout is reached, client gets ``503 Service
+    Unavailable`` with ``Retry-After`` header.
+
+    Attributes ``inflight``, ``queue_depth``, ``shed_count`` and
+    ``timeout_count`` may be used for monitoring.
+    """
+
+    def __init__(self, max_inflight, *, queue_size=0, timeout=None,
+                 retry_after=1):
+        assert max_inflight > 0, max_inflight
+        self.max_inflight = max_inflight
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.shed_count = 0
+        self.timeout_count = 0
+        self._waiters = deque()
+
+    def __repr__(self):
+        return '<{} {}/{} queued {}/{}>'.format(self.__class__.__name__,
+            self.inflight, self.max_inflight,
+            len(self._waiters), self.queue_size)
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    @asyncio.coroutine
+    def acquire(self):
+        # there are waiters only when all slots are taken
+        if self.inflight < self.max_inflight:
+            self.inflight += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            self.shed_count += 1
+            raise ServiceUnavailable(retry_after=self.retry_after)
+        waiter = asyncio.Future()
+        self._waiters.append(waiter)
+        try:
+            yield from asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.timeout_count += 1
+            raise ServiceUnavailable(retry_after=self.retry_after)
+        except asyncio.CancelledError:
+            self._discard(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # slot was already handed over to us
+            raise
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)  # hand over the slot
+                return
+        self.inflight -= 1
+
+
+def remote_addr(ctx):
+    """Rate limit key: address of the client connected
+
+    Note when site is behind a proxy, this is the address of the proxy. Use
+    a function which takes address from the header set by your proxy in
+    this case.
+    """
+    return getattr(ctx.request, 'remote_addr', None)
+
+
+class RateLimit(object):
+    """Limits rate of requests per client with token buckets
+
+    Each client (as identified by the ``key``) may make ``rate`` requests
+    per second on average and ``burst`` requests at once (default is
+    ``rate``, but at least one). Requests above the limit get ``429 Too
+    Many Requests`` with ``Retry-After`` header.
+
+    The ``key`` is a function which receives the request context and
+    returns a hashable identity of the client or ``None`` to not limit the
+    request. It may be a coroutine, to look up a sticker for example, but
+    note that rate limit is only useful if it's cheaper than the request
+    itself.
+
+    Buckets are kept in a fixed size table: ``size`` buckets split in sets
+    of ``ways``, a key may occupy any bucket of the set chosen by its
+    hash. When set is full the least recently used bucket of the set is
+    reused. So memory is bounded no matter how many different keys there
+    are, the drawback is that an evicted client gets the full bucket when
+    comes back.
+
+    Attributes ``allowed_count``, ``rejected_count`` and ``evicted_count``
+    may be used for monitoring.
+    """
+
+    def __init__(self, rate, burst=None, *, key=remote_addr, size=4096,
+                 ways=8):
+        assert rate > 0, rate
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        assert self.burst >= 1, burst
+        self.key = key
+        self._key_coroutine = asyncio.iscoroutinefunction(key)
+        self.ways = ways
+        self._sets = max(size // ways, 1)
+        size = self._sets * ways
+        self._keys = [None] * size
+        self._tokens = array('d', [0.0]) * size
+        # time of last access, empty buckets are the least recently used
+        self._stamps = array('d', [float('-inf')]) * size
+        self.allowed_count = 0
+        self.rejected_count = 0
+        self.evicted_count = 0
+
+    def __repr__(self):
+        return '<{} {}/s burst {}>'.format(self.__class__.__name__,
+            self.rate, self.burst)
+
+    def take(self, key, now=None):
+        """Takes a token from the bucket of the key
+
+        Returns zero when request is allowed, or the number of seconds until
+        the token is available.
+        """
+        if now is None:
+            now = monotonic()
+        keys = self._keys
+        stamps = self._stamps
+        start = (hash(key) % self._sets) * self.ways
+        victim = start
+        for index in range(start, start + self.ways):
+            if keys[index] == key:
+                elapsed = now - stamps[index]
+                tokens = min(self._tokens[index] + elapsed * self.rate,
+                             self.burst)
+                break
+            if stamps[index] < stamps[victim]:
+                victim = index
+        else:
+            index = victim
+            if keys[index] is not None:
+                self.evicted_count += 1
+            keys[index] = key
+            tokens = self.burst
+        stamps[index] = now
+        if tokens >= 1:
+            self._tokens[index] = tokens - 1
+            self.allowed_count += 1
+            return 0
+        self._tokens[index] = tokens
+        self.rejected_count += 1
+        return (1 - tokens) / self.rate
+
+    @asyncio.coroutine
+    def check(self, ctx):
+        """Raises :class:`TooManyRequests` if the request is over the limit"""
+        key = self.key(ctx)
+        if self._key_coroutine:
+            key = yield from key
+        if key is None:
+            return
+        wait = self.take(key)
+        if wait:
+            raise TooManyRequests(retry_after=int(ceil(wait)))
@@ -0,0 +1,47 @@
+from .core import Scope, endpoint, resource
+from .http import PathResolver, HTTP
+
+
+WEBSOCKET = Scope('websocket')
+RPC = Scope('rpc')
+
+
+class MessageResolver(PathResolver):
+    """Resolves websocket messages by their path the same way as urls"""
+
+    future_path_artifact = 'future_message_path'
+    past_path_artifact = 'past_message_path'
+
+
+class RpcResolver(PathResolver):
+    """Resolves remote procedure calls by their path the same way as urls"""
+
+    future_path_artifact = 'future_rpc_path'
+    past_path_artifact = 'past_rpc_path'
+
+
+def websocket_resource(fun):
+    """Decorator to denote a method which returns websocket-only resource"""
+    return resource(fun, scopes=[WEBSOCKET])
+
+
+def message(fun):
+    """Decorator to denote a method which works only for websocket messages
+    """
+    return endpoint(fun, scopes=[WEBSOCKET])
+
+
+def page_and_message(fun):
+    """Decorator to denote a method which works both for http and websocket
+    """
+    return endpoint(fun, scopes=[HTTP, WEBSOCKET])
+
+
+def procedure(fun):
+    """Decorator to denote a method which works only for remote calls"""
+    return endpoint(fun, scopes=[RPC])
+
+
+def page_and_procedure(fun):
+    """Decorator to denote a method which works both for http and rpc"""
+    return endpoint(fun, scopes=[HTTP, RPC])
@@ -3,4 +3,4 @@ from .signature import Sticker
 
 @Sticker.register
 class BaseRequest(object):
-    pass
+    __slots__ = ()
@@ -0,0 +1,241 @@
+import re
+import inspect
+from functools import partial
+from urllib.parse import quote
+
+from .core import walk, alias, ValueResolver
+from .core import LEAF_KIND, LAZY_KIND, RESOURCE_KIND, GENERIC_SCOPE
+from .signature import Sticker
+from .util import marker_object
+
+
+_SAFE_SEGMENT = re.compile(r'[A-Za-z0-9_.~-]+\Z').match
+_MISSING = marker_object('MISSING')
+_AMBIGUOUS = marker_object('AMBIGUOUS')
+
+
+def quote_segment(value):
+    """Percent-encodes a path segment (or query value), ``/`` included"""
+    if type(value) is int:
+        return str(value)
+    value = str(value)
+    if _SAFE_SEGMENT(value):
+        return value
+    return quote(value, safe='')
+
+
+def encode_query(args):
+    """Encodes dict as query string, lists and tuples are repeated keys"""
+    parts = []
+    for key, value in args.items():
+        key = quote_segment(key)
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                parts.append(key + '=' + quote_segment(item))
+        else:
+            parts.append(key + '=' + quote_segment(value))
+    return '&'.join(parts)
+
+
+def _pair(prefix, value):
+    if isinstance(value, (list, tuple)):
+        return '&'.join(prefix + quote_segment(item) for item in value)
+    return prefix + quote_segment(value)
+
+
+def compile_builder(prefix, fun, path_args):
+    """Returns a function building url for the leaf from its arguments
+
+    Required positional arguments are put in the path when ``path_args`` is
+    true, everything else is put in the query string. Stickers are skipped.
+    The static ``prefix`` is quoted once here, so the common case (no
+    query) is a single string concatenation. Locals and globals of the
+    generated function are dunder names to not clash with the parameters.
+    """
+    sig = inspect.signature(fun)
+    vars = {
+        '__seg__': quote_segment,
+        '__encode_query__': encode_query,
+        '__pair__': _pair,
+        '__MISSING__': _MISSING,
+        }
+    params = []
+    path = []
+    query = []
+    varpos = None
+    has_kwonly = False
+    for name, param in sig.parameters.items():
+        ann = param.annotation
+        if isinstance(ann, type) and issubclass(ann, Sticker):
+            continue
+        if param.kind == param.VAR_KEYWORD:
+            continue  # __query__ is always there
+        if param.kind == param.VAR_POSITIONAL:
+            if path_args:
+                varpos = name
+                params.append('*' + name)
+            continue
+        if param.kind == param.KEYWORD_ONLY:
+            if varpos is None and not has_kwonly:
+                params.append('*')
+            has_kwonly = True
+        required = param.default is param.empty
+        params.append(name if required else name + '=__MISSING__')
+        if (path_args and required
+                and param.kind != param.KEYWORD_ONLY):
+            path.append(name)
+        else:
+            query.append((name, required))
+    params.append('**__query__')
+
+    segments = [repr(prefix)]
+    for name in path:
+        segments.append("'/'")
+        segments.append('__seg__({})'.format(name))
+    if len(segments) == 1 and not varpos and not prefix:
+        segments = ["'/'"]
+    lines = ['def __build__({}):'.format(', '.join(params))]
+    lines.append('  __url__ = ' + ' + '.join(segments))
+    if varpos:
+        lines.append("  if {0}: __url__ += ''.join("
+                     "['/' + __seg__(__a__) for __a__ in {0}])"
+                     .format(varpos))
+        lines.append("  if not __url__: __url__ = '/'")
+    if query:
+        lines.append('  __q__ = []')
+        for name, required in query:
+            line = '  __q__.append(__pair__({!r}, {}))'.format(
+                quote_segment(name) + '=', name)
+            if not required:
+                line = '  if {} is not __MISSING__:\n  '.format(name) + line
+            lines.append(line)
+        lines.append(
+            "  if __query__: __q__.append(__encode_query__(__query__))")
+        lines.append("  if __q__: __url__ += '?' + '&'.join(__q__)")
+    else:
+        lines.append(
+            "  if __query__: __url__ += '?' + __encode_query__(__query__)")
+    lines.append('  return __url__')
+    code = compile('\n'.join(lines), '__build__', 'exec')
+    exec(code, vars)
+    builder = vars['__build__']
+    builder.__qualname__ = builder.__name__ = 'build_url_' + fun.__name__
+    return builder
+
+
+def _key(target):
+    if isinstance(target, tuple):
+        return target
+    if isinstance(target, str):
+        return tuple(seg for seg in target.split('/') if seg)
+    if hasattr(target, '__self__'):
+        return id(target.__self__), target.__func__
+    if getattr(target, '_aio_kind', None) is RESOURCE_KIND:
+        return id(target)
+    return target
+
+
+class Reverser(object):
+    """Index of the statically known leaves for building urls
+
+    Leaves are found by :func:`walk`, so leaves in resources returned by
+    resource methods can't be built this way (just like aliases). Lazy
+    subtrees are added when they are loaded, and loaded on the lookup by
+    path.
+    """
+
+    def __init__(self, resources, scope):
+        self.scope_set = frozenset([GENERIC_SCOPE, scope])
+        self.scope = scope
+        self._targets = {}
+        self._builders = {}
+        self._cache = {}  # target itself (e.g. bound method) -> builder
+        self._lazy = {}
+        for path, res in walk(resources):
+            self.add_resource(path, res)
+
+    def add_subtree(self, path, resource):
+        for subpath, res in walk([resource]):
+            self.add_resource(path + subpath, res)
+
+    def add_resource(self, path, resource):
+        children = getattr(resource, '_aio_children', None)
+        if children is None:
+            return
+        resolver = resource.get_resolver_for_scope(self.scope)
+        by_value = isinstance(resolver, ValueResolver)
+        index = getattr(resolver, 'index_method', None)
+        default = getattr(resolver, 'default_method', None)
+        for name, child in children():
+            if isinstance(inspect.getattr_static(type(resource), name, None),
+                          alias):
+                continue  # canonical url is the one of the target
+            kind = getattr(child, '_aio_kind', None)
+            if kind is LAZY_KIND:
+                self._lazy[path + (name,)] = child
+                child.subscribe(partial(self.add_subtree, path + (name,)))
+                continue
+            if kind is not LEAF_KIND:
+                continue
+            if not self.scope_set.intersection(child._aio_scope):
+                continue
+            if by_value:
+                leaf_path, path_args = path, False
+            elif name == index:
+                leaf_path, path_args = path, False
+            elif name == default:
+                leaf_path, path_args = path, True
+            else:
+                leaf_path, path_args = path + (name,), True
+            target = leaf_path, child, path_args
+            self._add(child, target)
+            self._add(child.__func__, target)
+            self._add(path + (name,), target)
+            self._add(leaf_path, target)
+            if name == index:
+                self._add(resource, target)
+
+    def _add(self, key, target):
+        key = _key(key)
+        old = self._targets.get(key)
+        if old is None:
+            self._targets[key] = target
+        elif (old is not _AMBIGUOUS and old[0] != target[0]
+                and not isinstance(key, tuple)):
+            self._targets[key] = _AMBIGUOUS  # function mounted twice
+
+    def _find(self, target):
+        key = _key(target)
+        found = self._targets.get(key)
+        if found is None and isinstance(target, str):
+            for i in range(len(key), 0, -1):
+                lazy = self._lazy.get(key[:i])
+                if lazy is not None and lazy.value is None:
+                    lazy.load()  # calls add_subtree
+                    found = self._targets.get(key)
+                    break
+        if found is None:
+            raise LookupError("Can't build url for {!r}".format(target))
+        if found is _AMBIGUOUS:
+            raise LookupError("{!r} is mounted at several paths, use bound "
+                "method instead".format(target))
+        return found
+
+    def builder(self, target):
+        """Returns a function ``(*args, **kwargs) -> url`` for the target"""
+        try:
+            return self._cache[target]
+        except (KeyError, TypeError):  # TypeError for unhashable resource
+            pass
+        found = self._find(target)
+        builder = self._builders.get(id(found))
+        if builder is None:
+            path, fun, path_args = found
+            prefix = ''.join('/' + quote_segment(seg) for seg in path)
+            builder = self._builders[id(found)] = compile_builder(
+                prefix, fun, path_args)
+        try:
+            self._cache[target] = builder
+        except TypeError:
+            pass
+        return builder
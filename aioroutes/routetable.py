@@ -0,0 +1,231 @@
+import os
+import abc
+import sys
+import mmap
+import struct
+import asyncio
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+
+from .exceptions import OutOfScopeError
+
+
+MAGIC = b'AIORTBL1'
+# magic, byte order of offsets, number of records
+HEADER = struct.Struct('=8sc7xQ')
+BYTEORDER = b'<' if sys.byteorder == 'little' else b'>'
+# every n-th key is kept in memory to make binary search mostly native
+INDEX_STEP = 32
+
+
+def build_table(items):
+    """Serializes ``(key, value)`` pairs (or a mapping) to a table image
+
+    The layout is a header, followed by ``count + 1`` native 64-bit offsets
+    of records, followed by records themselves. Each record is a utf-8
+    encoded key, a zero byte and a value. Records are sorted by key, so
+    lookups are just a binary search over offsets.
+    """
+    if isinstance(items, Mapping):
+        items = items.items()
+    pairs = {}
+    for key, value in items:
+        key = key.encode('utf-8')
+        if b'\0' in key:
+            raise ValueError("Zero byte in key {!r}".format(key))
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        pairs[key] = value
+    keys = sorted(pairs)
+    offsets = array('Q', [0])
+    records = []
+    pos = 0
+    for key in keys:
+        rec = key + b'\0' + pairs[key]
+        pos += len(rec)
+        offsets.append(pos)
+        records.append(rec)
+    assert offsets.itemsize == 8
+    return b''.join([HEADER.pack(MAGIC, BYTEORDER, len(keys)),
+                     offsets.tobytes()] + records)
+
+
+class RouteTable(Mapping):
+    """Read-only sorted mapping of string keys to string values
+
+    Table is stored in a flat buffer (see :func:`build_table`) so it takes
+    a few bytes of overhead per entry instead of two python objects and a
+    hash slot. When opened from file it's memory-mapped, so all worker
+    processes share the same pages::
+
+        RouteTable.write('/var/lib/app/links.tbl', links)
+        table = RouteTable.open('/var/lib/app/links.tbl')
+    """
+
+    def __init__(self, buf, *, path=None):
+        magic, order, count = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a route table")
+        if order != BYTEORDER:
+            raise ValueError("Route table is built on different platform")
+        self.path = path
+        self._buf = buf
+        self._count = count
+        end = HEADER.size + 8*(count + 1)
+        self._offsets = memoryview(buf)[HEADER.size:end].cast('Q')
+        self._data = end
+        self._index = [self._key(i)[0] for i in range(0, count, INDEX_STEP)]
+
+    @classmethod
+    def from_items(cls, items):
+        return cls(build_table(items))
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buf, path=path)
+
+    @staticmethod
+    def write(path, items):
+        """Writes table to file atomically
+
+        New file is written next to the target and renamed over it, so
+        processes opening the table never see partially written file.
+        """
+        import tempfile
+        data = build_table(items)
+        fd, tmp = tempfile.mkstemp(prefix='.routetable-',
+            dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self._key(i)[0].decode('utf-8')
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def _key(self, i):
+        start = self._data + self._offsets[i]
+        end = self._buf.find(b'\0', start)
+        return self._buf[start:end], end
+
+    def _value(self, i, end):
+        return self._buf[end+1:self._data + self._offsets[i+1]]
+
+    def _bisect(self, key, right=False):
+        j = (bisect_right if right else bisect_left)(self._index, key)
+        lo = (j - 1)*INDEX_STEP + 1 if j else 0
+        hi = min(j*INDEX_STEP, self._count)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            cur = self._key(mid)[0]
+            if cur < key or right and cur == key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key, default=None):
+        key = key.encode('utf-8')
+        i = self._bisect(key)
+        if i < self._count:
+            cur, end = self._key(i)
+            if cur == key:
+                return self._value(i, end).decode('utf-8')
+        return default
+
+    def prefix(self, prefix):
+        """Yields ``(key, value)`` pairs for keys starting with ``prefix``"""
+        prefix = prefix.encode('utf-8')
+        for i in range(self._bisect(prefix), self._count):
+            key, end = self._key(i)
+            if not key.startswith(prefix):
+                break
+            yield key.decode('utf-8'), self._value(i, end).decode('utf-8')
+
+    def longest_match(self, key):
+        """Returns ``(key, value)`` for the longest key which is a prefix of
+        the argument, or ``None``
+        """
+        key = key.encode('utf-8')
+        while True:
+            i = self._bisect(key, right=True) - 1
+            if i < 0:
+                return None
+            cur, end = self._key(i)
+            if key.startswith(cur):
+                return cur.decode('utf-8'), self._value(i, end).decode('utf-8')
+            # any key that is a prefix of ``key`` is also a prefix of the
+            # common part of ``key`` and ``cur``, which is strictly shorter
+            key = os.path.commonprefix([key, cur])
+
+
+EMPTY_TABLE = RouteTable.from_items(())
+
+
+class RouteTableMixin(object):
+    """Resource which looks up its children in a :class:`RouteTable`
+
+    Unlike :class:`DictResource` the children are not stored as objects,
+    :meth:`child` is called to make a resource (or a leaf) from the value
+    stored in the table::
+
+        class Links(RouteTableResource):
+
+            def child(self, name, value):
+                return Redirect(value)
+
+        links = Links('/var/lib/app/links.tbl')
+
+    Children are not visited when site is indexed, so aliases and other
+    static features don't work inside the table.
+    """
+
+    table = EMPTY_TABLE
+
+    def __init__(self, path=None):
+        self.path = path
+        if path is not None:
+            self.reload()
+
+    def reload(self, path=None):
+        """Replaces the table with the current contents of the file
+
+        Replacement is atomic: requests being processed keep using the old
+        table, new ones use the new table.
+        """
+        if path is not None:
+            self.path = path
+        self.table = RouteTable.open(self.path)
+
+    @abc.abstractmethod
+    def child(self, name, value):
+        pass
+
+    def _aio_children(self):
+        return ()
+
+    @asyncio.coroutine
+    def resolve_local(self, name):
+        value = self.table.get(name)
+        if value is None:
+            raise OutOfScopeError()
+        return self.child(name, value)
@@ -0,0 +1,392 @@
+"""Binary framed remote procedure calls over plain TCP (or unix) streams
+
+Every frame is a fixed header followed by the utf-8 encoded JSON payload::
+
+    uint32 length | uint32 id | uint8 kind | payload
+
+All integers are big-endian, ``length`` is the length of the payload. The
+call payload is ``{"path": "/x/y", "args": {...}}``, the reply has the same
+``id`` and either a ``RESULT`` kind with the returned value or an ``ERROR``
+kind with ``{"status": 404, "message": "Not Found"}``. Calls are processed
+concurrently, so replies may arrive in any order and many calls are in
+flight over the single connection.
+"""
+import json
+import struct
+import asyncio
+import logging
+from operator import attrgetter
+from types import MappingProxyType
+from http.client import responses
+
+from .util import cached_property
+from .http import Site, StreamingBody, split_target, split_path
+from .request import BaseRequest
+from .message import RPC
+from .exceptions import BadRequest
+from .jsonify import default_encoder, JSON_CONTENT_TYPE
+
+try:
+    from orjson import loads as _loads
+except ImportError:
+    _loads = json.loads
+
+
+log = logging.getLogger(__name__)
+
+HEADER = struct.Struct('!IIB')
+CALL = 0
+RESULT = 1
+ERROR = 2
+MAX_FRAME_SIZE = 16*1024*1024
+DRAIN_THRESHOLD = 64*1024
+
+
+def pack_frame(id, kind, payload):
+    return HEADER.pack(len(payload), id, kind) + payload
+
+
+@asyncio.coroutine
+def read_frame(reader, max_size=MAX_FRAME_SIZE):
+    """Returns ``(id, kind, payload)`` or ``None`` on clean end of stream"""
+    try:
+        header = yield from reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise
+        return None
+    length, id, kind = HEADER.unpack(header)
+    if length > max_size:
+        raise ValueError("Frame of {} bytes is too large".format(length))
+    return id, kind, (yield from reader.readexactly(length))
+
+
+class RpcError(Exception):
+    """Error returned by the remote side, raised by :meth:`RpcClient.call`
+    """
+
+    def __init__(self, status, message=None):
+        self.status = status
+        self.message = message or responses.get(status, 'Error')
+        super().__init__(status, self.message)
+
+
+class RpcCall(BaseRequest):
+    """Single call received by the :class:`RpcSite`
+
+    There are no headers and cookies, everything that leaf needs must be
+    passed in ``args``.
+    """
+    headers = MappingProxyType({})
+    cookies = MappingProxyType({})
+
+    def __init__(self, connection, id, path, args):
+        self.connection = connection
+        self.id = id
+        self.uri = path
+        self.args = args
+
+    def set_uri(self, uri):
+        self.uri = uri
+        self.__dict__.pop('path_segments', None)
+
+    @cached_property
+    def path_segments(self):
+        return split_path(split_target(self.uri)[0])
+
+    @property
+    def disconnected(self):
+        return self.connection.closed
+
+    @property
+    def remote_addr(self):
+        return self.connection.remote_addr
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        return resolver.request
+
+
+class ServerConnection(object):
+    """Single client connection to the :class:`RpcSite`
+
+    Each call is dispatched in a separate task. Replies are written as soon
+    as they are ready. When the client doesn't read them fast enough, calls
+    wait in a single queue for the buffer to drain.
+    """
+
+    def __init__(self, site, reader, writer):
+        self.site = site
+        self.reader = reader
+        self.writer = writer
+        self.tasks = set()
+        self.closed = asyncio.Future()
+        self._write_lock = asyncio.Lock()
+        self.call_count = 0
+        peername = writer.get_extra_info('peername')
+        self.remote_addr = (peername[0] if isinstance(peername, tuple)
+                            else None)  # None for unix sockets
+
+    @asyncio.coroutine
+    def serve(self):
+        try:
+            while True:
+                frame = yield from read_frame(self.reader,
+                                              self.site.max_frame_size)
+                if frame is None:
+                    break
+                id, kind, payload = frame
+                if kind != CALL:
+                    raise ValueError("Unexpected frame kind {}".format(kind))
+                self.call_count += 1
+                task = asyncio.ensure_future(self.handle(id, payload))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            log.debug("Closing RPC connection: %r", e)
+        finally:
+            if not self.closed.done():
+                self.closed.set_result(None)
+            for task in list(self.tasks):
+                task.cancel()
+            self.writer.close()
+
+    @asyncio.coroutine
+    def handle(self, id, payload):
+        try:
+            call = self.parse(id, payload)
+        except BadRequest as e:
+            result = yield from self.site.error_page(e)
+        else:
+            result = yield from self.site.dispatch(call)
+        try:
+            kind, data = yield from encode_result(result)
+        except Exception:
+            log.exception("Can't encode result of RPC call %r", result)
+            kind, data = yield from encode_result(RpcError(500))
+        yield from self.send(pack_frame(id, kind, data))
+
+    @asyncio.coroutine
+    def send(self, frame):
+        self.writer.write(frame)
+        transport = self.writer.transport
+        if transport.get_write_buffer_size() <= DRAIN_THRESHOLD:
+            return  # fast path, don't touch the lock
+        yield from self._write_lock.acquire()
+        try:
+            yield from self.writer.drain()
+        except ConnectionError:
+            pass  # the reading loop will notice it too
+        finally:
+            self._write_lock.release()
+
+    def parse(self, id, payload):
+        try:
+            obj = _loads(payload)
+        except ValueError:
+            raise BadRequest()
+        if not isinstance(obj, dict):
+            raise BadRequest()
+        path = obj.get('path')
+        args = obj.get('args') or {}
+        if (not isinstance(path, str) or not path.startswith('/')
+                or not isinstance(args, dict)):
+            raise BadRequest()
+        return RpcCall(self, id, path, args)
+
+
+@asyncio.coroutine
+def encode_result(result):
+    """Returns frame ``(kind, payload)`` for the value returned by the site
+    """
+    if isinstance(result, RpcError):
+        return ERROR, default_encoder.encode(
+            {'status': result.status, 'message': result.message})
+    if (isinstance(result, (tuple, list)) and len(result) == 3
+            and isinstance(result[2], (bytes, StreamingBody))):
+        # http response produced by leaf serving both scopes
+        status, headers, body = result
+        if isinstance(body, StreamingBody):
+            chunks = []
+            while True:
+                chunk = yield from body.read()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            body = b''.join(chunks)
+        if isinstance(headers, dict):
+            headers = headers.items()
+        ctype = dict((k.lower(), v) for k, v in headers).get('content-type')
+        if ctype and ctype.split(';')[0].strip() == JSON_CONTENT_TYPE:
+            return RESULT, body or b'null'
+        result = body.decode('utf-8', 'replace')
+    elif isinstance(result, bytes):
+        result = result.decode('utf-8', 'replace')
+    return RESULT, default_encoder.encode(result)
+
+
+class RpcSite(Site):
+    """Site which serves the resource tree over binary framed streams
+
+    Usually created with the same resources as the HTTP site. Only leaves
+    decorated with :func:`procedure` or :func:`page_and_procedure` are
+    reachable::
+
+        rpc_site = RpcSite(resources=[Root()])
+        server = yield from rpc_site.serve('127.0.0.1', 8001)
+    """
+    site_scope = RPC
+    keyword_arguments_factory = attrgetter('request.args')
+    max_frame_size = MAX_FRAME_SIZE
+
+    def __init__(self, *, max_frame_size=None, **kwargs):
+        super().__init__(**kwargs)
+        if max_frame_size is not None:
+            self.max_frame_size = max_frame_size
+
+    @asyncio.coroutine
+    def serve(self, host=None, port=None, **kwargs):
+        """Starts the server, arguments are those of `asyncio.start_server`
+        """
+        return (yield from asyncio.start_server(self.handle_connection,
+                                                host, port, **kwargs))
+
+    @asyncio.coroutine
+    def handle_connection(self, reader, writer):
+        yield from ServerConnection(self, reader, writer).serve()
+
+    def _make_context(self, request):
+        ctx = super()._make_context(request)
+        ctx.response_headers = None
+        return ctx
+
+    @asyncio.coroutine
+    def error_page(self, e):
+        status = e.default_response()[0]
+        return RpcError(int(str(status).split()[0]))
+
+    @asyncio.coroutine
+    def dispatch(self, call):
+        result = yield from self._safe_dispatch(call)
+        responsemeth = getattr(result, 'http_response', None)
+        if responsemeth is not None:
+            result = yield from self.make_response(result)
+        return result
+
+
+class ClientConnection(object):
+    """Single connection of the :class:`RpcClient` multiplexing many calls
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.closed = False
+        self._next_id = 0
+        self._reading = asyncio.ensure_future(self._read_replies())
+
+    @asyncio.coroutine
+    def call(self, path, args):
+        if self.closed:
+            raise ConnectionResetError("RPC connection closed")
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        id = self._next_id
+        fut = self.pending[id] = asyncio.Future()
+        try:
+            self.writer.write(pack_frame(id, CALL, default_encoder.encode(
+                {'path': path, 'args': args})))
+            return (yield from fut)
+        finally:
+            self.pending.pop(id, None)
+
+    @asyncio.coroutine
+    def _read_replies(self):
+        error = ConnectionResetError("RPC connection closed")
+        try:
+            while True:
+                frame = yield from read_frame(self.reader)
+                if frame is None:
+                    break
+                id, kind, payload = frame
+                fut = self.pending.get(id)
+                if fut is None or fut.done():
+                    continue  # cancelled by the caller
+                if kind == RESULT:
+                    fut.set_result(_loads(payload))
+                else:
+                    err = _loads(payload)
+                    fut.set_exception(RpcError(err.get('status', 500),
+                                               err.get('message')))
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            error = ConnectionResetError("RPC connection failed: {!r}"
+                                         .format(e))
+        finally:
+            self.closed = True
+            self.writer.close()
+            for fut in self.pending.values():
+                if not fut.done():
+                    fut.set_exception(error)
+
+    def close(self):
+        self._reading.cancel()
+
+
+class RpcClient(object):
+    """Client for the :class:`RpcSite` with connection pooling
+
+    Up to ``pool_size`` connections are opened lazily. Each call goes to the
+    least loaded connection, a new connection is opened only when all of the
+    existing ones have calls in flight::
+
+        client = RpcClient('127.0.0.1', 8001)
+        user = yield from client.call('/users/get', id=1)
+    """
+
+    def __init__(self, host=None, port=None, *, pool_size=4, timeout=None,
+                 **connect_kwargs):
+        self.host = host
+        self.port = port
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connect_kwargs = connect_kwargs
+        self.connections = []
+        self._opening = set()
+
+    @asyncio.coroutine
+    def call(self, path, **args):
+        conn = yield from self._get_connection()
+        fut = conn.call(path, args)
+        if self.timeout is not None:
+            fut = asyncio.wait_for(fut, self.timeout)
+        return (yield from fut)
+
+    @asyncio.coroutine
+    def _get_connection(self):
+        self.connections = [c for c in self.connections if not c.closed]
+        total = len(self.connections) + len(self._opening)
+        best = min(self.connections, key=lambda c: len(c.pending),
+                   default=None)
+        if best is not None and (not best.pending or total >= self.pool_size):
+            return best
+        if total < self.pool_size:
+            opening = asyncio.ensure_future(self._connect())
+            self._opening.add(opening)
+            opening.add_done_callback(self._opening.discard)
+        else:
+            opening = next(iter(self._opening))
+        return (yield from asyncio.shield(opening))
+
+    @asyncio.coroutine
+    def _connect(self):
+        reader, writer = yield from asyncio.open_connection(
+            self.host, self.port, **self.connect_kwargs)
+        conn = ClientConnection(reader, writer)
+        self.connections.append(conn)
+        return conn
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        del self.connections[:]
@@ -0,0 +1,351 @@
+"""Sessions stored on the server and identified by a cookie
+
+Configure the store on a subclass of :class:`Session` and ask for it in
+leaves (or resources) like any other sticker::
+
+    class UserSession(Session):
+        store = SessionStore(SqliteBackend('/var/lib/myapp/sessions.db'))
+
+    class Root(Resource):
+
+        @page
+        def login(self, session: UserSession, name: str):
+            session['user'] = name
+            return 'hello'
+
+Session is loaded from the store on the first access to its values and
+saved only when modified. Recently used sessions are cached in the process,
+modified ones are written to the backend in batches (see
+:class:`SessionStore`), so call ``store.close()`` on shutdown to write out
+the rest.
+"""
+import os
+import re
+import json
+import time
+import base64
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from .signature import Sticker
+
+
+log = logging.getLogger(__name__)
+
+SESSION_ID_RE = re.compile(r'^[A-Za-z0-9_-]{16,128}$')
+DELETED = None  # value of deleted session in the write-behind queue
+
+
+def new_session_id():
+    return base64.urlsafe_b64encode(os.urandom(24)).decode('ascii')
+
+
+def _dumps(data):
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(raw):
+    return json.loads(raw.decode('utf-8'))
+
+
+class SqliteBackend(object):
+    """Stores sessions in a table of the sqlite database"""
+
+    def __init__(self, path, *, table='sessions'):
+        import sqlite3
+        self.db = sqlite3.connect(path)
+        self.table = table
+        if path != ':memory:':
+            self.db.execute('PRAGMA journal_mode=WAL')
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS {} ('
+                'id TEXT PRIMARY KEY, data BLOB, updated REAL)'.format(table))
+
+    def load(self, sid):
+        row = self.db.execute('SELECT data FROM {} WHERE id = ?'
+            .format(self.table), (sid,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def save_many(self, items, deleted=()):
+        now = time.time()
+        with self.db:  # a single transaction
+            if items:
+                self.db.executemany('INSERT OR REPLACE INTO {} '
+                    '(id, data, updated) VALUES (?, ?, ?)'.format(self.table),
+                    [(sid, raw, now) for sid, raw in items])
+            if deleted:
+                self.db.executemany('DELETE FROM {} WHERE id = ?'
+                    .format(self.table), [(sid,) for sid in deleted])
+
+    def close(self):
+        self.db.close()
+
+
+class DbmBackend(object):
+    """Stores sessions in a :mod:`dbm` database"""
+
+    def __init__(self, path):
+        import dbm
+        self.db = dbm.open(path, 'c')
+
+    def load(self, sid):
+        return self.db.get(sid.encode('ascii'))
+
+    def save_many(self, items, deleted=()):
+        db = self.db
+        for sid, raw in items:
+            db[sid.encode('ascii')] = raw
+        for sid in deleted:
+            key = sid.encode('ascii')
+            if key in db:
+                del db[key]
+        sync = getattr(db, 'sync', None)
+        if sync is not None:
+            sync()
+
+    def close(self):
+        self.db.close()
+
+
+class SessionStore(object):
+    """Session data cached in process in front of the durable backend
+
+    Up to ``cache_size`` recently used sessions are kept in memory. Modified
+    sessions are written to the backend ``flush_interval`` seconds later
+    (several changes of the session are written once) or as soon as there
+    are ``batch_size`` of them, all in a single call to the backend.
+    Backend is called synchronously, it's expected to be a local database.
+
+    Attributes ``hit_count``, ``miss_count``, ``load_count``,
+    ``load_seconds``, ``save_count``, ``flush_count`` and ``flush_seconds``
+    (and properties calculated from them) may be used for monitoring.
+    """
+
+    def __init__(self, backend, *, cache_size=10000, flush_interval=1.0,
+                 batch_size=1000, dumps=_dumps, loads=_loads):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dumps = dumps
+        self.loads = loads
+        self._cache = OrderedDict()
+        self._dirty = {}
+        self._timer = None
+        self.hit_count = 0
+        self.miss_count = 0
+        self.load_count = 0
+        self.load_seconds = 0.0
+        self.save_count = 0
+        self.flush_count = 0
+        self.flush_seconds = 0.0
+
+    def __repr__(self):
+        return '<{} cached {} dirty {} hit ratio {:.2f}>'.format(
+            self.__class__.__name__, len(self._cache), len(self._dirty),
+            self.hit_ratio)
+
+    @property
+    def hit_ratio(self):
+        total = self.hit_count + self.miss_count
+        return self.hit_count / total if total else 0.0
+
+    @property
+    def load_latency(self):
+        """Average time of loading session from backend in seconds"""
+        return self.load_seconds / self.load_count if self.load_count else 0.0
+
+    @property
+    def flush_latency(self):
+        """Average time of writing a batch to backend in seconds"""
+        if not self.flush_count:
+            return 0.0
+        return self.flush_seconds / self.flush_count
+
+    def _remember(self, sid, data):
+        cache = self._cache
+        cache[sid] = data
+        cache.move_to_end(sid)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def get(self, sid):
+        """Returns session data (a dict) or ``None`` if there is no session
+        """
+        data = self._cache.get(sid)
+        if data is not None:
+            self._cache.move_to_end(sid)
+            self.hit_count += 1
+            return data
+        if sid in self._dirty:  # evicted from cache but not written yet
+            self.hit_count += 1
+            data = self._dirty[sid]
+        else:
+            self.miss_count += 1
+            start = time.perf_counter()
+            raw = self.backend.load(sid)
+            self.load_seconds += time.perf_counter() - start
+            self.load_count += 1
+            if raw is None:
+                return None
+            data = self.loads(raw)
+        if data is not None:
+            self._remember(sid, data)
+        return data
+
+    def save(self, sid, data):
+        """Marks session as modified, it's written to backend later"""
+        self._remember(sid, data)
+        self._dirty[sid] = data
+        self._schedule()
+
+    def delete(self, sid):
+        self._cache.pop(sid, None)
+        self._dirty[sid] = DELETED
+        self._schedule()
+
+    def _schedule(self):
+        if len(self._dirty) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(
+                self.flush_interval, self.flush)
+
+    def flush(self):
+        """Writes all modified sessions to the backend"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        dirty = self._dirty
+        if not dirty:
+            return
+        self._dirty = {}
+        start = time.perf_counter()
+        try:
+            items = [(sid, self.dumps(data)) for sid, data in dirty.items()
+                     if data is not DELETED]
+            deleted = [sid for sid, data in dirty.items() if data is DELETED]
+            self.backend.save_many(items, deleted)
+        except Exception:
+            log.exception("Can't write %d sessions, will retry", len(dirty))
+            dirty.update(self._dirty)  # newer changes win
+            self._dirty = dirty
+            self._timer = asyncio.get_event_loop().call_later(
+                self.flush_interval, self.flush)
+            return
+        self.flush_seconds += time.perf_counter() - start
+        self.flush_count += 1
+        self.save_count += len(dirty)
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+
+@Sticker.register
+class Session(MutableMapping):
+    """Sticker with the session of the client
+
+    Works like a dict of JSON-serializable values. Nothing is read from the
+    store until the values are accessed, and nothing is written unless
+    session is modified. When nested values are changed in place, call
+    :meth:`modified` to save the session.
+
+    Session (and the cookie) is created on the first modification. Session
+    ids sent by the client which are not in the store are never reused.
+    Messages and RPC calls can't set cookies, so there only the existing
+    session may be modified. Subclasses must set ``store`` and may change
+    cookie attributes.
+    """
+    request_scoped = True
+    store = None
+    cookie_name = 'session'
+    cookie_path = '/'
+    max_age = None
+    secure = False
+
+    def __init__(self, ctx, sid=None):
+        self._ctx = ctx
+        self.id = sid
+        self._data = None
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.id)
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        if cls.store is None:
+            raise RuntimeError("No store configured for {}"
+                .format(cls.__name__))
+        cookies = getattr(resolver.request, 'cookies', None) or {}
+        sid = cookies.get(cls.cookie_name)
+        if sid is not None and not SESSION_ID_RE.match(sid):
+            sid = None
+        return cls(resolver, sid)
+
+    @property
+    def data(self):
+        data = self._data
+        if data is None:
+            if self.id is not None:
+                data = self.store.get(self.id)
+            if data is None:
+                self.id = None  # a new one will be created if modified
+                data = {}
+            self._data = data
+        return data
+
+    def cookie(self, value, max_age=None):
+        parts = ['{}={}'.format(self.cookie_name, value),
+                 'Path=' + self.cookie_path, 'HttpOnly', 'SameSite=Lax']
+        if max_age is not None:
+            parts.append('Max-Age={:d}'.format(int(max_age)))
+        if self.secure:
+            parts.append('Secure')
+        return '; '.join(parts)
+
+    def modified(self):
+        """Marks session as changed, so it's written to the store"""
+        data = self.data
+        if self.id is None:
+            headers = self._ctx.response_headers
+            if headers is None:
+                raise RuntimeError("Can't create session in {} scope, "
+                    "there is no way to send the cookie"
+                    .format(self._ctx.scope.name))
+            self.id = new_session_id()
+            headers.append(('Set-Cookie', self.cookie(self.id, self.max_age)))
+        self.store.save(self.id, data)
+
+    def invalidate(self):
+        """Deletes the session from the store and the client"""
+        if self.id is not None:
+            self.store.delete(self.id)
+            if self._ctx.response_headers is not None:
+                self._ctx.response_headers.append(
+                    ('Set-Cookie', self.cookie('', 0)))
+        self.id = None
+        self._data = {}
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified()
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified()
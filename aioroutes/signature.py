@@ -1,12 +1,23 @@
+import os
 import abc
+import atexit
+import marshal
 import asyncio
 import inspect
+from importlib.util import MAGIC_NUMBER
 
 
 class Sticker(metaclass=abc.ABCMeta):
     """
     An object which is automatically put into arguments in the view if
     specified in annotation
+
+    The :meth:`create` is called every time the sticker is asked for. Set
+    ``request_scoped = True`` on the class to create it once per request
+    and share it with all resources and the leaf asking for it (and with
+    sub-requests of the batch and messages of the websocket connection).
+    Such sticker must only depend on what they share, like cookies and
+    headers, but not on the uri or arguments.
     """
     __superseded = {}
 
@@ -40,16 +51,191 @@ class ReprHack(str):
         return str(self)
 
 
+class SignatureCache(object):
+    """Persistent cache of code generated for signatures
+
+    Code objects (with their source text) are marshalled to a single file
+    keyed by a fingerprint of the signature, so restarted process skips
+    code generation. Entries are only added, so when several processes save
+    the cache they are merged.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._new = {}
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                magic, entries = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return {}
+        if magic != MAGIC_NUMBER:  # other python version
+            return {}
+        return entries
+
+    def get(self, key):
+        if self._entries is None:
+            self._entries = self._read()
+        code = self._entries.get(key)
+        if code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return code
+
+    def put(self, key, code):
+        if self._entries is None:
+            self._entries = self._read()
+        self._entries[key] = code
+        self._new[key] = code
+
+    def save(self):
+        if not self._new:
+            return
+        import tempfile
+        entries = self._read()
+        entries.update(self._new)
+        fd, tmp = tempfile.mkstemp(prefix='.sigcache-',
+            dir=os.path.dirname(os.path.abspath(self.path)))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                marshal.dump((MAGIC_NUMBER, entries), f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._new.clear()
+
+
+_cache = None
+# bump when generated code changes, so that old cache entries are not used
+CODEGEN_VERSION = 3
+
+
+def set_signature_cache(path):
+    """Enables persistent cache of generated signature code
+
+    The cache is saved at exit, or call ``save()`` on the returned
+    :class:`SignatureCache` after warmup.
+    """
+    global _cache
+    if _cache is not None:
+        atexit.unregister(_cache.save)
+    if path is None:
+        _cache = None
+    else:
+        _cache = SignatureCache(path)
+        atexit.register(_cache.save)
+    return _cache
+
+
+def _fingerprint(sig, partial):
+    params = []
+    for name, param in sig.parameters.items():
+        ann = param.annotation
+        if ann is inspect.Parameter.empty:
+            ann = None
+        elif isinstance(ann, type) and issubclass(ann, Sticker):
+            if getattr(ann, 'request_scoped', False):
+                ann = 'sticker'
+            else:
+                ann = 'sticker.direct'
+        elif isinstance(ann, type) and ann.__module__ == 'builtins':
+            ann = 'builtins.' + ann.__name__
+        else:
+            ann = 'type'
+        params.append((name, int(param.kind),
+                       param.default is inspect.Parameter.empty, ann))
+    return repr((MAGIC_NUMBER, CODEGEN_VERSION, partial, params))
+
+
+class LazySignature(object):
+    """Signature which is compiled on the first call
+
+    After compilation the ``_aio_sig`` attribute of the function is replaced
+    by the compiled signature, so further calls don't go through this
+    object.
+    """
+    __slots__ = ('function', 'partial', '_compiled')
+
+    def __init__(self, fun, partial):
+        self.function = fun
+        self.partial = partial
+        self._compiled = None
+
+    def __repr__(self):
+        return '<LazySignature of {!r}{}>'.format(self.function,
+            '' if self._compiled is None else ' compiled')
+
+    def compile(self):
+        sigfun = self._compiled
+        if sigfun is None:
+            sigfun = self._compiled = compile_signature(self.function,
+                                                        self.partial)
+            if getattr(self.function, '_aio_sig', None) is self:
+                self.function._aio_sig = sigfun
+        return sigfun
+
+    def __call__(self, *args, **kwargs):
+        return self.compile()(*args, **kwargs)
+
+
+def _signature_vars(sig):
+    """Globals of the generated code: defaults, stickers and types"""
+    vars = {
+        '__empty__': object(),
+        }
+    for name, param in sig.parameters.items():
+        ann = param.annotation
+        if param.default is not inspect.Parameter.empty:
+            vars[name + '_def'] = param.default
+        if ann is inspect.Parameter.empty:
+            continue
+        if isinstance(ann, type) and issubclass(ann, Sticker):
+            if getattr(ann, 'request_scoped', False):
+                vars[name + '_cls'] = ann
+            else:
+                vars[name + '_create'] = ann.create
+        elif not (isinstance(ann, type) and ann.__module__ == 'builtins'):
+            vars[name + '_type'] = ann
+    return vars
+
+
 def compile_signature(fun, partial):
     sig = inspect.signature(fun)
+    vars = _signature_vars(sig)
+    cache = _cache
+    if cache is not None:
+        key = _fingerprint(sig, partial)
+        entry = cache.get(key)
+        if entry is not None:
+            code, text = entry
+            return _make_signature(code, text, vars)
+    text = _signature_text(sig, partial)
+    code = compile(text, '__sig__', 'exec')
+    if cache is not None:
+        cache.put(key, (code, text))
+    return _make_signature(code, text, vars)
+
+
+def _make_signature(code, text, vars):
+    exec(code, vars)
+    sigfun = asyncio.coroutine(vars['__sig__'])
+    if __debug__:
+        sigfun.__text__ = text
+    return sigfun
+
+
+def _signature_text(sig, partial):
     fun_params = [
         inspect.Parameter('resolver',
             kind=inspect.Parameter.POSITIONAL_OR_KEYWORD)]
     args = []
     kwargs = []
-    vars = {
-        '__empty__': object(),
-        }
     lines = []
     self = True
     varkw = None
@@ -59,7 +245,6 @@ def compile_signature(fun, partial):
     for name, param in sig.parameters.items():
         ann = param.annotation
         if param.default is not inspect.Parameter.empty:
-            vars[name + '_def'] = param.default
             if ann is not inspect.Parameter.empty:
                 # If we have annotation, we want to make sure that annotation
                 # is not applied to a default value so we pass __empty__
@@ -71,9 +256,12 @@ def compile_signature(fun, partial):
             defname = inspect.Parameter.empty
         if ann is not inspect.Parameter.empty:
             if isinstance(ann, type) and issubclass(ann, Sticker):
-                lines.append('  {0} = yield from {0}_create(resolver)'
-                    .format(name))
-                vars[name + '_create'] = ann.create
+                if getattr(ann, 'request_scoped', False):
+                    lines.append('  {0} = yield from '
+                        'resolver.get_sticker({0}_cls)'.format(name))
+                else:
+                    lines.append('  {0} = yield from {0}_create(resolver)'
+                        .format(name))
             else:
                 nposargs += 1
                 lines.append('  if {0} is __empty__:'.format(name))
@@ -86,7 +274,6 @@ def compile_signature(fun, partial):
                         default=defname))
                 else:
                     lines.append('    {0} = {0}_type({0})'.format(name))
-                    vars[name + '_type'] = ann
                     fun_params.append(param.replace(
                         annotation=ReprHack(name + '_type'),
                         default=defname))
@@ -139,10 +326,4 @@ def compile_signature(fun, partial):
             args, nposargs, kwarg_string))
     else:
         lines.append('  return ({}), 0, {}'.format(args, kwarg_string))
-    text = '\n'.join(lines)
-    code = compile(text, '__sig__', 'exec')
-    exec(code, vars)
-    sigfun = asyncio.coroutine(vars['__sig__'])
-    if __debug__:
-        sigfun.__text__ = text
-    return sigfun
+    return '\n'.join(lines)
@@ -0,0 +1,155 @@
+import json
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.jsonify import jsonify
+from aioroutes.batch import BatchResource
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, body=None, cookie=''):
+        self.uri = uri
+        self.method = 'POST'
+        self.content_type = 'application/json'
+        self.body = body
+        self.cookie = cookie
+        self.remote_addr = '10.0.0.1'
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.users_created = 0
+        self.running = 0
+        self.max_running = 0
+
+        test = self
+
+        @web.Sticker.register
+        class User(object):
+            request_scoped = True
+
+            def __init__(self, name):
+                self.name = name
+
+            @classmethod
+            @asyncio.coroutine
+            def create(cls, resolver):
+                test.users_created += 1
+                yield from asyncio.sleep(0.001)
+                return cls(resolver.request.cookies.get('user'))
+
+        @web.Sticker.register
+        class Uid(object):
+
+            def __init__(self, uid):
+                self.id = uid
+
+            @classmethod
+            @asyncio.coroutine
+            def create(cls, resolver):
+                yield from asyncio.sleep(0.001)
+                return cls(resolver.request.form_arguments.get('uid'))
+
+        class Root(web.Resource):
+
+            batch = BatchResource(concurrency=2)
+
+            @jsonify
+            @web.page
+            def profile(self, user: User):
+                return {'name': user.name}
+
+            @web.page
+            def hello(self, name: str, user: User):
+                test.running += 1
+                test.max_running = max(test.max_running, test.running)
+                yield from asyncio.sleep(0.001)
+                test.running -= 1
+                return 'hello {} from {}'.format(name, user.name)
+
+            @web.page
+            def who(self, current: Uid, **kwargs):
+                return current.id
+
+            @web.page
+            def add(self, a: int, b: int = 1):
+                return str(a + b)
+
+            @web.rate_limit(0.001, burst=1)
+            @web.page
+            def limited(self):
+                return 'limited'
+
+        self.site = web.Site(resources=[Root()])
+
+    def batch(self, items, cookie='user=john'):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            status, headers, body = loop.run_until_complete(
+                self.site.dispatch(Request('/batch',
+                    json.dumps(items).encode('utf-8'), cookie)))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        if status != 200:
+            return status
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        return json.loads(body.decode('utf-8'))
+
+    def testCombined(self):
+        res = self.batch([
+            ['GET', '/profile'],
+            {'method': 'GET', 'path': '/hello/world'},
+            ['GET', '/add', {'a': 2, 'b': '3'}],
+            ['GET', '/add?a=7'],
+            ])
+        self.assertEqual([r['status'] for r in res], [200, 200, 200, 200])
+        self.assertEqual(res[0]['body'], {'name': 'john'})
+        self.assertEqual(res[1]['body'], 'hello world from john')
+        self.assertEqual(res[2]['body'], '5')
+        self.assertEqual(res[3]['body'], '8')
+        self.assertEqual(res[0]['headers'],
+                         [['Content-Type', 'application/json']])
+
+    def testSharedStickers(self):
+        res = self.batch([['GET', '/hello/{}'.format(i)] for i in range(6)]
+                         + [['GET', '/profile']])
+        self.assertEqual(self.users_created, 1)
+        self.assertEqual(res[3]['body'], 'hello 3 from john')
+        self.assertEqual(self.max_running, 2)
+
+    def testItemStickers(self):
+        # stickers which aren't request scoped are created for every item
+        res = self.batch([['GET', '/who', {'uid': '1'}],
+                          ['GET', '/who', {'uid': '2'}]])
+        self.assertEqual([r['body'] for r in res], ['1', '2'])
+
+    def testItemErrors(self):
+        res = self.batch([
+            ['GET', '/missing'],
+            ['POST', '/profile'],
+            ['GET'],
+            'junk',
+            ['GET', '/add', {'a': 'x'}],
+            ['GET', '/profile'],
+            ])
+        self.assertEqual([r['status'] for r in res],
+                         [404, 400, 400, 400, 404, 200])
+        self.assertIn('404', res[0]['body'])
+
+    def testRateLimit(self):
+        # items are limited by the address of the batch request
+        res = self.batch([['GET', '/limited']] * 3)
+        self.assertEqual([r['status'] for r in res], [200, 429, 429])
+
+    def testBadBatch(self):
+        self.assertEqual(self.batch({'path': '/'}), 400)
+        self.assertEqual(self.batch([['GET', '/profile']] * 51), 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
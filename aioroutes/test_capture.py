@@ -0,0 +1,135 @@
+import io
+import os
+import asyncio
+import unittest
+import tempfile
+from contextlib import redirect_stdout
+
+import aioroutes as web
+from aioroutes.testing import Client
+from aioroutes.capture import Capture, read_records, replay, compare, main
+
+
+class Root(web.Resource):
+
+    @web.page
+    def index(self):
+        return 'home'
+
+    @web.page
+    def login(self, user: str, password: str):
+        return 'ok:' + user
+
+    @web.page
+    def slow(self):
+        yield from asyncio.sleep(0.01)
+        return 'slow'
+
+    @web.page
+    def move(self):
+        raise web.PathRewrite('/index')
+
+
+site = None  # replayed by the command in testCommands
+
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'traffic.cap')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.dir.cleanup()
+
+    def call(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def record(self, **kwargs):
+        capture = Capture(self.path, **kwargs)
+        client = Client(web.Site(resources=[Root()], capture=capture))
+        self.call(client.get('/'))
+        self.call(client.get('/slow', headers=[
+            ('Cookie', 'session=secret; theme=dark'),
+            ('Authorization', 'Basic xyz'), ('X-Other', 'skipped')]))
+        self.call(client.post('/login?next=/',
+            form={'user': 'joe', 'password': 'secret'}))
+        self.call(client.get('/move?token=abc&page=2'))
+        self.call(client.get('/nothing'))
+        capture.close()
+        return list(read_records(self.path))
+
+    def testCapture(self):
+        index, slow, login, move, nothing = self.record()
+        self.assertEqual(index.method, 'GET')
+        self.assertEqual(index.uri, '/')
+        self.assertEqual(index.status, 200)
+        self.assertLessEqual(index.offset, slow.offset)
+        self.assertGreaterEqual(slow.duration, 0.01)
+        self.assertEqual(dict(slow.headers), {
+            'Cookie': 'session=REDACTED; theme=REDACTED',
+            'Authorization': 'REDACTED'})
+        self.assertEqual(login.method, 'POST')
+        self.assertEqual(login.uri, '/login?next=/')
+        self.assertEqual(login.body, 'user=joe&password=REDACTED')
+        self.assertEqual(login.body_size, len('user=joe&password=secret'))
+        # uri before the internal redirect
+        self.assertEqual(move.uri, '/move?token=REDACTED&page=2')
+        self.assertEqual(move.status, 200)
+        self.assertEqual(nothing.status, 404)
+
+    def testSample(self):
+        self.assertEqual(self.record(sample=0), [])
+        os.unlink(self.path)
+        self.assertEqual(len(self.record(limit=2)), 2)
+        os.unlink(self.path)
+        records = self.record(
+            redact=lambda r: r._replace(uri='/') if r.status == 200 else None)
+        self.assertEqual([r.uri for r in records], ['/'] * 4)
+
+    def testTruncated(self):
+        self.record()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x00\x00\x01\x00abc')
+        self.assertEqual(len(list(read_records(self.path))), 5)
+
+    def testReplay(self):
+        records = self.record()
+        client = Client(web.Site(resources=[Root()]))
+        report = self.call(replay(client, records, rate=None, concurrency=2))
+        self.assertEqual(report.count, 5)
+        self.assertEqual(dict(report.statuses), {200: 4, 404: 1})
+        # spread requests over 0.2 seconds
+        records = [r._replace(offset=i * 0.05) for i, r in enumerate(records)]
+        report = self.call(replay(client, records))
+        self.assertEqual(report.count, 5)
+        self.assertGreaterEqual(report.seconds, 0.2)
+        report = self.call(replay(client, records, rate=4))
+        self.assertLess(report.seconds, 0.2)
+        self.assertIn('p99', compare(report, report))
+
+    def testCommands(self):
+        global site
+        self.record()
+        site = web.Site(resources=[Root()])
+        out = io.StringIO()
+        reports = [os.path.join(self.dir.name, name)
+                   for name in ('a.lat', 'b.lat')]
+        with redirect_stdout(out):
+            main(['show', self.path])
+            for name in reports:
+                main(['replay', self.path, 'aioroutes.test_capture:site',
+                      '--fast', '--output', name])
+            main(['compare'] + reports)
+        text = out.getvalue()
+        self.assertIn('/login?next=/ -> 200', text)
+        self.assertIn('5 requests', text)
+        self.assertIn('change', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.jsonify import jsonify
+from aioroutes.etag import etag, parse_if_none_match
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, if_none_match=None):
+        self.uri = uri
+        self.headers = {}
+        if if_none_match is not None:
+            self.headers['If-None-Match'] = if_none_match
+
+
+class TestEtag(unittest.TestCase):
+
+    def setUp(self):
+        self.runs = 0
+        self.version = 1
+
+        test = self
+
+        class Root(web.Resource):
+
+            @etag
+            @jsonify
+            @web.page
+            def feed(self):
+                test.runs += 1
+                return {'items': [1, 2, 3]}
+
+            @etag(version=lambda self, resolver: test.version,
+                  cache_control='no-cache')
+            @jsonify
+            @web.page
+            def versioned(self):
+                test.runs += 1
+                return {'version': test.version}
+
+            @etag
+            @web.page
+            def text(self):
+                return 'hello'
+
+        self.site = web.Site(resources=[Root()])
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def resolve(self, *args):
+        return self.loop.run_until_complete(
+            self.site.dispatch(Request(*args)))
+
+    def testParse(self):
+        self.assertEqual(parse_if_none_match('"a", W/"b" ,"c"'),
+                         {'"a"', '"b"', '"c"'})
+        self.assertEqual(parse_if_none_match('*'), {'*'})
+        self.assertEqual(parse_if_none_match('"a", garbage'), set())
+        self.assertEqual(parse_if_none_match(None), set())
+
+    def testStrong(self):
+        status, headers, body = self.resolve('/feed')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'{"items":[1,2,3]}')
+        tag = dict(headers)['ETag']
+        self.assertTrue(tag.startswith('"'))
+        status, headers, body = self.resolve('/feed', tag)
+        self.assertEqual(status, 304)
+        self.assertEqual(dict(headers)['ETag'], tag)
+        self.assertEqual(body, b'')
+        self.assertEqual(self.runs, 2)
+        status, headers, body = self.resolve('/feed', '"other", W/' + tag)
+        self.assertEqual(status, 304)
+        status, headers, body = self.resolve('/feed', '"other"')
+        self.assertEqual(status, 200)
+
+    def testBareString(self):
+        status, headers, body = self.resolve('/text')
+        self.assertEqual(body, b'hello')
+        status, _, _ = self.resolve('/text', dict(headers)['ETag'])
+        self.assertEqual(status, 304)
+
+    def testVersion(self):
+        status, headers, body = self.resolve('/versioned')
+        self.assertEqual(status, 200)
+        headers = dict(headers)
+        self.assertEqual(headers['ETag'], 'W/"1"')
+        self.assertEqual(headers['Cache-Control'], 'no-cache')
+        self.assertEqual(self.runs, 1)
+        status, headers, body = self.resolve('/versioned', 'W/"1"')
+        self.assertEqual(status, 304)
+        self.assertEqual(dict(headers)['Cache-Control'], 'no-cache')
+        self.assertEqual(self.runs, 1)  # leaf was not run
+        self.version = 2
+        status, headers, body = self.resolve('/versioned', 'W/"1"')
+        self.assertEqual(status, 200)
+        self.assertEqual(dict(headers)['ETag'], 'W/"2"')
+        self.assertEqual(self.runs, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
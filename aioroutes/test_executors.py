@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import unittest
+import threading
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.executors import ThreadPool, in_executor, blocking
+from aioroutes.executors import ProcessPool, in_process
+from aioroutes.executors import REJECT, CALLER_RUNS, SHARED_MEMORY_DIR
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+class Reports(web.Resource):
+
+    @web.page
+    @in_process(pool='test_processes')
+    def pid(self):
+        return str(os.getpid())
+
+    @web.page
+    @in_process(pool='test_processes')
+    def render(self, size: int):
+        return b'x' * size
+
+    @web.page
+    @in_process(pool='test_processes')
+    def slow_render(self, size: int):
+        time.sleep(0.2)
+        return b'x' * size
+
+    @web.page
+    @in_process(pool='test_caller_processes')
+    def caller_pid(self):
+        return str(os.getpid())
+
+
+class TestThreadPool(unittest.TestCase):
+
+    def setUp(self):
+        self.event = threading.Event()
+        self.threads = {}
+
+        test = self
+
+        @web.Sticker.register
+        class Thread(object):
+            @classmethod
+            @asyncio.coroutine
+            def create(cls, resolver):
+                test.threads['sticker'] = threading.get_ident()
+                return cls()
+
+        def mark(fun):
+            @web.postprocessor(fun)
+            def processor(self, resolver, value):
+                test.threads['post'] = threading.get_ident()
+                return value
+            return processor
+
+        class Root(web.Resource):
+
+            @mark
+            @web.page
+            @blocking
+            def default(self, value, thread: Thread):
+                test.threads['body'] = threading.get_ident()
+                return 'default:' + value
+
+            @web.page
+            @in_executor(pool='test_reject')
+            def reject(self):
+                test.event.wait(1)
+                return 'reject'
+
+            @web.page
+            @in_executor(pool='test_caller')
+            def caller(self):
+                test.event.wait(1)
+                test.threads.setdefault('caller', set()).add(
+                    threading.get_ident())
+                return 'caller'
+
+        self.reject_pool = ThreadPool('test_reject', 1,
+            queue_size=0, policy=REJECT)
+        self.caller_pool = ThreadPool('test_caller', 1,
+            queue_size=0, policy=CALLER_RUNS)
+        self.site = web.Site(resources=[Root()])
+
+    def tearDown(self):
+        self.event.set()
+        self.reject_pool.shutdown()
+        self.caller_pool.shutdown()
+
+    def dispatch(self, *uris):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            tasks = [asyncio.ensure_future(
+                        self.site._safe_dispatch(Request(uri)))
+                     for uri in uris]
+            loop.call_later(0.05, self.event.set)
+            return loop.run_until_complete(asyncio.gather(*tasks))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testThreads(self):
+        self.assertEqual(self.dispatch('/x'), ['default:x'])
+        main = threading.get_ident()
+        self.assertEqual(self.threads['sticker'], main)
+        self.assertEqual(self.threads['post'], main)
+        self.assertNotEqual(self.threads['body'], main)
+
+    def testReject(self):
+        first, second = self.dispatch('/reject', '/reject')
+        self.assertEqual(first, 'reject')
+        self.assertEqual(second[0], 503)
+        self.assertEqual(self.reject_pool.rejected, 1)
+        self.assertEqual(self.reject_pool.pending, 0)
+
+    def testCallerRuns(self):
+        self.event.set()  # caller runs function in the loop, don't block it
+        self.assertEqual(self.dispatch('/caller', '/caller'),
+                         ['caller', 'caller'])
+        self.assertEqual(self.caller_pool.caller_runs, 1)
+        self.assertIn(threading.get_ident(), self.threads['caller'])
+
+    def testCoroutine(self):
+        with self.assertRaises(TypeError):
+            blocking(web.page(lambda self: 'x'))
+
+
+class TestProcessPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ProcessPool('test_processes', 1,
+                                shared_memory_threshold=1024)
+        self.caller_pool = ProcessPool('test_caller_processes', 1,
+                                       queue_size=0, policy=CALLER_RUNS)
+        self.site = web.Site(resources=[Reports()])
+
+    def tearDown(self):
+        self.pool.shutdown()
+        self.caller_pool.shutdown()
+
+    def dispatch(self, *uris):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            result = loop.run_until_complete(asyncio.gather(
+                *[self.site._safe_dispatch(Request(uri)) for uri in uris]))
+            return result[0] if len(uris) == 1 else result
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testProcess(self):
+        pid = self.dispatch('/pid')
+        self.assertNotEqual(pid, str(os.getpid()))
+        self.assertEqual(self.dispatch('/pid'), pid)
+        self.assertEqual(self.pool.pending, 0)
+
+    def testSharedResult(self):
+        self.assertEqual(self.dispatch('/render?size=10'), b'x' * 10)
+        self.assertEqual(self.dispatch('/render?size=100000'),
+                         b'x' * 100000)
+
+    def testCallerRuns(self):
+        pids = self.dispatch('/caller_pid', '/caller_pid')
+        self.assertEqual(self.caller_pool.caller_runs, 1)
+        self.assertIn(str(os.getpid()), pids)
+        self.assertEqual(len(set(pids)), 2)
+
+    @unittest.skipIf(SHARED_MEMORY_DIR is None, "no shared memory")
+    def testCancelledSharedResult(self):
+        def files():
+            return {name for name in os.listdir(SHARED_MEMORY_DIR)
+                    if name.startswith('aioroutes-')}
+        self.dispatch('/pid')  # start the worker
+        before = files()
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            task = asyncio.ensure_future(self.site._safe_dispatch(
+                Request('/slow_render?size=100000')))
+            loop.run_until_complete(asyncio.sleep(0.05))
+            task.cancel()
+            while self.pool.pending:
+                loop.run_until_complete(asyncio.sleep(0.01))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertTrue(task.cancelled())
+        self.assertEqual(files(), before)
+
+    def testLocalFunction(self):
+        with self.assertRaises(TypeError):
+            in_process()(lambda self: 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
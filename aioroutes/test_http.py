@@ -0,0 +1,159 @@
+import unittest
+
+from aioroutes.http import BaseHTTPRequest, FormArguments, Cookies
+from aioroutes.http import CompactHTTPRequest, RawHeaders
+from aioroutes.http import split_target, split_path, FORM_CONTENT_TYPE
+from aioroutes.exceptions import PathRewrite
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, body=None, content_type=FORM_CONTENT_TYPE):
+        self.uri = uri
+        self.body = body
+        self.content_type = content_type
+
+
+class TestFormArguments(unittest.TestCase):
+
+    def testQuery(self):
+        args = Request('/x?a=1&b=2').form_arguments
+        self.assertEqual(dict(args), {'a': '1', 'b': '2'})
+
+    def testBlank(self):
+        args = Request('/x?a=&b&c=3').form_arguments
+        self.assertEqual(dict(args), {'c': '3'})
+
+    def testRepeated(self):
+        args = Request('/x?a=1&a=2', b'a=3').form_arguments
+        self.assertEqual(args['a'], '3')
+        self.assertEqual(args.getlist('a'), ['1', '2', '3'])
+        self.assertEqual(len(args), 1)
+
+    def testDecode(self):
+        args = Request('/x?q=a+b%20c&%6B=v').form_arguments
+        self.assertEqual(args['q'], 'a b c')
+        self.assertEqual(args['k'], 'v')
+
+    def testUtf8Body(self):
+        args = Request('/x', 'name=Пётр'.encode('utf-8')).form_arguments
+        self.assertEqual(args['name'], 'Пётр')
+        args = Request('/x', b'name=%D0%9F%D1%91%D1%82%D1%80').form_arguments
+        self.assertEqual(args['name'], 'Пётр')
+
+    def testBodyContentType(self):
+        args = Request('/x?a=1', b'b=2', 'text/plain').form_arguments
+        self.assertEqual(dict(args), {'a': '1'})
+
+    def testLegacy(self):
+        args = Request('/x?a=1&a=2').legacy_arguments
+        self.assertIn('a', args)
+        self.assertNotIn('b', args)
+        self.assertEqual(args.getlist('a'), ['1', '2'])
+        with self.assertRaises(KeyError):
+            args.getlist('b')
+
+    def testLazy(self):
+        args = FormArguments(b'a=%31&b=%32')
+        self.assertEqual(args['a'], '1')
+        self.assertEqual(args._values, ['1', b'%32'])
+
+
+class TestCookies(unittest.TestCase):
+
+    def testSimple(self):
+        cookies = Cookies('a=1; b=2;c=3')
+        self.assertEqual(dict(cookies), {'a': '1', 'b': '2', 'c': '3'})
+
+    def testQuoted(self):
+        cookies = Cookies(r'a="x\"y\054z"; b=""')
+        self.assertEqual(cookies['a'], 'x"y,z')
+        self.assertEqual(cookies['b'], '')
+
+    def testMissing(self):
+        cookies = Cookies('a=1; junk; =2')
+        self.assertNotIn('junk', cookies)
+        self.assertEqual(len(cookies), 1)
+        with self.assertRaises(KeyError):
+            cookies['b']
+
+    def testLazy(self):
+        cookies = Cookies('a="1"; b="2"')
+        self.assertEqual(cookies['a'], '1')
+        self.assertEqual(cookies._decoded, {'a': '1'})
+
+    def testRequest(self):
+        req = Request('/')
+        req.cookie = 'sid=abc'
+        self.assertEqual(req.cookies['sid'], 'abc')
+
+
+class TestTarget(unittest.TestCase):
+
+    def testSplit(self):
+        self.assertEqual(split_target('/a/b?x=1'), ('/a/b', 'x=1'))
+        self.assertEqual(split_target('/a/b'), ('/a/b', ''))
+        self.assertEqual(split_target('/a#f?x'), ('/a', ''))
+        self.assertEqual(split_target('/a?x#f'), ('/a', 'x'))
+        self.assertEqual(split_target('http://example.com/a?x=1'),
+                         ('/a', 'x=1'))
+
+    def testSegments(self):
+        self.assertEqual(split_path('/'), ())
+        self.assertEqual(split_path('/a//b/'), ('a', '', 'b'))
+        self.assertEqual(split_path('/a%2Fb/%D0%B6'), ('a/b', 'ж'))
+
+    def testRewrite(self):
+        req = Request('/a/b?x=1')
+        self.assertEqual(req.path_segments, ('a', 'b'))
+        self.assertEqual(req.parsed_uri.path, '/a/b')
+        PathRewrite('/c?y=2').update_request(req)
+        self.assertEqual(req.path_segments, ('c',))
+        self.assertEqual(req.target, ('/c', 'y=2'))
+        self.assertEqual(req.parsed_uri.path, '/c')
+
+
+class TestCompactRequest(unittest.TestCase):
+
+    raw = [(b'Host', b'example.com'), (b'Cookie', b'a=1'),
+           (b'Content-Type', FORM_CONTENT_TYPE.encode('ascii')),
+           (b'cookie', b'b=2'), (b'X-Name', b'caf\xe9')]
+
+    def testHeaders(self):
+        headers = RawHeaders(self.raw)
+        self.assertEqual(headers['HOST'], 'example.com')
+        self.assertEqual(headers.get('x-name'), 'caf\xe9')
+        self.assertEqual(headers.get('missing'), None)
+        self.assertIn('Content-Type', headers)
+        self.assertEqual(headers.getall('Cookie'), ['a=1', 'b=2'])
+        self.assertEqual(len(headers), 4)
+
+    def testRequest(self):
+        req = CompactHTTPRequest('POST', '/a/b?x=1', self.raw)
+        self.assertFalse(hasattr(req, '__dict__'))
+        req.body = b'y=2'
+        self.assertEqual(req.content_type, FORM_CONTENT_TYPE)
+        self.assertEqual(req.cookie, 'a=1; b=2')
+        self.assertEqual(dict(req.cookies), {'a': '1', 'b': '2'})
+        self.assertEqual(req.path_segments, ('a', 'b'))
+        self.assertEqual(req.form_arguments['x'], '1')
+        self.assertEqual(req.form_arguments['y'], '2')
+        PathRewrite('/c').update_request(req)
+        self.assertEqual(req.path_segments, ('c',))
+        with self.assertRaises(AttributeError):
+            req.something = 1
+
+    def testReset(self):
+        req = CompactHTTPRequest('POST', '/a?x=1', self.raw)
+        req.body = b'y=2'
+        self.assertEqual(req.form_arguments['y'], '2')
+        req.reset('GET', '/b', [(b'Cookie', b'c=3')])
+        self.assertEqual(req.method, 'GET')
+        self.assertEqual(req.path_segments, ('b',))
+        self.assertEqual(req.content_type, None)
+        self.assertEqual(req.cookies['c'], '3')
+        self.assertNotIn('y', req.form_arguments)
+        self.assertIsNone(getattr(req, 'body', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import json
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes import jsonify
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.exceptions import ServiceUnavailable
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+class Counter(object):
+
+    def __init__(self, n):
+        self.n = n
+        self.i = 0
+
+    def __aiter__(self):
+        return self
+
+    @asyncio.coroutine
+    def __anext__(self):
+        yield from asyncio.sleep(0)
+        if self.i >= self.n:
+            raise StopAsyncIteration()
+        self.i += 1
+        return {'i': self.i}
+
+
+class Value(object):
+    """Awaitable which is neither a generator nor a future"""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __await__(self):
+        yield  # let the loop run once, like asyncio.sleep(0)
+        return self.value
+
+
+class Letters(object):
+
+    def __init__(self, text):
+        self.chars = iter(text)
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        for char in self.chars:
+            return Value(char)
+        raise StopAsyncIteration()
+
+
+class JSONSite(web.Site):
+
+    @asyncio.coroutine
+    def error_page(self, e):
+        return jsonify.error_page(e)
+
+
+class TestJSON(unittest.TestCase):
+
+    def setUp(self):
+
+        class Root(web.Resource):
+
+            @jsonify.jsonify
+            @web.page
+            def user(self, uid: int):
+                return {'id': uid, 'name': 'Пётр'}
+
+            @jsonify.jsonify(stream=True)
+            @web.page
+            def items(self, n: int):
+                return map(lambda i: {'i': i}, range(n))
+
+            @jsonify.jsonify(stream=True)
+            @web.page
+            def events(self, n: int):
+                return Counter(n)
+
+            @jsonify.jsonify(stream=True)
+            @web.page
+            def letters(self, text: str):
+                return Letters(text)
+
+            @jsonify.jsonify
+            @web.page
+            def explicit(self):
+                return jsonify.JSONStream(iter([1, 2]))
+
+            @web.page
+            def busy(self):
+                raise ServiceUnavailable(retry_after=5)
+
+        self.site = JSONSite(resources=[Root()])
+
+    def dispatch(self, uri):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            status, headers, body = loop.run_until_complete(
+                self.site.dispatch(Request(uri)))
+            if isinstance(body, web.http.StreamingBody):
+                chunks = []
+                while True:
+                    chunk = loop.run_until_complete(body.read())
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                body = chunks
+            return status, headers, body
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testObject(self):
+        status, headers, body = self.dispatch('/user/7')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertIsInstance(body, bytes)
+        self.assertEqual(json.loads(body.decode('utf-8')),
+                         {'id': 7, 'name': 'Пётр'})
+
+    def testStream(self):
+        status, headers, chunks = self.dispatch('/items/20000')
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b''.join(chunks).decode('utf-8')),
+                         [{'i': i} for i in range(20000)])
+
+    def testEmptyStream(self):
+        _, _, chunks = self.dispatch('/items/0')
+        self.assertEqual(chunks, [b'[]'])
+
+    def testAsyncStream(self):
+        _, _, chunks = self.dispatch('/events/3')
+        self.assertEqual(chunks,
+            [b'[{"i":1}', b',{"i":2}', b',{"i":3}', b']'])
+
+    def testAwaitable(self):
+        _, _, chunks = self.dispatch('/letters/ab')
+        self.assertEqual(chunks, [b'["a"', b',"b"', b']'])
+
+    def testExplicitStream(self):
+        _, _, chunks = self.dispatch('/explicit')
+        self.assertEqual(chunks, [b'[1,2]'])
+
+    def testErrors(self):
+        status, headers, body = self.dispatch('/missing')
+        self.assertEqual(status, 404)
+        self.assertEqual(headers, [('Content-Type', 'application/json')])
+        self.assertEqual(json.loads(body.decode('ascii')),
+            {'error': {'status': 404, 'message': 'Not Found'}})
+        status, headers, body = self.dispatch('/busy')
+        self.assertEqual(status, 503)
+        self.assertIn(('Retry-After', '5'), headers)
+
+    def testFallback(self):
+        encoder = jsonify.JSONEncoder(fast=False)
+        self.assertEqual(encoder.encode({'a': [1, 'ж']}),
+                         '{"a":[1,"ж"]}'.encode('utf-8'))
+        self.assertEqual(jsonify.default_encoder.encode({1: 2**70}),
+                         b'{"1":1180591620717411303424}')
+
+    def testDefault(self):
+        encoder = jsonify.JSONEncoder(default=sorted)
+        self.assertEqual(encoder.encode({'a': {3, 1, 2}}), b'{"a":[1,2,3]}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.exceptions import TooManyRequests, ServiceUnavailable
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, remote_addr=None):
+        self.uri = uri
+        self.remote_addr = remote_addr
+
+
+class TestConcurrencyLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.release = None
+
+        test = self
+
+        class Root(web.Resource):
+
+            @web.concurrency_limit(1, queue_size=1)
+            @web.page
+            def single(self):
+                yield from test.release
+                return 'single'
+
+            @web.concurrency_limit('shared')
+            @web.page
+            def first(self):
+                yield from test.release
+                return 'first'
+
+            @web.page
+            @web.concurrency_limit('shared')
+            def second(self):
+                yield from test.release
+                return 'second'
+
+        self.shared = web.ConcurrencyLimit(1, queue_size=5, timeout=0.01)
+        self.site = web.Site(resources=[Root()],
+                             limits={'shared': self.shared})
+
+    def dispatch(self, *uris):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self.release = asyncio.Future()
+            tasks = [asyncio.ensure_future(
+                        self.site._safe_dispatch(Request(uri)))
+                     for uri in uris]
+            loop.run_until_complete(asyncio.sleep(0.001))
+            self.release.set_result(None)
+            return loop.run_until_complete(asyncio.gather(*tasks))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testQueue(self):
+        self.assertEqual(self.dispatch('/single', '/single'),
+                         ['single', 'single'])
+        limit = self.site.resources[0].single._aio_limit
+        self.assertEqual(limit.inflight, 0)
+        self.assertEqual(limit.shed_count, 0)
+
+    def testShed(self):
+        res = self.dispatch('/single', '/single', '/single')
+        self.assertEqual(res[:2], ['single', 'single'])
+        self.assertEqual(res[2][0], 503)
+        self.assertIn(('Retry-After', '1'), res[2][1])
+        limit = self.site.resources[0].single._aio_limit
+        self.assertEqual(limit.shed_count, 1)
+        self.assertEqual(limit.inflight, 0)
+        self.assertEqual(limit.queue_depth, 0)
+
+    def testTimeout(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self.release = asyncio.Future()
+            first = asyncio.ensure_future(
+                self.site._safe_dispatch(Request('/first')))
+            second = loop.run_until_complete(
+                self.site._safe_dispatch(Request('/second')))
+            self.assertEqual(second[0], 503)
+            self.release.set_result(None)
+            self.assertEqual(loop.run_until_complete(first), 'first')
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertEqual(self.shared.timeout_count, 1)
+        self.assertEqual(self.shared.inflight, 0)
+
+    def testMisconfigured(self):
+
+        class Root(web.Resource):
+
+            @web.concurrency_limit('unknown')
+            @web.page
+            def index(self):
+                return 'index'
+
+        with self.assertRaises(RuntimeError):
+            web.Site(resources=[Root()])
+
+
+class TestRateLimit(unittest.TestCase):
+
+    def setUp(self):
+        self.created = 0
+        test = self
+
+        class User(object):
+
+            @classmethod
+            @asyncio.coroutine
+            def create(cls, resolver):
+                test.created += 1
+                return cls()
+        web.Sticker.register(User)
+
+        class Api(web.Resource):
+
+            @web.page
+            def call(self):
+                return 'call'
+
+        class Root(web.Resource):
+
+            @web.rate_limit(1, burst=2)
+            @web.page
+            def login(self, user: User):
+                return 'login'
+
+            @web.rate_limit('shared')
+            @web.rate_limit(100, burst=2, key=lambda ctx: 'everybody')
+            @web.page
+            def search(self):
+                return 'search'
+
+            @web.page
+            def index(self):
+                return 'index'
+
+            @web.rate_limit(1, burst=1)
+            @web.resource
+            def api(self):
+                return Api()
+
+        self.shared = web.RateLimit(1, burst=1)
+        self.everybody = web.RateLimit(0.01, burst=2, key=lambda ctx: 'all')
+        self.site = web.Site(resources=[Root()],
+                             limits={'shared': self.shared})
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def dispatch(self, uri, addr='10.0.0.1'):
+        result = self.loop.run_until_complete(
+            self.site._safe_dispatch(Request(uri, addr)))
+        return result if isinstance(result, str) else result[0]
+
+    def testBurst(self):
+        self.assertEqual(self.dispatch('/login'), 'login')
+        self.assertEqual(self.dispatch('/login'), 'login')
+        result = self.loop.run_until_complete(
+            self.site._safe_dispatch(Request('/login', '10.0.0.1')))
+        self.assertEqual(result[0], 429)
+        self.assertIn(('Retry-After', '1'), result[1])
+        # sticker is not created for rejected request
+        self.assertEqual(self.created, 2)
+        # other clients and other pages are not affected
+        self.assertEqual(self.dispatch('/login', '10.0.0.2'), 'login')
+        self.assertEqual(self.dispatch('/index'), 'index')
+        limit = self.site.resources[0].login._aio_rate_limits[0]
+        self.assertEqual(limit.allowed_count, 3)
+        self.assertEqual(limit.rejected_count, 1)
+
+    def testResource(self):
+        self.assertEqual(self.dispatch('/api/call'), 'call')
+        self.assertEqual(self.dispatch('/api/call'), 429)
+
+    def testComposed(self):
+        self.assertEqual(self.dispatch('/search'), 'search')
+        self.assertEqual(self.dispatch('/search'), 429)
+        self.assertEqual(self.shared.rejected_count, 1)
+        # limits are checked in order, so rejected request took no token
+        # from the second one
+        self.assertEqual(self.dispatch('/search', '10.0.0.2'), 'search')
+        self.assertEqual(self.dispatch('/search', '10.0.0.3'), 429)
+        self.assertEqual(self.shared.rejected_count, 1)
+        self.site.rate_limits.append(self.everybody)
+        self.assertEqual(self.dispatch('/index'), 'index')
+        self.assertEqual(self.dispatch('/index'), 'index')
+        self.assertEqual(self.dispatch('/index', '10.0.0.2'), 429)
+        self.assertEqual(self.everybody.rejected_count, 1)
+
+    def testNoKey(self):
+        for i in range(3):
+            self.assertEqual(self.dispatch('/login', None), 'login')
+
+    def testRefill(self):
+        limit = web.RateLimit(2, burst=2)
+        self.assertEqual(limit.take('a', 0.0), 0)
+        self.assertEqual(limit.take('a', 0.0), 0)
+        self.assertAlmostEqual(limit.take('a', 0.0), 0.5)
+        self.assertAlmostEqual(limit.take('a', 0.25), 0.25)
+        self.assertEqual(limit.take('a', 0.5), 0)
+        self.assertEqual(limit.take('a', 10.0), 0)
+        self.assertEqual(limit.take('a', 10.0), 0)
+        self.assertGreater(limit.take('a', 10.0), 0)
+
+    def testEviction(self):
+        limit = web.RateLimit(1, burst=1, size=64, ways=4)
+        self.assertEqual(limit.take('victim', 0.0), 0)
+        self.assertGreater(limit.take('victim', 0.0), 0)
+        for i in range(10000):
+            limit.take('spray{}'.format(i), 1.0 + i)
+        self.assertEqual(len(limit._keys), 64)
+        self.assertLessEqual(sum(k is not None for k in limit._keys), 64)
+        self.assertGreater(limit.evicted_count, 10000 - 64)
+        # recently used keys survive
+        self.assertGreater(limit.take('spray9999', 9999.5), 0)
+
+    def testMisconfigured(self):
+
+        class Root(web.Resource):
+
+            @web.rate_limit('unknown')
+            @web.page
+            def index(self):
+                return 'index'
+
+        with self.assertRaises(RuntimeError):
+            web.Site(resources=[Root()])
+
+    def testRetryAfter(self):
+        # seconds are rounded up to the integer header value
+        for exc in (TooManyRequests, ServiceUnavailable):
+            self.assertIn(('Retry-After', '3'), exc(2.01).headers())
+            self.assertIn(('Retry-After', '2'), exc(2).headers())
+
+
+if __name__ == '__main__':
+    unittest.main()
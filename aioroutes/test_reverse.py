@@ -0,0 +1,131 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, method='GET'):
+        self.uri = uri
+        self.method = method
+
+
+@web.Sticker.register
+class User(object):
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        return cls()
+
+
+class TestReverse(unittest.TestCase):
+
+    def setUp(self):
+
+        class Forum(web.Resource):
+
+            @web.page
+            def index(self, page: int = 1):
+                return 'forum:{}'.format(page)
+
+            @web.page
+            def topic(self, id: int, user: User, slug: str = '', *,
+                      page: int = 1):
+                return 'topic:{}:{}:{}'.format(id, slug, page)
+
+        class Files(web.Resource):
+
+            @web.page
+            def default(self, *path):
+                return 'files:' + '/'.join(path)
+
+        class Item(web.Resource):
+            http_resolver = web.MethodResolver()
+
+            @web.page
+            def GET(self, id: int):
+                return 'item:{}'.format(id)
+
+        class Root(web.Resource):
+
+            forum = Forum()
+            files = Files()
+            item = Item()
+            topic = web.alias('forum/topic')
+
+            @web.page
+            def index(self):
+                return 'home'
+
+            @web.page
+            def echo(self, *args, q=None, url=None):
+                return 'echo:{}:{}:{}'.format('/'.join(args), q, url)
+
+        self.root = Root()
+        self.site = web.Site(resources=[self.root])
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def resolve(self, uri):
+        return self.loop.run_until_complete(
+            self.site._resolve(Request(uri)))
+
+    def testLeaf(self):
+        url = self.site.url_for(self.root.forum.topic, 12)
+        self.assertEqual(url, '/forum/topic/12')
+        self.assertEqual(self.resolve(url), 'topic:12::1')
+        url = self.site.url_for(self.root.forum.topic, 12, 'a b/c', page=3)
+        self.assertEqual(url, '/forum/topic/12?slug=a%20b%2Fc&page=3')
+        self.assertEqual(self.resolve(url), 'topic:12:a b/c:3')
+
+    def testIndex(self):
+        self.assertEqual(self.site.url_for(self.root), '/')
+        self.assertEqual(self.site.url_for(self.root.forum, page=2),
+                         '/forum?page=2')
+        self.assertEqual(self.site.url_for(self.root.forum.index),
+                         '/forum')
+        self.assertEqual(self.resolve('/forum?page=2'), 'forum:2')
+
+    def testPath(self):
+        self.assertEqual(self.site.url_for('/forum/topic', 5),
+                         '/forum/topic/5')
+        self.assertEqual(self.site.url_for('/forum/index'), '/forum')
+        self.assertEqual(self.site.url_for('/item', id=3), '/item?id=3')
+        self.assertEqual(self.resolve('/item?id=3'), 'item:3')
+        with self.assertRaises(LookupError):
+            self.site.url_for('/nothing')
+
+    def testDefault(self):
+        url = self.site.url_for(self.root.files.default, 'js', 'app.js')
+        self.assertEqual(url, '/files/js/app.js')
+        self.assertEqual(self.resolve(url), 'files:js/app.js')
+
+    def testAlias(self):
+        # alias is bound to the same method, url is the canonical one
+        self.assertEqual(self.site.url_for(self.root.topic, 1),
+                         '/forum/topic/1')
+
+    def testLocalNames(self):
+        # parameters named like the locals of the generated builder
+        url = self.site.url_for(self.root.echo, 'a', q='x')
+        self.assertEqual(url, '/echo/a?q=x')
+        self.assertEqual(self.resolve(url), 'echo:a:x:None')
+        self.assertEqual(self.site.url_for(self.root.echo), '/echo')
+        self.assertEqual(self.site.url_for(self.root.echo, url='/'),
+                         '/echo?url=%2F')
+
+    def testBuilder(self):
+        build = self.site.url_builder(self.root.forum.topic)
+        self.assertIs(build, self.site.url_builder('/forum/topic'))
+        self.assertEqual([build(i) for i in range(3)],
+            ['/forum/topic/0', '/forum/topic/1', '/forum/topic/2'])
+        with self.assertRaises(TypeError):
+            build()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import asyncio
+import unittest
+import tempfile
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.exceptions import NotFound
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+class TestRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = web.RouteTable.from_items({
+            'a': '1',
+            'ab': '2',
+            'abd': '3',
+            'b': '4',
+            'ж': 'юникод',
+            'docs/': 'docs',
+            'docs/api/': 'api',
+            })
+
+    def testGet(self):
+        self.assertEqual(len(self.table), 7)
+        self.assertEqual(self.table['ab'], '2')
+        self.assertEqual(self.table.get('ж'), 'юникод')
+        self.assertIsNone(self.table.get('abc'))
+        self.assertNotIn('', self.table)
+        self.assertNotIn('c', self.table)
+        with self.assertRaises(KeyError):
+            self.table['x']
+
+    def testIter(self):
+        self.assertEqual(list(self.table),
+            ['a', 'ab', 'abd', 'b', 'docs/', 'docs/api/', 'ж'])
+
+    def testPrefix(self):
+        self.assertEqual(list(self.table.prefix('ab')),
+                         [('ab', '2'), ('abd', '3')])
+        self.assertEqual(list(self.table.prefix('c')), [])
+        self.assertEqual(len(list(self.table.prefix(''))), 7)
+
+    def testLongestMatch(self):
+        match = self.table.longest_match
+        self.assertEqual(match('abc'), ('ab', '2'))
+        self.assertEqual(match('abd'), ('abd', '3'))
+        self.assertEqual(match('abz'), ('ab', '2'))
+        self.assertEqual(match('docs/api/v1'), ('docs/api/', 'api'))
+        self.assertEqual(match('docs/tutorial'), ('docs/', 'docs'))
+        self.assertIsNone(match('c'))
+        self.assertIsNone(match(''))
+
+    def testEmpty(self):
+        table = web.RouteTable.from_items([])
+        self.assertEqual(len(table), 0)
+        self.assertIsNone(table.get('a'))
+        self.assertIsNone(table.longest_match('a'))
+
+    def testBadKey(self):
+        with self.assertRaises(ValueError):
+            web.RouteTable.from_items({'a\0': 'b'})
+
+
+class TestRouteTableResource(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'pages.tbl')
+        web.RouteTable.write(self.path, {'about': 'About us'})
+
+        class Page(web.Resource):
+
+            def __init__(self, title):
+                self.title = title
+
+            @web.page
+            def index(self):
+                return self.title
+
+        class Pages(web.RouteTableResource):
+
+            def child(self, name, value):
+                return Page(value)
+
+        self.pages = Pages(self.path)
+        self.site = web.Site(resources=[self.pages])
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def resolve(self, uri):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                self.site._resolve(Request(uri)))
+        finally:
+            loop.close()
+
+    def testResolve(self):
+        self.assertEqual(self.resolve('/about'), 'About us')
+        with self.assertRaises(NotFound):
+            self.resolve('/contacts')
+
+    def testReload(self):
+        old = self.pages.table
+        web.RouteTable.write(self.path,
+            {'about': 'About', 'contacts': 'Contacts'})
+        self.assertEqual(self.resolve('/about'), 'About us')
+        self.pages.reload()
+        self.assertEqual(self.resolve('/contacts'), 'Contacts')
+        self.assertEqual(old['about'], 'About us')
+        self.assertEqual(os.listdir(self.dir.name), ['pages.tbl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
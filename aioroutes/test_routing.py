@@ -1,5 +1,6 @@
 import asyncio
 import unittest
+import threading
 from time import time
 from functools import wraps
 
@@ -7,6 +8,7 @@ from functools import wraps
 import aioroutes as web
 from aioroutes.http import BaseHTTPRequest
 from aioroutes.exceptions import OutOfScopeError, NotFound, MethodNotAllowed
+from aioroutes.watchdog import SlowRequestWatchdog
 
 
 def instantiate(klass):
@@ -442,6 +444,7 @@ class TestMethod(unittest.TestCase):
                 self.about = About()
                 self.hello = Hello()
                 self.greeting = Greeting()
+                self.api = Api()
 
             @web.resource
             def forum(self, uid:int):
@@ -484,6 +487,20 @@ class TestMethod(unittest.TestCase):
             def PATCH(self, topic:int):
                 return "set:forum(user:{},topic:{})".format(self.user, topic)
 
+        class Api(web.Resource):
+            """Provides method leaves dynamically"""
+            http_resolver = web.MethodResolver()
+
+            @asyncio.coroutine
+            def resolve_local(self, name):
+                if name == 'GET':
+                    return self.get_api
+                return (yield from super().resolve_local(name))
+
+            @web.page
+            def get_api(self):
+                return 'api:get'
+
         class NewResolver(web.PathResolver):
             index_method = 'default'
 
@@ -569,6 +586,26 @@ class TestMethod(unittest.TestCase):
     def testNewResolver(self):
         self.assertEqual(self.resolve('GET', '/greeting'), 'greeting_default')
 
+    def testAllow(self):
+        with self.assertRaises(MethodNotAllowed) as cm:
+            self.resolve('DELETE', '/hello')
+        self.assertIn(('Allow', 'GET, HEAD, OPTIONS, PUT'),
+                      cm.exception.default_response()[1])
+        self.assertEqual(self.resolve('OPTIONS', '/forum?uid=1'),
+            (200, [('Allow', 'GET, HEAD, OPTIONS, PATCH')], b''))
+
+    def testDynamicMethod(self):
+        self.assertEqual(self.resolve('GET', '/api'), 'api:get')
+        with self.assertRaises(MethodNotAllowed) as cm:
+            self.resolve('POST', '/api')
+        self.assertIn(('Allow', 'OPTIONS'),
+                      cm.exception.default_response()[1])
+
+    def testHead(self):
+        self.assertEqual(self.resolve('HEAD', '/hello'), 'hello:get')
+        self.assertEqual(self.resolve('head', '/forum?uid=3'),
+            'forum(user:3)')
+
 
 class TestDictResource(unittest.TestCase):
 
@@ -736,6 +773,316 @@ class TestVarKw(RoutingTestBase):
             "varposkw:a,b,c:{'b': '2'}")
 
 
+class TestAlias(unittest.TestCase):
+
+    def setUp(self):
+
+        class Child(web.Resource):
+
+            index = web.alias('page1')
+            first = web.alias('/child/page1')
+
+            @web.page
+            def page1(self):
+                return 'page1'
+
+        class Forum(web.Resource):
+
+            home = web.alias('index')
+
+            def __init__(self, id):
+                self.id = id
+
+            @web.page
+            def index(self):
+                return 'forum({})'.format(self.id)
+
+            @web.page
+            def default(self, *args):
+                return 'forum({}):{}'.format(self.id, ','.join(args))
+
+        class Root(web.Resource):
+
+            child = Child()
+            me = web.alias('/')
+            latest = web.alias('/forum/5')
+
+            @web.page
+            def index(self):
+                return 'index'
+
+            @web.resource
+            def forum(self, id:int):
+                return Forum(id)
+
+        self.Root = Root
+        self.Forum = Forum
+        self.root = Root()
+        self.site = web.Site(resources=[self.root])
+
+    def dispatch(self, uri):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                self.site._safe_dispatch(Request(uri)))
+        finally:
+            loop.close()
+
+    def testStatic(self):
+        self.assertEqual(self.dispatch('/child'), 'page1')
+        self.assertEqual(self.dispatch('/child/first'), 'page1')
+        self.assertEqual(self.dispatch('/me/child'), 'page1')
+        self.assertEqual(self.site.redispatch_count, 0)
+
+    def testResolved(self):
+        self.assertEqual(self.root.child.index, self.root.child.page1)
+        self.assertIs(self.root.me, self.root)
+
+    def testDynamic(self):
+        self.assertEqual(self.dispatch('/latest'), 'forum(5)')
+        self.assertEqual(self.dispatch('/latest/a/b'), 'forum(5):a,b')
+        self.assertEqual(self.site.redispatch_count, 2)
+
+    def testRelativeDynamic(self):
+        self.assertEqual(self.dispatch('/forum/3/home'), 'forum(3)')
+        forum = self.Forum(4)
+        self.assertEqual(forum.home, forum.index)
+        self.assertIn('home', vars(forum))  # not resolved again
+
+    def testCycle(self):
+
+        class Cycle(web.Resource):
+            a = web.alias('b')
+            b = web.alias('c')
+            c = web.alias('a')
+
+        with self.assertRaises(RuntimeError):
+            web.Site(resources=[Cycle()])
+
+    def testBroken(self):
+
+        class Broken(web.Resource):
+            a = web.alias('nothing')
+
+        with self.assertRaises(RuntimeError):
+            web.Site(resources=[Broken()])
+
+
+class LazyAdmin(web.Resource):
+    """Used by TestLazy, must be importable"""
+    instances = 0
+
+    def __init__(self):
+        type(self).instances += 1
+
+    home = web.alias('users')
+
+    @web.page
+    def users(self):
+        return 'users'
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        LazyAdmin.instances = 0
+        self.admin = web.LazyResource('aioroutes.test_routing:LazyAdmin')
+        self.reports = web.LazyResource('aioroutes.test_routing:LazyAdmin')
+
+        class Root(web.Resource):
+            admin = self.admin
+            legacy = web.DictResource(reports=self.reports)
+
+        self.site = web.Site(resources=[Root()])
+
+    def dispatch(self, uri):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                self.site._safe_dispatch(Request(uri)))
+        finally:
+            loop.close()
+
+    def testLoad(self):
+        self.assertIsNone(self.admin.value)
+        self.assertEqual(LazyAdmin.instances, 0)
+        self.assertEqual(self.dispatch('/admin/users'), 'users')
+        self.assertEqual(self.dispatch('/admin/users'), 'users')
+        self.assertEqual(LazyAdmin.instances, 1)
+        self.assertIsNone(self.reports.value)
+
+    def testIndexed(self):
+        self.assertEqual(self.dispatch('/admin/home'), 'users')
+        admin = self.admin.value
+        self.assertEqual(admin.__dict__['home'], admin.users)
+        self.assertEqual(self.site.redispatch_count, 0)
+
+    def testDict(self):
+        self.assertEqual(self.dispatch('/legacy/reports/users'), 'users')
+        self.assertIsNone(self.admin.value)
+
+    def testConcurrent(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def load():
+            barrier.wait()
+            results.append(self.admin.load())
+
+        threads = [threading.Thread(target=load) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 8)
+        self.assertEqual(len(set(map(id, results))), 1)
+        self.assertEqual(LazyAdmin.instances, 1)
+
+    def testNotResource(self):
+        lazy = web.LazyResource('aioroutes.test_routing:instantiate')
+        with self.assertRaises(RuntimeError):
+            lazy.load()
+        self.assertIsNone(lazy.value)
+
+    def testFailedListener(self):
+        called = []
+
+        def fail(value):
+            raise RuntimeError("Can't index")
+
+        self.reports.subscribe(fail)
+        self.reports.subscribe(called.append)
+        with self.assertRaises(RuntimeError):
+            self.reports.load()
+        admin = self.reports.value
+        self.assertIsNotNone(admin)
+        self.assertIs(self.reports.load(), admin)
+        self.assertEqual(called, [admin])
+        self.assertEqual(LazyAdmin.instances, 1)
+
+
+class TestDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.finished = []
+
+        test = self
+
+        class Root(web.Resource):
+
+            @web.page
+            def slow(self):
+                yield from asyncio.sleep(1)
+                test.finished.append('slow')
+                return 'slow'
+
+            @web.page
+            def budget(self, deadline: web.Deadline):
+                return deadline.remaining()
+
+        self.site = web.Site(resources=[Root()], timeout=0.05,
+                             timeout_header='X-Request-Timeout')
+
+    def dispatch(self, req):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(self.site._safe_dispatch(req))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testTimeout(self):
+        self.assertEqual(self.dispatch(Request('/slow'))[0], 504)
+        self.assertEqual(self.finished, [])
+
+    def testHeader(self):
+        req = Request('/budget')
+        req.headers = {'X-Request-Timeout': '0.02'}
+        self.assertLessEqual(self.dispatch(req), 0.02)
+        req = Request('/budget')
+        req.headers = {'X-Request-Timeout': '10'}
+        self.assertLessEqual(self.dispatch(req), 0.05)
+
+    def testNoDeadline(self):
+        site = web.Site(resources=self.site.resources)
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertIsNone(loop.run_until_complete(
+                site._safe_dispatch(Request('/budget'))))
+        finally:
+            loop.close()
+
+    def testDisconnect(self):
+        self.site.timeout = None
+        req = Request('/slow')
+        def disconnect():
+            req.disconnected.set_result(None)
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            req.disconnected = asyncio.Future()
+            loop.call_later(0.01, disconnect)
+            result = loop.run_until_complete(self.site._safe_dispatch(req))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+        self.assertEqual(result[0], 504)
+        self.assertEqual(self.finished, [])
+
+
+class TestSlowRequests(unittest.TestCase):
+
+    def setUp(self):
+
+        class Watchdog(SlowRequestWatchdog):
+            def report(self, record):
+                self.records.append(record)
+
+        class Root(web.Resource):
+
+            @web.page
+            def fast(self):
+                return 'fast'
+
+            @web.page
+            def slow(self):
+                yield from asyncio.sleep(0.05)
+                return 'slow'
+
+        self.watchdog = Watchdog(threshold=0.01, max_records=1)
+        self.watchdog.records = []
+        self.site = web.Site(resources=[Root()], watchdog=self.watchdog)
+
+    def dispatch(self, *uris):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(asyncio.gather(*[
+                self.site._safe_dispatch(Request(uri)) for uri in uris]))
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+    def testFast(self):
+        self.assertEqual(self.dispatch('/fast'), ['fast'])
+        self.assertEqual(self.watchdog.records, [])
+
+    def testSlow(self):
+        self.assertEqual(self.dispatch('/slow'), ['slow'])
+        rec, = self.watchdog.records
+        self.assertEqual(rec.request.uri, '/slow')
+        self.assertEqual(rec.leaf.__name__, 'slow')
+        self.assertEqual([name for name, _ in rec.phases],
+                         ['resolve', 'leaf'])
+        self.assertIn('sleep', rec.stack)
+
+    def testRateLimit(self):
+        self.dispatch('/slow', '/slow', '/slow')
+        self.assertEqual(len(self.watchdog.records), 1)
+        self.assertEqual(self.watchdog.slow_count, 3)
+        self.assertEqual(self.watchdog.suppressed, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
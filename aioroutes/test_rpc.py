@@ -0,0 +1,153 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.rpc import RpcSite, RpcClient, RpcError, pack_frame, CALL
+from aioroutes.rpc import RpcCall
+
+
+class TestRpc(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = 0
+
+        test = self
+
+        class Users(web.Resource):
+
+            @web.procedure
+            def get(self, id: int, *, full: bool = False):
+                test.calls += 1
+                return {'id': id, 'full': full}
+
+            @web.procedure
+            def slow(self, delay: float, value: int):
+                yield from asyncio.sleep(delay)
+                return value
+
+        class Root(web.Resource):
+
+            users = Users()
+
+            @web.page
+            def http_only(self):
+                return 'http'
+
+            @web.page_and_procedure
+            def both(self):
+                return 'both'
+
+            @web.procedure
+            def address(self, call: RpcCall):
+                return call.remote_addr
+
+            @web.procedure
+            def unserializable(self):
+                return object()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.site = RpcSite(resources=[Root()])
+        self.server = self.loop.run_until_complete(
+            self.site.serve('127.0.0.1', 0))
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def tearDown(self):
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        self.loop.run_until_complete(asyncio.sleep(0))
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_client(self, coro_fun, **kwargs):
+        client = RpcClient('127.0.0.1', self.port, **kwargs)
+        try:
+            return self.loop.run_until_complete(coro_fun(client)), client
+        finally:
+            client.close()
+            self.loop.run_until_complete(asyncio.sleep(0))
+
+    def testCall(self):
+        result, _ = self.run_client(
+            lambda c: c.call('/users/get', id=7, full=True))
+        self.assertEqual(result, {'id': 7, 'full': True})
+        result, _ = self.run_client(lambda c: c.call('/users/get/8'))
+        self.assertEqual(result, {'id': 8, 'full': False})
+
+    def testRemoteAddr(self):
+        result, _ = self.run_client(lambda c: c.call('/address'))
+        self.assertEqual(result, '127.0.0.1')
+
+    def testReadOnlyHeaders(self):
+        # shared by all calls, so must not be modified
+        with self.assertRaises(TypeError):
+            RpcCall.headers['X-Test'] = '1'
+        with self.assertRaises(TypeError):
+            RpcCall.cookies['session'] = 'x'
+
+    def testErrors(self):
+        for path in ('/http_only', '/users/get', '/users/missing'):
+            with self.assertRaises(RpcError) as cm:
+                self.run_client(lambda c: c.call(path))
+            self.assertEqual(cm.exception.status, 404)
+        result, _ = self.run_client(lambda c: c.call('/both'))
+        self.assertEqual(result, 'both')
+        with self.assertRaises(RpcError) as cm:
+            self.run_client(lambda c: c.call('/unserializable'))
+        self.assertEqual(cm.exception.status, 500)
+
+    def testClosedConnection(self):
+        @asyncio.coroutine
+        def call_closed(client):
+            conn = yield from client._get_connection()
+            conn.close()
+            yield from asyncio.sleep(0.01)
+            # fails at once rather than waiting for the reply forever
+            yield from asyncio.wait_for(conn.call('/both', {}), 1)
+        with self.assertRaises(ConnectionResetError):
+            self.run_client(call_closed)
+
+    def testMultiplexing(self):
+        @asyncio.coroutine
+        def calls(client):
+            return (yield from asyncio.gather(*[
+                client.call('/users/slow', delay=0.05 - i*0.001, value=i)
+                for i in range(20)]))
+        result, client = self.run_client(calls, pool_size=1)
+        self.assertEqual(result, list(range(20)))
+        self.assertEqual(len(client.connections), 0)  # closed
+
+    def testPool(self):
+        conns = []
+
+        @asyncio.coroutine
+        def calls(client):
+            result = yield from asyncio.gather(*[
+                client.call('/users/slow', delay=0.01, value=i)
+                for i in range(10)])
+            conns.append(len(client.connections))
+            yield from client.call('/users/get', id=1)
+            conns.append(len(client.connections))
+            return result
+        result, client = self.run_client(calls, pool_size=3)
+        self.assertEqual(result, list(range(10)))
+        self.assertEqual(conns[0], 3)
+        self.assertEqual(conns[1], 3)  # idle connection is reused
+
+    def testBadFrame(self):
+        @asyncio.coroutine
+        def raw():
+            reader, writer = yield from asyncio.open_connection(
+                '127.0.0.1', self.port)
+            writer.write(pack_frame(5, CALL, b'[not json'))
+            header = yield from reader.readexactly(9)
+            payload = yield from reader.read(100)
+            writer.close()
+            return header, payload
+        header, payload = self.loop.run_until_complete(raw())
+        self.assertEqual(header[4:], b'\x00\x00\x00\x05\x02')
+        self.assertIn(b'400', payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
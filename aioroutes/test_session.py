@@ -0,0 +1,210 @@
+import os
+import json
+import asyncio
+import unittest
+import tempfile
+
+import aioroutes as web
+from aioroutes.testing import Client
+from aioroutes.websocket import MessageSite
+from aioroutes.session import Session, SessionStore
+from aioroutes.session import SqliteBackend, DbmBackend
+
+
+class CountingBackend(SqliteBackend):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.loads = 0
+        self.batches = []
+
+    def load(self, sid):
+        self.loads += 1
+        return super().load(sid)
+
+    def save_many(self, items, deleted=()):
+        self.batches.append((len(items), len(deleted)))
+        super().save_many(items, deleted)
+
+
+class TestSession(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'sessions.db')
+        self.backend = CountingBackend(self.path)
+        self.store = SessionStore(self.backend, flush_interval=0.01)
+
+        class UserSession(Session):
+            store = self.store
+
+        class Root(web.Resource):
+
+            @web.page
+            def index(self, session: UserSession):
+                return 'index'
+
+            @web.page
+            def whoami(self, session: UserSession):
+                return session.get('user', 'anonymous')
+
+            @web.page
+            def login(self, session: UserSession, name: str):
+                session['user'] = name
+                return 'hello ' + name
+
+            @web.page
+            def logout(self, session: UserSession):
+                session.invalidate()
+                return 'bye'
+
+            @web.page
+            def welcome(self, session: UserSession, name: str):
+                session['user'] = name
+                raise web.PathRewrite('/whoami')
+
+            @web.page_and_message
+            def rename(self, session: UserSession, name: str):
+                session['user'] = name
+                return 'renamed'
+
+        self.site = web.Site(resources=[Root()])
+        self.message_site = MessageSite(resources=[Root()])
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.store.close()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self.dir.cleanup()
+
+    def get(self, uri, sid=None):
+        headers = [('Cookie', 'session=' + sid)] if sid else []
+        return self.loop.run_until_complete(
+            Client(self.site).get(uri, headers=headers))
+
+    def login(self, name):
+        resp = self.get('/login?name=' + name)
+        cookie = resp.get_header('Set-Cookie')
+        self.assertRegex(cookie, r'^session=[\w-]+; Path=/; HttpOnly')
+        return cookie.split(';')[0].split('=')[1]
+
+    def wait_flush(self):
+        self.loop.run_until_complete(asyncio.sleep(0.05))
+
+    def testLogin(self):
+        self.assertEqual(self.get('/whoami').text, 'anonymous')
+        sid = self.login('joe')
+        resp = self.get('/whoami', sid)
+        self.assertEqual(resp.text, 'joe')
+        self.assertIsNone(resp.get_header('Set-Cookie'))
+        # no backend access: new session is created, then served from cache
+        self.assertEqual(self.backend.loads, 0)
+        self.assertEqual(self.backend.batches, [])
+        self.wait_flush()
+        self.assertEqual(self.backend.batches, [(1, 0)])
+        # another process (or after restart)
+        store = SessionStore(SqliteBackend(self.path))
+        self.assertEqual(store.get(sid), {'user': 'joe'})
+        self.assertEqual((store.miss_count, store.load_count), (1, 1))
+        store.close()
+
+    def testLazy(self):
+        sid = self.login('joe')
+        self.store._cache.clear()
+        self.store.flush()
+        # session is not loaded until accessed and not saved if unchanged
+        self.assertEqual(self.get('/index', sid).text, 'index')
+        self.assertEqual(self.backend.loads, 0)
+        self.assertEqual(self.get('/whoami', sid).text, 'joe')
+        self.assertEqual(self.get('/whoami', sid).text, 'joe')
+        self.assertEqual(self.backend.loads, 1)
+        self.wait_flush()
+        self.assertEqual(self.backend.batches, [(1, 0)])
+        self.assertEqual(self.store.hit_count, 1)
+        self.assertEqual(self.store.miss_count, 1)
+        self.assertEqual(self.store.hit_ratio, 0.5)
+        self.assertGreater(self.store.load_latency, 0)
+        self.assertGreater(self.store.flush_latency, 0)
+
+    def testUnknownId(self):
+        fake = 'x' * 32
+        self.assertEqual(self.get('/whoami', fake).text, 'anonymous')
+        sid = self.login('joe')
+        resp = self.get('/login?name=ann', fake)
+        self.assertNotIn(fake, resp.get_header('Set-Cookie'))
+        self.assertEqual(self.get('/whoami', 'bad id').text, 'anonymous')
+        self.assertEqual(self.backend.loads, 2)  # 'bad id' isn't looked up
+        self.assertEqual(self.get('/whoami', sid).text, 'joe')
+
+    def testLogout(self):
+        sid = self.login('joe')
+        self.wait_flush()
+        resp = self.get('/logout', sid)
+        self.assertIn('Max-Age=0', resp.get_header('Set-Cookie'))
+        self.assertEqual(self.get('/whoami', sid).text, 'anonymous')
+        self.wait_flush()
+        self.assertEqual(self.backend.batches, [(1, 0), (0, 1)])
+        self.assertIsNone(self.backend.load(sid))
+
+    def testRedirect(self):
+        # the session created before redispatch is the one used after it
+        resp = self.get('/welcome?name=joe')
+        self.assertEqual(resp.text, 'joe')
+        cookies = [value for name, value in resp.headers
+                   if name == 'Set-Cookie']
+        self.assertEqual(len(cookies), 1)
+        sid = cookies[0].split(';')[0].split('=')[1]
+        self.assertEqual(self.get('/whoami', sid).text, 'joe')
+
+    def testMessages(self):
+        sid = self.login('joe')
+        for cookies, status in [({'session': sid}, None), ({}, 500)]:
+            request = Client(self.site).make_request('GET', '/')
+            request.cookies = cookies
+            conn = self.message_site.connect(request)
+            reply = json.loads(self.loop.run_until_complete(conn.handle(
+                '{"id": 1, "path": "/rename", "args": {"name": "ann"}}'))
+                .decode('utf-8'))
+            self.assertEqual(reply.get('error', {}).get('status'), status)
+        # existing session is modified, new one can't be sent to client
+        self.assertEqual(self.get('/whoami', sid).text, 'ann')
+        self.assertEqual(len(self.store._cache), 1)
+
+    def testWriteBehind(self):
+        self.store.cache_size = 2
+        self.store.batch_size = 5
+        sids = [self.login('user{}'.format(i)) for i in range(4)]
+        self.assertEqual(len(self.store._cache), 2)
+        # evicted from cache but not written yet
+        self.assertEqual(self.get('/whoami', sids[0]).text, 'user0')
+        self.assertEqual(self.backend.batches, [])
+        self.login('user4')  # the batch is full
+        self.assertEqual(self.backend.batches, [(5, 0)])
+        self.assertEqual(self.store.save_count, 5)
+        self.assertEqual(self.store.flush_count, 1)
+
+    def testMaxAge(self):
+
+        class LongSession(Session):
+            store = self.store
+            max_age = 86400.0
+
+        session = LongSession(None)
+        self.assertTrue(session.cookie('x', session.max_age)
+                        .endswith('; Max-Age=86400'))
+
+    def testDbm(self):
+        store = SessionStore(DbmBackend(os.path.join(self.dir.name, 'dbm')))
+        store.save('a' * 32, {'x': 1})
+        store.delete('b' * 32)
+        store.close()
+        store = SessionStore(DbmBackend(os.path.join(self.dir.name, 'dbm')))
+        self.assertEqual(store.get('a' * 32), {'x': 1})
+        self.assertIsNone(store.get('b' * 32))
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
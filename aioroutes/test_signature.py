@@ -0,0 +1,118 @@
+import os
+import sys
+import asyncio
+import marshal
+import unittest
+import tempfile
+import subprocess
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.signature import LazySignature, SignatureCache
+from aioroutes.signature import set_signature_cache, compile_signature
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+def make_root():
+
+    class Root(web.Resource):
+
+        @web.page
+        def user(self, id: int, name: str = 'anon', *, limit: int = 10):
+            return (id, name, limit)
+
+        @web.page
+        def other(self, x: int, y: str = 'a', *, z: int = 1):
+            return (x, y, z)
+
+    return Root()
+
+
+class TestLazySignature(unittest.TestCase):
+
+    def setUp(self):
+        self.root = make_root()
+        self.site = web.Site(resources=[self.root])
+
+    def resolve(self, uri):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(
+                self.site._resolve(Request(uri)))
+        finally:
+            loop.close()
+
+    def testFirstCall(self):
+        fun = type(self.root).user
+        self.assertIsInstance(fun._aio_sig, LazySignature)
+        self.assertEqual(self.resolve('/user/1?limit=5'), (1, 'anon', 5))
+        self.assertNotIsInstance(fun._aio_sig, LazySignature)
+        self.assertIsInstance(type(self.root).other._aio_sig, LazySignature)
+
+    def testBulk(self):
+        self.assertEqual(self.site.compile_signatures(), 2)
+        self.assertNotIsInstance(type(self.root).other._aio_sig,
+                                 LazySignature)
+        self.assertEqual(self.resolve('/other/2/b'), (2, 'b', 1))
+
+
+class TestSignatureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'signatures')
+
+    def tearDown(self):
+        set_signature_cache(None)
+        self.dir.cleanup()
+
+    def testRestart(self):
+        cache = set_signature_cache(self.path)
+        root = make_root()
+        compile_signature(type(root).user, partial=False)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        cache.save()
+
+        cache = set_signature_cache(self.path)  # like a new process
+        root = make_root()
+        sig = compile_signature(type(root).user, partial=False)
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+        if __debug__:
+            self.assertTrue(sig.__text__.startswith('def __sig__('))
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(sig(None, '3')),
+                             ((3, 'anon'), 0, {'limit': 10}))
+        finally:
+            loop.close()
+        compile_signature(type(root).user, partial=True)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def testOtherPython(self):
+        with open(self.path, 'wb') as f:
+            marshal.dump((b'xxxx', {}), f)
+        cache = SignatureCache(self.path)
+        self.assertIsNone(cache.get('key'))
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        self.assertEqual(SignatureCache(self.path)._read(), {})
+
+
+class TestImport(unittest.TestCase):
+
+    def testLazy(self):
+        heavy = ['aiohttp', 'http.cookies', 'tempfile', 'json', 'mimetypes',
+                 'concurrent.futures.thread', 'concurrent.futures.process']
+        out = subprocess.check_output([sys.executable, '-c',
+            'import sys, aioroutes; '
+            'print(" ".join(m for m in {!r} if m in sys.modules))'
+            .format(heavy)])
+        self.assertEqual(out.strip(), b'')
+
+
+if __name__ == '__main__':
+    unittest.main()
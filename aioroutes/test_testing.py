@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest, StreamingBody
+from aioroutes.testing import Client, LoopbackClient, load
+
+try:
+    import aiohttp.server  # noqa
+except ImportError:
+    aiohttp = None
+
+
+class TestClient(unittest.TestCase):
+
+    def setUp(self):
+
+        class Item(web.Resource):
+            http_resolver = web.MethodResolver()
+
+            @web.page
+            def GET(self, id: int):
+                return 'item:{}'.format(id)
+
+            @web.page
+            def POST(self, id: int, name: str):
+                return 'saved:{}:{}'.format(id, name)
+
+        class Root(web.Resource):
+            item = Item()
+
+            @web.page
+            def index(self):
+                return 'home'
+
+            @web.page
+            def slow(self, delay: float = 0.01):
+                yield from asyncio.sleep(delay)
+                return 'slow'
+
+            @web.page
+            def stream(self):
+                return StreamingBody([b'a', b'b', b'c'])
+
+            @web.page
+            def broken(self):
+                raise RuntimeError("test")
+
+            @web.page
+            def session(self, req: BaseHTTPRequest):
+                return req.cookies.get('session', '-')
+
+        self.site = web.Site(resources=[Root()])
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def call(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def check(self, client):
+        resp = self.call(client.get('/'))
+        self.assertEqual(resp.code, 200)
+        self.assertEqual(resp.body, b'home')
+        resp = self.call(client.get('/item', form={'id': 7}))
+        self.assertEqual(resp.text, 'item:7')
+        resp = self.call(client.post('/item',
+            form=[('id', '7'), ('name', 'x y')]))
+        self.assertEqual(resp.text, 'saved:7:x y')
+        resp = self.call(client.request('HEAD', '/item?id=1'))
+        self.assertEqual(resp.code, 200)
+        self.assertEqual(resp.body, b'')
+        resp = self.call(client.request('DELETE', '/item'))
+        self.assertEqual(resp.code, 405)
+        self.assertIn('GET', resp.get_header('Allow'))
+        self.assertEqual(self.call(client.get('/stream')).body, b'abc')
+        self.assertEqual(self.call(client.get('/nothing')).code, 404)
+        resp = self.call(client.get('/session',
+            headers={'Cookie': 'session=abc'}))
+        self.assertEqual(resp.text, 'abc')
+
+    def testClient(self):
+        self.check(Client(self.site))
+        client = Client(self.site, headers=[('Cookie', 'session=xyz')])
+        self.assertEqual(self.call(client.get('/session')).text, 'xyz')
+
+    @unittest.skipIf(aiohttp is None, "aiohttp is not installed")
+    def testLoopback(self):
+        client = LoopbackClient(self.site)
+        try:
+            self.check(client)
+            report = self.call(load(client, ['/', '/item?id=1'],
+                                    concurrency=4, requests=40))
+            self.assertEqual(report.count, 40)
+            self.assertEqual(report.errors, 0)
+        finally:
+            self.call(client.close())
+
+    def testLoad(self):
+        client = Client(self.site)
+        report = self.call(load(client,
+            ['/', '/item?id=1', ('POST', '/item?id=1&name=x'), '/slow'],
+            concurrency=500, requests=2000))
+        self.assertEqual(report.count, 2000)
+        self.assertEqual(report.concurrency, 500)
+        self.assertEqual(dict(report.statuses), {200: 2000})
+        self.assertEqual(report.errors, 0)
+        # 500 sleeps of 10 ms run concurrently, not one after another
+        self.assertLess(report.seconds, 2.0)
+        self.assertGreater(report.throughput, 0)
+        self.assertGreaterEqual(report.percentile(99), 0.01)
+        self.assertLessEqual(report.percentile(50), report.percentile(99))
+        self.assertIn('p99.9', report.format())
+
+    def testErrors(self):
+        client = Client(self.site)
+        report = self.call(load(client, ['/', '/broken', '/nothing'],
+                                concurrency=3, requests=30))
+        self.assertEqual(dict(report.statuses), {200: 10, 500: 10, 404: 10})
+        self.assertEqual(report.errors, 10)
+        self.assertAlmostEqual(report.error_rate, 1/3)
+
+    def testDuration(self):
+        report = self.call(load(Client(self.site), ['/slow?delay=0.02'],
+                                concurrency=10, duration=0.1))
+        self.assertGreaterEqual(report.count, 10)
+        self.assertLessEqual(report.count, 100)
+        self.assertGreaterEqual(report.seconds, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
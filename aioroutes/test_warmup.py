@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.signature import LazySignature
+
+
+class Admin(web.Resource):
+    """Loaded lazily by TestWarmup, must be importable"""
+
+    @web.page
+    def users(self, page: int = 1):
+        return 'users:{}'.format(page)
+
+
+class TestWarmup(unittest.TestCase):
+
+    def setUp(self):
+
+        class Item(web.Resource):
+            http_resolver = web.MethodResolver()
+
+            @web.page
+            def GET(self):
+                return 'item'
+
+        class Root(web.Resource):
+            admin = web.LazyResource('aioroutes.test_warmup:Admin')
+            item = Item()
+
+            @web.page
+            def index(self):
+                return 'home'
+
+            @web.page
+            def broken(self):
+                raise RuntimeError("test")
+
+        self.root = Root()
+        self.site = web.Site(resources=[self.root])
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def testWarmup(self):
+        report = self.loop.run_until_complete(self.site.warmup(
+            ['/', '/admin/users?page=2', '/item', '/broken']))
+        self.assertIsNotNone(self.root.admin.value)
+        self.assertNotIsInstance(Admin.users._aio_sig, LazySignature)
+        self.assertNotIsInstance(type(self.root).index._aio_sig,
+                                 LazySignature)
+        self.assertEqual(list(report.phases),
+                         ['load', 'signatures', 'indexes', 'replay'])
+        self.assertEqual(report.phases['load'].count, 1)
+        self.assertEqual(report.phases['replay'].count, 4)
+        self.assertEqual(report.subtrees['/admin'].count, 3)
+        self.assertGreater(report.phases['load'].memory, 0)
+        self.assertEqual(report.failed, [('/broken', 500)])
+        self.assertIn('subtree /admin', report.format())
+        # second warmup has nothing to do
+        report = self.loop.run_until_complete(
+            self.site.warmup(trace_memory=False))
+        self.assertEqual(report.phases['load'].count, 0)
+        self.assertEqual(report.phases['signatures'].count, 0)
+        self.assertEqual(report.memory, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import json
+import asyncio
+import unittest
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.websocket import MessageSite
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri, cookie=''):
+        self.uri = uri
+        self.cookie = cookie
+        self.remote_addr = '10.0.0.1'
+
+
+class TestMessages(unittest.TestCase):
+
+    def setUp(self):
+        self.created = 0
+
+        test = self
+
+        @web.Sticker.register
+        class User(object):
+            request_scoped = True
+
+            def __init__(self, name):
+                self.name = name
+
+            @classmethod
+            @asyncio.coroutine
+            def create(cls, resolver):
+                test.created += 1
+                return cls(resolver.request.cookies.get('user'))
+
+        class Dashboard(web.Resource):
+
+            @web.message
+            def subscribe(self, channel: str, *, since: int = 0):
+                return {'channel': channel, 'since': since}
+
+        class Root(web.Resource):
+
+            dashboard = Dashboard()
+
+            @web.page_and_message
+            def whoami(self, user: User):
+                return user.name
+
+            @web.page
+            def http_only(self):
+                return 'http'
+
+            @web.rate_limit(0.001, burst=1)
+            @web.message
+            def ping(self):
+                return 'pong'
+
+            @web.message
+            def unserializable(self):
+                return object()
+
+        self.root = Root()
+        self.site = web.Site(resources=[self.root])
+        self.ws = MessageSite(resources=[self.root])
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def send(self, conn, msg):
+        if not isinstance(msg, str):
+            msg = json.dumps(msg)
+        reply = self.loop.run_until_complete(conn.handle(msg))
+        return json.loads(reply.decode('utf-8'))
+
+    def testRouting(self):
+        conn = self.ws.connect(Request('/websocket', 'user=ann'))
+        self.assertEqual(self.send(conn, {'id': 1,
+                'path': '/dashboard/subscribe/cpu', 'args': {'since': 5}}),
+            {'id': 1, 'result': {'channel': 'cpu', 'since': 5}})
+        self.assertEqual(self.send(conn, {'id': 2, 'path': '/whoami'}),
+                         {'id': 2, 'result': 'ann'})
+
+    def testScopes(self):
+        conn = self.ws.connect(Request('/websocket'))
+        self.assertEqual(self.send(conn, {'id': 3, 'path': '/http_only'}),
+            {'id': 3, 'error': {'status': 404, 'message': 'Not Found'}})
+        result = self.loop.run_until_complete(
+            self.site.dispatch(Request('/whoami', 'user=bob')))
+        self.assertEqual(result, [200, (), b'bob'])
+        result = self.loop.run_until_complete(
+            self.site.dispatch(Request('/dashboard/subscribe/cpu')))
+        self.assertEqual(result[0], 404)
+
+    def testConnectionStickers(self):
+        conn = self.ws.connect(Request('/websocket', 'user=ann'))
+        for i in range(3):
+            self.send(conn, {'id': i, 'path': '/whoami'})
+        self.assertEqual(self.created, 1)
+        other = self.ws.connect(Request('/websocket', 'user=bob'))
+        self.assertEqual(self.send(other, {'id': 0, 'path': '/whoami'}),
+                         {'id': 0, 'result': 'bob'})
+        self.assertEqual(self.created, 2)
+
+    def testRateLimit(self):
+        # messages are limited by the address of the connection
+        conn = self.ws.connect(Request('/websocket'))
+        self.assertEqual(self.send(conn, {'id': 1, 'path': '/ping'}),
+                         {'id': 1, 'result': 'pong'})
+        other = self.ws.connect(Request('/websocket'))
+        reply = self.send(other, {'id': 2, 'path': '/ping'})
+        self.assertEqual(reply['error']['status'], 429)
+
+    def testUnserializable(self):
+        conn = self.ws.connect(Request('/websocket'))
+        reply = self.send(conn, {'id': 3, 'path': '/unserializable'})
+        self.assertEqual(reply['id'], 3)
+        self.assertEqual(reply['error']['status'], 500)
+
+    def testBadMessage(self):
+        conn = self.ws.connect(Request('/websocket'))
+        for msg in ['junk', '[]', '{"path": "x"}', '{"path": "/", "args": 1}']:
+            self.assertEqual(self.send(conn, msg)['error']['status'], 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,388 @@
+"""Test client and load generator
+
+:class:`Client` dispatches requests to the site in process, without sockets
+and HTTP parsing, so thousands of requests may run concurrently on a single
+loop. :class:`LoopbackClient` has the same interface but sends real HTTP/1.1
+requests to :class:`~aioroutes.aiohttp.HttpProto` listening on loopback
+(aiohttp must be installed). :func:`load` runs many requests concurrently
+with either client and reports throughput, latency percentiles and errors::
+
+    client = Client(site)
+    response = yield from client.get('/forum/topic/1')
+    assert response.code == 200
+    report = yield from load(client, ['/', '/forum'], requests=10000)
+    print(report.format())
+"""
+import time
+import marshal
+import asyncio
+from math import ceil
+from collections import Counter
+from urllib.parse import urlencode
+
+from .http import CompactHTTPRequest, StreamingBody, FORM_CONTENT_TYPE
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class Response(object):
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def code(self):
+        """Integer status code (leaves may return ``'200 OK'`` strings)"""
+        return int(str(self.status).split()[0])
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8')
+
+    def get_header(self, name, default=None):
+        """Returns first value of the header (case insensitive)"""
+        name = name.lower()
+        for hname, value in self.headers:
+            if hname.lower() == name:
+                return value
+        return default
+
+    def __repr__(self):
+        return '<Response {} ({} bytes)>'.format(self.status, len(self.body))
+
+
+def _encode(method, uri, headers, body, form):
+    headers = list(headers.items() if hasattr(headers, 'items') else headers)
+    if form is not None:
+        if method == 'GET':
+            sep = '&' if '?' in uri else '?'
+            uri += sep + urlencode(form, doseq=True)
+        else:
+            body = urlencode(form, doseq=True).encode('utf-8')
+            headers.append(('Content-Type', FORM_CONTENT_TYPE))
+    return uri, headers, body
+
+
+class Client(object):
+    """Dispatches requests to the site in process
+
+    Requests are :class:`~aioroutes.http.CompactHTTPRequest` objects which
+    go through ``Site.dispatch`` as is, streaming bodies are read fully.
+    ``headers`` are added to every request (e.g. cookies), ``remote_addr``
+    is the client address seen by the site.
+    """
+    request_class = CompactHTTPRequest
+
+    def __init__(self, site, *, headers=(), remote_addr='127.0.0.1'):
+        self.site = site
+        self.headers = list(headers)
+        self.remote_addr = remote_addr
+
+    def make_request(self, method, uri, headers=(), body=None):
+        req = self.request_class(method, uri, self.headers + list(headers),
+                                 remote_addr=self.remote_addr)
+        req.body = body
+        return req
+
+    @asyncio.coroutine
+    def request(self, method, uri, *, headers=(), body=None, form=None):
+        """Returns :class:`Response` for the request
+
+        The ``form`` is a dict (or a list of pairs) sent in query string for
+        GET or as urlencoded body otherwise.
+        """
+        uri, headers, body = _encode(method, uri, headers, body, form)
+        req = self.make_request(method, uri, headers, body)
+        status, headers, data = yield from self.site.dispatch(req)
+        if isinstance(data, StreamingBody):
+            chunks = []
+            while True:
+                chunk = yield from data.read()
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            data = b''.join(chunks)
+        if isinstance(headers, dict):
+            headers = headers.items()
+        if method == 'HEAD':
+            data = b''
+        return Response(status, list(headers), data)
+
+    @asyncio.coroutine
+    def get(self, uri, **kwargs):
+        return (yield from self.request('GET', uri, **kwargs))
+
+    @asyncio.coroutine
+    def post(self, uri, **kwargs):
+        return (yield from self.request('POST', uri, **kwargs))
+
+    @asyncio.coroutine
+    def close(self):
+        pass
+
+
+class _Connection(object):
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @asyncio.coroutine
+    def request(self, method, uri, headers, body):
+        lines = ['{} {} HTTP/1.1'.format(method, uri), 'Host: localhost']
+        lines.extend('{}: {}'.format(*pair) for pair in headers)
+        if body:
+            lines.append('Content-Length: {}'.format(len(body)))
+        lines.append('\r\n')
+        self.writer.write('\r\n'.join(lines).encode('latin-1'))
+        if body:
+            self.writer.write(body)
+        head = yield from self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status = int(status_line.split()[1])
+        headers = []
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(':')
+                headers.append((name, value.strip()))
+        response = Response(status, headers, b'')
+        if method == 'HEAD':
+            return response
+        length = response.get_header('Content-Length')
+        encoding = response.get_header('Transfer-Encoding', '').lower()
+        if length is not None:
+            response.body = yield from self.reader.readexactly(int(length))
+        elif encoding == 'chunked':
+            response.body = yield from self._read_chunked()
+        else:
+            response.body = yield from self.reader.read()
+        return response
+
+    @asyncio.coroutine
+    def _read_chunked(self):
+        chunks = []
+        while True:
+            line = yield from self.reader.readuntil(b'\r\n')
+            size = int(line.split(b';')[0], 16)
+            if size == 0:
+                yield from self.reader.readuntil(b'\r\n')
+                return b''.join(chunks)
+            chunks.append((yield from self.reader.readexactly(size)))
+            yield from self.reader.readexactly(2)
+
+    def close(self):
+        self.writer.close()
+
+
+class LoopbackClient(Client):
+    """Sends requests to :class:`~aioroutes.aiohttp.HttpProto` over loopback
+
+    The server is started on a random port on the first request, keyword
+    arguments are passed to ``HttpProto``. Keep-alive connections are
+    reused, so the number of connections is the maximum number of
+    concurrent requests. Call :meth:`close` to stop the server.
+    """
+
+    def __init__(self, site, *, headers=(), host='127.0.0.1', **settings):
+        super().__init__(site, headers=headers)
+        self.host = host
+        self.settings = settings
+        self.server = None
+        self.port = None
+        self._starting = None
+        self._idle = []
+        self._busy = set()
+
+    @asyncio.coroutine
+    def _start(self):
+        from .aiohttp import HttpProto
+        loop = asyncio.get_event_loop()
+        server = yield from loop.create_server(
+            lambda: HttpProto(self.site, loop=loop, **self.settings),
+            self.host, 0)
+        self.port = server.sockets[0].getsockname()[1]
+        self.server = server
+
+    @asyncio.coroutine
+    def _connection(self):
+        if self._idle:
+            return self._idle.pop()
+        if self.server is None:
+            if self._starting is None:
+                self._starting = asyncio.ensure_future(self._start())
+            yield from asyncio.shield(self._starting)
+        reader, writer = yield from asyncio.open_connection(
+            self.host, self.port)
+        return _Connection(reader, writer)
+
+    @asyncio.coroutine
+    def request(self, method, uri, *, headers=(), body=None, form=None):
+        uri, headers, body = _encode(method, uri, headers, body, form)
+        conn = yield from self._connection()
+        self._busy.add(conn)
+        try:
+            response = yield from conn.request(method, uri,
+                self.headers + headers, body)
+        except BaseException:
+            conn.close()
+            raise
+        else:
+            if response.get_header('Connection', '').lower() == 'close':
+                conn.close()
+            else:
+                self._idle.append(conn)
+        finally:
+            self._busy.discard(conn)
+        return response
+
+    @asyncio.coroutine
+    def close(self):
+        for conn in self._idle + list(self._busy):
+            conn.close()
+        del self._idle[:]
+        if self.server is not None:
+            self.server.close()
+            yield from self.server.wait_closed()
+            self.server = None
+            self._starting = None
+
+
+class LoadReport(object):
+    """Result of the :func:`load` run
+
+    Latencies are in seconds, from the start of the request until the full
+    body is received. A request is failed when it's answered with 5xx or
+    raised an exception, ``statuses`` counts all responses by status code
+    (exceptions are counted by type name).
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = 0
+        self.seconds = 0.0
+
+    @property
+    def count(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        """Requests per second"""
+        return self.count / self.seconds if self.seconds else 0.0
+
+    @property
+    def error_rate(self):
+        return self.errors / self.count if self.count else 0.0
+
+    @asyncio.coroutine
+    def measure(self, client, method, uri, **kwargs):
+        """Sends the request with the client and adds it to the report"""
+        started = time.perf_counter()
+        response = None
+        try:
+            response = yield from client.request(method, uri, **kwargs)
+        except Exception as e:
+            self.statuses[type(e).__name__] += 1
+            self.errors += 1
+        else:
+            code = response.code
+            self.statuses[code] += 1
+            if code >= 500:
+                self.errors += 1
+        self.latencies.append(time.perf_counter() - started)
+        return response
+
+    def percentile(self, p):
+        """Latency percentile (nearest-rank), e.g. ``percentile(99)``"""
+        if not self.latencies:
+            return 0.0
+        values = sorted(self.latencies)
+        index = max(int(ceil(p / 100 * len(values))) - 1, 0)
+        return values[min(index, len(values) - 1)]
+
+    def save(self, path):
+        """Writes latencies and statuses to the file to compare later"""
+        data = {'concurrency': self.concurrency, 'seconds': self.seconds,
+                'errors': self.errors, 'latencies': self.latencies,
+                'statuses': {str(k): v for k, v in self.statuses.items()}}
+        with open(path, 'wb') as f:
+            marshal.dump(data, f)
+
+    @classmethod
+    def read(cls, path):
+        """Reads the report written by :meth:`save`"""
+        with open(path, 'rb') as f:
+            data = marshal.load(f)
+        report = cls(data['concurrency'])
+        report.seconds = data['seconds']
+        report.errors = data['errors']
+        report.latencies = data['latencies']
+        report.statuses.update({int(k) if k.isdigit() else k: v
+                                for k, v in data['statuses'].items()})
+        return report
+
+    def format(self):
+        lines = ['{} requests, {} concurrent, {:.2f} s'.format(
+                     self.count, self.concurrency, self.seconds),
+                 'throughput {:12.1f} req/s'.format(self.throughput),
+                 'errors     {:12d} ({:.2%})'.format(
+                     self.errors, self.error_rate)]
+        if self.latencies:
+            values = sorted(self.latencies)
+            lines.append('latency min {:11.3f} ms'.format(values[0] * 1000))
+            for p in PERCENTILES:
+                lines.append('latency p{:<9} {:.3f} ms'.format(
+                    p, self.percentile(p) * 1000))
+            lines.append('latency max {:11.3f} ms'.format(values[-1] * 1000))
+        for status, count in sorted(self.statuses.items(), key=str):
+            lines.append('status {:12} {}'.format(status, count))
+        return '\n'.join(lines)
+
+
+@asyncio.coroutine
+def load(client, targets, *, concurrency=100, requests=None, duration=None):
+    """Sends requests concurrently, returns :class:`LoadReport`
+
+    The ``targets`` is a list of urls or ``(method, url)`` pairs, they are
+    requested in a loop until ``requests`` are sent or ``duration`` seconds
+    passed (by default each target is requested once). At most
+    ``concurrency`` requests are in flight at any time.
+    """
+    targets = [('GET', t) if isinstance(t, str) else tuple(t)
+               for t in targets]
+    if not targets:
+        raise ValueError("No targets")
+    if requests is None and duration is None:
+        requests = len(targets)
+    report = LoadReport(concurrency)
+    clock = time.perf_counter
+    start = clock()
+    deadline = None if duration is None else start + duration
+
+    def numbers():
+        i = 0
+        while requests is None or i < requests:
+            if deadline is not None and clock() >= deadline:
+                return
+            yield i
+            i += 1
+    numbers = numbers()
+
+    @asyncio.coroutine
+    def worker():
+        for i in numbers:
+            method, uri = targets[i % len(targets)]
+            yield from report.measure(client, method, uri)
+            # in-process request may complete without ever yielding to the
+            # loop, let other workers run like the network round trip would
+            yield from asyncio.sleep(0)
+
+    yield from asyncio.gather(*[worker() for _ in range(concurrency)])
+    report.seconds = clock() - start
+    return report
@@ -2,6 +2,12 @@ import asyncio
 from .exceptions import OutOfScopeError
 
 
+try:
+    current_task = asyncio.current_task
+except AttributeError:  # python < 3.7
+    current_task = asyncio.Task.current_task
+
+
 class cached_property(object):
 
     def __init__(self, fun):
@@ -15,6 +21,33 @@ class cached_property(object):
         return res
 
 
+class cached_slot(object):
+    """Same as :class:`cached_property` but for classes having ``__slots__``
+
+    The value is stored in the slot named as the function prefixed by
+    underscore, which must be listed in ``__slots__``. Value is calculated
+    when slot is not set or contains :data:`NOT_CACHED`, the latter is
+    faster, so it's better to initialize slots with it in constructor.
+    """
+
+    def __init__(self, fun):
+        self.function = fun
+        self.name = fun.__name__
+        self.slot = '_' + fun.__name__
+
+    def __get__(self, obj, cls):
+        if obj is None:
+            return self
+        res = getattr(obj, self.slot, NOT_CACHED)
+        if res is NOT_CACHED:
+            res = self.function(obj)
+            setattr(obj, self.slot, res)
+        return res
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
+
+
 class marker_object(object):
     __slots__ = ('name',)
 
@@ -25,8 +58,14 @@ class marker_object(object):
         return '<{}>'.format(self.name)
 
 
+NOT_CACHED = marker_object('NOT_CACHED')
+
+
 class DictResourceMixin(dict):
 
+    def _aio_children(self):
+        return self.items()
+
     @asyncio.coroutine
     def resolve_local(self, name):
         try:
@@ -0,0 +1,199 @@
+import time
+import asyncio
+import logging
+import tracemalloc
+from collections import OrderedDict
+
+from .core import walk, LAZY_KIND
+from .http import BaseHTTPRequest
+from .signature import LazySignature
+
+
+log = logging.getLogger(__name__)
+
+
+class WarmupRequest(BaseHTTPRequest):
+    """GET request without headers and cookies used to replay urls"""
+
+    def __init__(self, uri, method='GET'):
+        self.method = method
+        self.uri = uri
+        self.content_type = None
+        self.cookie = ''
+        self.body = b''
+
+
+class Stats(object):
+    __slots__ = ('seconds', 'memory', 'count')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.memory = 0
+        self.count = 0
+
+
+class WarmupReport(object):
+    """Time and memory spent in each phase and each top-level subtree
+
+    Memory is the growth of memory allocated by python (as traced by
+    :mod:`tracemalloc`), it's zero when tracing is disabled. The ``count`` is
+    number of lazy subtrees loaded, signatures compiled, indexes built or
+    urls replayed. Urls which were not answered with 2xx or 3xx are in
+    ``failed`` as ``(url, status)`` pairs.
+    """
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.subtrees = OrderedDict()
+        self.failed = []
+
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = Stats()
+        return stats
+
+    def subtree(self, path):
+        name = '/' + (path[0] if path else '')
+        stats = self.subtrees.get(name)
+        if stats is None:
+            stats = self.subtrees[name] = Stats()
+        return stats
+
+    @property
+    def seconds(self):
+        return sum(stats.seconds for stats in self.phases.values())
+
+    @property
+    def memory(self):
+        return sum(stats.memory for stats in self.phases.values())
+
+    def format(self):
+        lines = ['{:24s} {:>10s} {:>10s} {:>6s}'.format(
+            'phase', 'ms', 'KiB', 'count')]
+        for title, items in (('', self.phases), ('subtree ', self.subtrees)):
+            for name, stats in items.items():
+                lines.append('{:24s} {:10.1f} {:10.1f} {:6d}'.format(
+                    title + name, stats.seconds * 1000,
+                    stats.memory / 1024, stats.count))
+        lines.append('{:24s} {:10.1f} {:10.1f}'.format(
+            'total', self.seconds * 1000, self.memory / 1024))
+        for url, status in self.failed:
+            lines.append('failed {} {}'.format(url, status))
+        return '\n'.join(lines)
+
+
+class _Meter(object):
+    """Adds time and memory spent in the block to all the stats given"""
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __call__(self, *stats):
+        self.stats = stats
+        return self
+
+    def __enter__(self):
+        if self.trace:
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        memory = 0
+        if self.trace:
+            memory = tracemalloc.get_traced_memory()[0] - self.memory
+        for stats in self.stats:
+            stats.seconds += seconds
+            stats.memory += memory
+            stats.count += 1
+
+
+def _walk_loaded(resources):
+    """Same as :func:`walk` but also yields resources of loaded subtrees"""
+    for path, res in walk(resources):
+        yield path, res
+        children = getattr(res, '_aio_children', None)
+        if children is None:
+            continue
+        for name, child in children():
+            if (getattr(child, '_aio_kind', None) is LAZY_KIND
+                    and child.value is not None):
+                for subpath, subres in _walk_loaded([child.value]):
+                    yield path + (name,) + subpath, subres
+
+
+def _load_lazy(resources, report, meter):
+    phase = report.phase('load')
+    for path, res in _walk_loaded(resources):
+        children = getattr(res, '_aio_children', None)
+        if children is None:
+            continue
+        for name, child in children():
+            if (getattr(child, '_aio_kind', None) is LAZY_KIND
+                    and child.value is None):
+                with meter(phase, report.subtree(path + (name,))):
+                    child.load()
+                # nested lazy subtrees are found by the generator
+
+
+def _compile_signatures(resources, report, meter):
+    phase = report.phase('signatures')
+    for path, res in _walk_loaded(resources):
+        children = getattr(res, '_aio_children', None)
+        if children is None:
+            continue
+        for name, child in children():
+            sig = getattr(child, '_aio_sig', None)
+            if isinstance(sig, LazySignature):
+                with meter(phase, report.subtree(path + (name,))):
+                    sig.compile()
+
+
+def _build_indexes(site, report, meter):
+    phase = report.phase('indexes')
+    with meter(phase):
+        site.reverser
+    for path, res in _walk_loaded(site.resources):
+        resolver = res.get_resolver_for_scope(site.site_scope)
+        warmup = getattr(resolver, 'warmup', None)
+        if warmup is not None:
+            with meter(phase, report.subtree(path)):
+                warmup(res, site.site_scope)
+
+
+@asyncio.coroutine
+def _replay(site, urls, report, meter):
+    phase = report.phase('replay')
+    for url in urls:
+        request = site.warmup_request(url) if isinstance(url, str) else url
+        path = tuple(request.path_segments[:1])
+        with meter(phase, report.subtree(path)):
+            status, _, body = yield from site.dispatch(request)
+            if hasattr(body, 'read'):  # StreamingBody
+                while (yield from body.read()):
+                    pass
+        code = int(str(status).split()[0])
+        if not 200 <= code < 400:
+            report.failed.append((getattr(request, 'uri', url), code))
+
+
+@asyncio.coroutine
+def warmup(site, urls=(), *, load_lazy=True, trace_memory=True):
+    report = WarmupReport()
+    trace = trace_memory and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    meter = _Meter(trace_memory)
+    try:
+        if load_lazy:
+            _load_lazy(site.resources, report, meter)
+        _compile_signatures(site.resources, report, meter)
+        _build_indexes(site, report, meter)
+        if urls:
+            yield from _replay(site, urls, report, meter)
+    finally:
+        if trace:
+            tracemalloc.stop()
+    log.info("Warmup finished in %.1f ms", report.seconds * 1000)
+    return report
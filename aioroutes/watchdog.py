@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import linecache
+import traceback
+from time import monotonic
+
+from .util import current_task
+
+
+log = logging.getLogger(__name__)
+
+
+class SlowRequest(object):
+    """Snapshot of the request which is taking too long
+
+    Note that snapshot is taken at the moment the threshold is exceeded, so
+    ``elapsed`` is roughly the threshold and request is still running.
+    """
+
+    def __init__(self, request, elapsed, resource_path, leaf, phases, stack,
+                 suppressed=0):
+        self.request = request
+        self.elapsed = elapsed
+        self.resource_path = resource_path
+        self.leaf = leaf
+        self.phases = phases
+        self.stack = stack
+        self.suppressed = suppressed
+
+    def __str__(self):
+        lines = ['Slow request {} {}: {:.3f}s elapsed'.format(
+            getattr(self.request, 'method', '-'),
+            getattr(self.request, 'uri', self.request),
+            self.elapsed)]
+        lines.append('  resources: {}'.format(
+            ' -> '.join(map(_describe, self.resource_path))))
+        lines.append('  leaf: {}'.format(_describe(self.leaf)))
+        lines.append('  phases: {}'.format(', '.join(
+            '{}={:.3f}s'.format(name, dur) for name, dur in self.phases)))
+        if self.suppressed:
+            lines.append('  ({} slow requests were not logged before this '
+                         'one because of rate limit)'.format(self.suppressed))
+        lines.append(self.stack.rstrip())
+        return '\n'.join(lines)
+
+
+def coroutine_stack(task, limit=None):
+    """Formats the stack of the suspended task down to innermost coroutine
+
+    Unlike ``Task.print_stack`` it follows the chain of ``yield from``, so
+    it shows where exactly the request is waiting.
+    """
+    coro = getattr(task, '_coro', None)
+    if coro is None:
+        coro = task.get_coro()
+    entries = []
+    while coro is not None:
+        frame = getattr(coro, 'gi_frame', None)
+        if frame is None:
+            frame = getattr(coro, 'cr_frame', None)
+        if frame is None:
+            break
+        code = frame.f_code
+        line = linecache.getline(code.co_filename, frame.f_lineno)
+        entries.append((code.co_filename, frame.f_lineno, code.co_name,
+                        line.strip()))
+        inner = getattr(coro, 'gi_yieldfrom', None)
+        if inner is None:
+            inner = getattr(coro, 'cr_await', None)
+        coro = inner
+    if limit is not None:
+        entries = entries[-limit:]
+    return ''.join(traceback.format_list(entries))
+
+
+def _describe(obj):
+    if obj is None:
+        return '-'
+    name = getattr(obj, '__qualname__', None)
+    if name is not None:
+        return name
+    return type(obj).__qualname__
+
+
+class SlowRequestWatchdog(object):
+    """Logs the requests which are running longer than ``threshold`` seconds
+
+    There is no tracing involved. The only per-request cost is a single timer
+    which is cancelled when request is done, so it's fine to leave it enabled
+    in production::
+
+        site = Site(resources=[Root()],
+                    watchdog=SlowRequestWatchdog(threshold=2.0))
+
+    When the timer fires we capture the stack of the task, resources
+    traversed so far, the leaf (if already found) and the time spent in each
+    phase of processing. At most ``max_records`` are logged per ``interval``
+    seconds, the rest are only counted.
+    """
+
+    def __init__(self, threshold=1.0, *, max_records=10, interval=60.0,
+                 stack_limit=20, logger=log):
+        self.threshold = threshold
+        self.max_records = max_records
+        self.interval = interval
+        self.stack_limit = stack_limit
+        self.log = logger
+        self.slow_count = 0
+        self.suppressed = 0
+        self._window_start = None
+        self._window_records = 0
+
+    def watch(self, ctx):
+        """Starts watching the current task, returns timer to cancel"""
+        loop = asyncio.get_event_loop()
+        task = current_task(loop=loop)
+        if task is None:
+            return None
+        return loop.call_later(self.threshold,
+            self._expired, ctx, task, monotonic())
+
+    def _expired(self, ctx, task, started):
+        self.slow_count += 1
+        now = monotonic()
+        if (self._window_start is None
+                or now - self._window_start >= self.interval):
+            self._window_start = now
+            self._window_records = 0
+        if self._window_records >= self.max_records:
+            self.suppressed += 1
+            return
+        self._window_records += 1
+        suppressed, self.suppressed = self.suppressed, 0
+        try:
+            self.report(self.snapshot(ctx, task, now - started, suppressed))
+        except Exception:
+            self.log.exception("Can't report slow request")
+
+    def snapshot(self, ctx, task, elapsed, suppressed=0):
+        now = monotonic()
+        phases = []
+        marks = ctx.phases
+        for i, (name, start) in enumerate(marks):
+            end = marks[i+1][1] if i+1 < len(marks) else now
+            phases.append((name, end - start))
+        return SlowRequest(ctx.request, elapsed, list(ctx.resource_path),
+            ctx.leaf, phases, coroutine_stack(task, self.stack_limit),
+            suppressed)
+
+    def report(self, record):
+        self.log.warning("%s", record)
@@ -0,0 +1,172 @@
+import json
+import asyncio
+import logging
+from operator import attrgetter
+from http.client import responses
+
+from .util import cached_property
+from .http import Site, split_target, split_path
+from .request import BaseRequest
+from .message import WEBSOCKET
+from .exceptions import BadRequest
+from .jsonify import default_encoder, JSON_CONTENT_TYPE
+
+
+log = logging.getLogger(__name__)
+
+
+class Message(BaseRequest):
+    """Single message received by the websocket connection
+
+    The message is a JSON object ``{"id": 1, "path": "/x", "args": {}}``,
+    the ``id`` is echoed back in the reply. Headers and cookies are the ones
+    of the HTTP request which opened the connection.
+    """
+
+    def __init__(self, connection, path, args, id=None):
+        self.connection = connection
+        self.uri = path
+        self.args = args
+        self.id = id
+
+    def set_uri(self, uri):
+        self.uri = uri
+        self.__dict__.pop('path_segments', None)
+
+    @cached_property
+    def path_segments(self):
+        return split_path(split_target(self.uri)[0])
+
+    @property
+    def headers(self):
+        return getattr(self.connection.request, 'headers', {})
+
+    @property
+    def cookies(self):
+        return self.connection.request.cookies
+
+    @property
+    def disconnected(self):
+        return getattr(self.connection.request, 'disconnected', None)
+
+    @property
+    def remote_addr(self):
+        return getattr(self.connection.request, 'remote_addr', None)
+
+    @classmethod
+    @asyncio.coroutine
+    def create(cls, resolver):
+        return resolver.request
+
+
+class MessageError(object):
+
+    def __init__(self, status):
+        self.status = status
+
+    def as_dict(self):
+        return {'status': self.status,
+                'message': responses.get(self.status, 'Error')}
+
+
+class Connection(object):
+    """State of the single websocket connection
+
+    Request scoped stickers are created once per connection (not per
+    message), so for example the current user is fetched only when
+    connection is opened.
+    """
+
+    def __init__(self, site, request=None):
+        self.site = site
+        self.request = request
+        self.stickers = {}
+        self.message_count = 0
+
+    @asyncio.coroutine
+    def handle(self, data):
+        """Dispatches the message and returns utf-8 encoded JSON reply"""
+        self.message_count += 1
+        try:
+            msg = self.parse(data)
+        except BadRequest as e:
+            error = yield from self.site.error_page(e)
+            return encode_reply(None, error)
+        result = yield from self.site.dispatch(msg)
+        try:
+            return encode_reply(msg.id, result)
+        except Exception:
+            log.exception("Can't encode reply to message %r", result)
+            return encode_reply(msg.id, MessageError(500))
+
+    def parse(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8', 'replace')
+        try:
+            obj = json.loads(data)
+        except ValueError:
+            raise BadRequest()
+        if not isinstance(obj, dict):
+            raise BadRequest()
+        path = obj.get('path')
+        args = obj.get('args') or {}
+        if (not isinstance(path, str) or not path.startswith('/')
+                or not isinstance(args, dict)):
+            raise BadRequest()
+        return Message(self, path, args, obj.get('id'))
+
+
+def encode_reply(id, result):
+    if isinstance(result, MessageError):
+        return default_encoder.encode({'id': id, 'error': result.as_dict()})
+    if (isinstance(result, (tuple, list)) and len(result) == 3
+            and isinstance(result[2], bytes)):
+        # http response produced by leaf serving both scopes
+        status, headers, body = result
+        if isinstance(headers, dict):
+            headers = headers.items()
+        ctype = dict((k.lower(), v) for k, v in headers).get('content-type')
+        if ctype and ctype.split(';')[0].strip() == JSON_CONTENT_TYPE:
+            return b''.join([b'{"id":', default_encoder.encode(id),
+                             b',"result":', body or b'null', b'}'])
+        result = body.decode('utf-8', 'replace')
+    elif isinstance(result, bytes):
+        result = result.decode('utf-8', 'replace')
+    return default_encoder.encode({'id': id, 'result': result})
+
+
+class MessageSite(Site):
+    """Site which routes websocket messages through the resource tree
+
+    Usually created with the same resources as the HTTP site. Only leaves
+    decorated with :func:`message` or :func:`page_and_message` are
+    reachable::
+
+        ws_site = MessageSite(resources=[Root()])
+        conn = ws_site.connect(http_request)
+        reply = yield from conn.handle(text)
+    """
+    site_scope = WEBSOCKET
+    keyword_arguments_factory = attrgetter('request.args')
+
+    def connect(self, request=None):
+        return Connection(self, request)
+
+    def _make_context(self, request):
+        ctx = super()._make_context(request)
+        ctx.stickers = request.connection.stickers
+        ctx.response_headers = None
+        return ctx
+
+    @asyncio.coroutine
+    def error_page(self, e):
+        status = e.default_response()[0]
+        return MessageError(int(str(status).split()[0]))
+
+    @asyncio.coroutine
+    def dispatch(self, msg):
+        result = yield from self._safe_dispatch(msg)
+        responsemeth = getattr(result, 'http_response', None)
+        if responsemeth is not None:
+            result = yield from self.make_response(result)
+        return result
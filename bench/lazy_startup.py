@@ -0,0 +1,116 @@
+"""Startup time of a large generated app with eager and lazy subtrees
+
+Generates a package with ``modules`` subtrees having ``pages`` leaves each
+and measures (in a fresh interpreter) the time to import the root and
+create the site, and the time of the first request to one subtree.
+
+Usage::
+
+    python bench/lazy_startup.py [modules] [pages]
+"""
+import os
+import sys
+import tempfile
+import textwrap
+import subprocess
+
+
+SUBTREE = '''
+import aioroutes as web
+
+class Sub{n}(web.Resource):
+{pages}
+'''
+
+PAGE = '''
+    @web.page
+    def page{i}(self, id: int, name: str = '', *, limit: int = 10):
+        return 'page{i}'
+'''
+
+ROOT_EAGER = '''
+import aioroutes as web
+{imports}
+
+class Root(web.Resource):
+{attrs}
+'''
+
+ROOT_LAZY = '''
+import aioroutes as web
+
+class Root(web.Resource):
+{attrs}
+'''
+
+MEASURE = '''
+import sys, time, asyncio
+start = time.perf_counter()
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+import {root} as app
+site = web.Site(resources=[app.Root()])
+startup = time.perf_counter() - start
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+loop = asyncio.new_event_loop()
+start = time.perf_counter()
+loop.run_until_complete(site._safe_dispatch(Request('/sub7/page3/1')))
+first = time.perf_counter() - start
+print('{{:.1f}} {{:.1f}} {{}}'.format(startup*1000, first*1000,
+    len(sys.modules)))
+'''
+
+
+def generate(base, modules, pages):
+    pkg = os.path.join(base, 'bigapp')
+    os.mkdir(pkg)
+    open(os.path.join(pkg, '__init__.py'), 'w').close()
+    for n in range(modules):
+        with open(os.path.join(pkg, 'sub{}.py'.format(n)), 'w') as f:
+            f.write(SUBTREE.format(n=n, pages=''.join(
+                PAGE.format(i=i) for i in range(pages))))
+    with open(os.path.join(pkg, 'eager.py'), 'w') as f:
+        f.write(ROOT_EAGER.format(
+            imports='\n'.join('from .sub{0} import Sub{0}'.format(n)
+                              for n in range(modules)),
+            attrs='\n'.join('    sub{0} = Sub{0}()'.format(n)
+                            for n in range(modules))))
+    with open(os.path.join(pkg, 'lazy.py'), 'w') as f:
+        f.write(ROOT_LAZY.format(
+            attrs='\n'.join(
+                "    sub{0} = web.LazyResource('bigapp.sub{0}:Sub{0}')"
+                .format(n) for n in range(modules))))
+
+
+def run(base, root, repeat=5):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [base, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+        + env.get('PYTHONPATH', '').split(os.pathsep))
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    results = []
+    for i in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c',
+            textwrap.dedent(MEASURE.format(root=root))], env=env)
+        results.append(tuple(map(float, out.split())))
+    return min(results)
+
+
+def main():
+    modules = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    pages = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    with tempfile.TemporaryDirectory() as base:
+        generate(base, modules, pages)
+        print('{} subtrees x {} pages'.format(modules, pages))
+        for name in ('eager', 'lazy'):
+            startup, first, nmod = run(base, 'bigapp.' + name)
+            print('{:6s} startup {:8.1f} ms, first request {:6.1f} ms, '
+                  '{:.0f} modules'.format(name, startup, first, nmod))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Throughput and latency of a small site under concurrent load
+
+Runs :func:`aioroutes.testing.load` with the in-process client and (when
+aiohttp is installed) with the loopback client, and prints the reports.
+Leaves cover the usual shapes: a plain page, path and query arguments, a
+method-dispatched resource and a leaf waiting for "database" for 1 ms.
+
+Usage::
+
+    python bench/load.py [requests] [concurrency]
+"""
+import sys
+import asyncio
+
+import aioroutes as web
+from aioroutes.testing import Client, LoopbackClient, load
+
+
+class Item(web.Resource):
+    http_resolver = web.MethodResolver()
+
+    @web.page
+    def GET(self, id: int):
+        return 'item:{}'.format(id)
+
+
+class Forum(web.Resource):
+
+    @web.page
+    def topic(self, id: int, *, page: int = 1):
+        return 'topic:{}:{}'.format(id, page)
+
+
+class Root(web.Resource):
+    forum = Forum()
+    item = Item()
+
+    @web.page
+    def index(self):
+        return 'home'
+
+    @web.page
+    def query(self):
+        yield from asyncio.sleep(0.001)
+        return 'result'
+
+
+TARGETS = ['/', '/forum/topic/123?page=2', '/item?id=5', '/query']
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    site = web.Site(resources=[Root()])
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    clients = [('in process', Client(site))]
+    try:
+        import aiohttp.server  # noqa
+    except ImportError:
+        print('aiohttp is not installed, skipping loopback')
+    else:
+        clients.append(('loopback', LoopbackClient(site)))
+    for name, client in clients:
+        try:
+            report = loop.run_until_complete(load(client, TARGETS,
+                concurrency=concurrency, requests=requests))
+        finally:
+            loop.run_until_complete(client.close())
+        print('==', name)
+        print(report.format())
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Cost of the rate limit check and its memory under key spraying
+
+Compares ``RateLimit.take`` for a few known clients and for a stream of
+unique keys (every request evicts a bucket), then reports memory used by
+the table after the spraying, which doesn't depend on the number of keys.
+
+Usage::
+
+    python bench/rate_limit.py [number]
+"""
+import sys
+import time
+import tracemalloc
+
+from aioroutes import RateLimit
+
+
+def bench(name, limit, keys):
+    take = limit.take
+    start = time.perf_counter()
+    for key in keys:
+        take(key)
+    elapsed = time.perf_counter() - start
+    print('{:16s} {:6.3f} us/check, {} evicted'.format(
+        name, elapsed / len(keys) * 1e6, limit.evicted_count))
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    clients = ['10.0.{}.{}'.format(i // 256, i % 256) for i in range(100)]
+    bench('known clients', RateLimit(1e9), clients * (number // 100))
+    spray = ['10.{}.{}.{}'.format(i >> 16, (i >> 8) & 255, i & 255)
+             for i in range(number)]
+    bench('unique keys', RateLimit(10, size=65536), spray)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    limit = RateLimit(10, size=65536)
+    table = tracemalloc.get_traced_memory()[0] - before
+    for key in spray:
+        limit.take(key)
+    after = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print('table of {} buckets: {:.0f} KiB, after {} keys: {:.0f} KiB'.format(
+        len(limit._keys), table / 1024, number, after / 1024))
+
+
+if __name__ == '__main__':
+    main()
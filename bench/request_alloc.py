@@ -0,0 +1,95 @@
+"""Memory and time per request object, dict-based vs compact requests
+
+Each request is created from the raw headers of a typical browser request,
+then path, query arguments and cookies are accessed (like routing and a
+leaf would do). Reports the memory blocks and bytes held by the request
+(objects are kept alive to measure them) and the time per request.
+
+The ``dict-based`` request reproduces the former aiohttp adapter, which
+got headers already decoded into the mapping by the server.
+
+Usage::
+
+    python bench/request_alloc.py [number]
+"""
+import sys
+import time
+import tracemalloc
+
+from aioroutes.http import BaseHTTPRequest, CompactHTTPRequest
+
+
+RAW_HEADERS = [
+    (b'Host', b'example.com'),
+    (b'User-Agent', b'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) '
+                    b'Gecko/20100101 Firefox/115.0'),
+    (b'Accept', b'text/html,application/xhtml+xml,application/xml;q=0.9,'
+                b'*/*;q=0.8'),
+    (b'Accept-Language', b'en-US,en;q=0.5'),
+    (b'Accept-Encoding', b'gzip, deflate, br'),
+    (b'Connection', b'keep-alive'),
+    (b'Cookie', b'session=0123456789abcdef; theme=dark'),
+    (b'Upgrade-Insecure-Requests', b'1'),
+    (b'Cache-Control', b'max-age=0'),
+]
+URI = '/forum/topic/12345?page=2'
+
+
+class DictRequest(BaseHTTPRequest):
+
+    def __init__(self, method, uri, raw_headers):
+        headers = {name.decode('latin-1').upper(): value.decode('latin-1')
+                   for name, value in raw_headers}
+        self.method = method
+        self.uri = uri
+        self.content_type = headers.get('CONTENT-TYPE')
+        self.headers = headers
+        self.cookie = headers.get('COOKIE', '')
+
+
+def touch(req):
+    req.path_segments
+    req.form_arguments.get('page')
+    req.cookies.get('session')
+
+
+def measure(name, make, number):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    blocks = sys.getallocatedblocks()
+    kept = []
+    for i in range(number):
+        req = make()
+        touch(req)
+        kept.append(req)
+    blocks = sys.getallocatedblocks() - blocks
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    # time without tracemalloc overhead, best of several runs
+    elapsed = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(number):
+            touch(make())
+        elapsed = min(elapsed, time.perf_counter() - start)
+    print('{:16s} {:6.1f} blocks {:7.0f} bytes {:6.2f} us per request'.format(
+        name, blocks / number, size / number, elapsed / number * 1e6))
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    measure('dict-based', lambda: DictRequest('GET', URI, RAW_HEADERS),
+            number)
+    measure('compact', lambda: CompactHTTPRequest('GET', URI, RAW_HEADERS),
+            number)
+    recycled = CompactHTTPRequest('GET', URI, RAW_HEADERS)
+
+    def reuse():
+        recycled.reset('GET', URI, RAW_HEADERS)
+        return recycled
+    measure('compact recycled', reuse, number)
+
+
+if __name__ == '__main__':
+    main()
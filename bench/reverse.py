@@ -0,0 +1,51 @@
+"""Cost of building urls with Site.url_for compared to formatting by hand
+
+Usage::
+
+    python bench/reverse.py [number]
+"""
+import sys
+from timeit import timeit
+
+import aioroutes as web
+
+
+class Forum(web.Resource):
+
+    @web.page
+    def topic(self, id: int, slug: str = '', *, page: int = 1):
+        return 'topic'
+
+
+class Root(web.Resource):
+    forum = Forum()
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    root = Root()
+    site = web.Site(resources=[root])
+    build = site.url_builder(root.forum.topic)
+    url_for = site.url_for
+    topic = root.forum.topic
+    cases = [
+        ('str.format', lambda: '/forum/topic/{}'.format(12345)),
+        ('url_builder', lambda: build(12345)),
+        ('url_for', lambda: url_for(topic, 12345)),
+        ('url_for (path)', lambda: url_for('/forum/topic', 12345)),
+        ('url_builder + query', lambda: build(12345, page=2)),
+    ]
+    try:
+        fstring = eval("lambda id: f'/forum/topic/{id}'")
+    except SyntaxError:  # python < 3.6
+        pass
+    else:
+        cases.insert(0, ('f-string', lambda: fstring(12345)))
+    assert len(set(fun() for name, fun in cases[:-1])) == 1
+    for name, fun in cases:
+        t = timeit(fun, number=number)
+        print('{:20s} {:6.3f} us/url'.format(name, t / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
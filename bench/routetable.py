@@ -0,0 +1,73 @@
+"""Memory and lookup latency of RouteTable compared to a plain dict
+
+Usage::
+
+    python bench/routetable.py [number-of-keys]
+"""
+import os
+import sys
+import random
+import tempfile
+import tracemalloc
+from timeit import timeit
+
+from aioroutes.routetable import RouteTable
+
+
+def make_items(n):
+    rnd = random.Random(0)
+    for i in range(n):
+        slug = '{}-{:x}'.format(
+            '-'.join(rnd.choice(WORDS) for _ in range(3)), i)
+        yield slug, str(i)
+
+
+WORDS = ['news', 'page', 'about', 'how', 'to', 'best', 'guide', 'review',
+         'python', 'asyncio', 'routing', 'cheap', 'fast', 'new', 'old']
+
+
+def measure(fun):
+    tracemalloc.start()
+    try:
+        result = fun()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    items = list(make_items(n))
+    keys = [k for k, v in random.Random(1).sample(items, 10000)]
+    missing = [k + '-x' for k in keys]
+
+    mapping, dict_size = measure(lambda: dict(make_items(n)))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.tbl')
+        RouteTable.write(path, items)
+        file_size = os.path.getsize(path)
+        table, table_size = measure(lambda: RouteTable.open(path))
+        del items
+
+        print('{} keys'.format(n))
+        print('dict:  {:8.1f} bytes/entry on heap'.format(dict_size / n))
+        print('table: {:8.1f} bytes/entry on heap, {:.1f} bytes/entry in '
+              'shared file'.format(table_size / n, file_size / n))
+
+        number = 10
+        for name, fun in [
+                ('dict get', lambda: [mapping.get(k) for k in keys]),
+                ('table get', lambda: [table.get(k) for k in keys]),
+                ('table get missing', lambda: [table.get(k)
+                                               for k in missing]),
+                ('table longest_match', lambda: [table.longest_match(k)
+                                                 for k in missing]),
+                ]:
+            t = timeit(fun, number=number)
+            print('{:20s} {:6.2f} us/lookup'.format(
+                name, t / number / len(keys) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
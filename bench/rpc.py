@@ -0,0 +1,133 @@
+"""Throughput of the same endpoint called over RPC and over HTTP
+
+Measures calls per second and latency of a ``page_and_procedure`` leaf:
+
+* ``http dispatch`` -- ``Site.dispatch`` in process (no network at all,
+  lower bound of the HTTP stack cost)
+* ``http loopback`` -- keep-alive HTTP/1.1 requests to ``HttpProto`` over
+  loopback, ``concurrency`` connections (only when aiohttp is installed)
+* ``rpc loopback`` -- ``RpcClient`` calls to ``RpcSite`` over loopback with
+  ``concurrency`` calls in flight over ``pool`` connections
+
+Usage::
+
+    python bench/rpc.py [calls] [concurrency] [pool]
+"""
+import sys
+import time
+import asyncio
+from functools import partial
+
+import aioroutes as web
+from aioroutes.http import BaseHTTPRequest
+from aioroutes.jsonify import jsonify
+from aioroutes.rpc import RpcSite, RpcClient
+
+
+class Users(web.Resource):
+
+    @web.page_and_procedure
+    @jsonify
+    def get(self, id: int, *, full: bool = False):
+        return {'id': id, 'name': 'user{}'.format(id), 'full': full}
+
+
+class Root(web.Resource):
+    users = Users()
+
+
+class Request(BaseHTTPRequest):
+    def __init__(self, uri):
+        self.uri = uri
+
+
+@asyncio.coroutine
+def bench_dispatch(site, calls):
+    for i in range(calls):
+        yield from site.dispatch(Request('/users/get/{}?full=1'.format(i)))
+
+
+@asyncio.coroutine
+def bench_rpc(rpc_site, calls, concurrency, pool):
+    server = yield from rpc_site.serve('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    client = RpcClient('127.0.0.1', port, pool_size=pool)
+    numbers = iter(range(calls))
+
+    @asyncio.coroutine
+    def worker():
+        for i in numbers:
+            yield from client.call('/users/get', id=i, full=True)
+    try:
+        yield from asyncio.gather(*[worker() for _ in range(concurrency)])
+    finally:
+        client.close()
+        server.close()
+        yield from server.wait_closed()
+        yield from asyncio.sleep(0.01)  # let connections finish
+
+
+@asyncio.coroutine
+def bench_http(site, calls, concurrency):
+    from aioroutes.aiohttp import HttpProto
+    server = yield from asyncio.get_event_loop().create_server(
+        partial(HttpProto, site), '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    numbers = iter(range(calls))
+
+    @asyncio.coroutine
+    def worker():
+        reader, writer = yield from asyncio.open_connection('127.0.0.1', port)
+        try:
+            for i in numbers:
+                writer.write('GET /users/get/{}?full=1 HTTP/1.1\r\n'
+                             'Host: localhost\r\n\r\n'.format(i)
+                             .encode('ascii'))
+                head = yield from reader.readuntil(b'\r\n\r\n')
+                for line in head.split(b'\r\n'):
+                    if line.lower().startswith(b'content-length:'):
+                        yield from reader.readexactly(
+                            int(line.split(b':')[1]))
+        finally:
+            writer.close()
+    try:
+        yield from asyncio.gather(*[worker() for _ in range(concurrency)])
+    finally:
+        server.close()
+        yield from server.wait_closed()
+        yield from asyncio.sleep(0.01)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    pool = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    resources = [Root()]
+    site = web.Site(resources=resources)
+    rpc_site = RpcSite(resources=resources)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    cases = [
+        ('http dispatch', bench_dispatch(site, calls)),
+        ('rpc loopback', bench_rpc(rpc_site, calls, concurrency, pool)),
+    ]
+    try:
+        import aiohttp.server  # noqa
+    except ImportError:
+        print('aiohttp is not installed, skipping http loopback')
+    else:
+        cases.insert(1, ('http loopback',
+                         bench_http(site, calls, concurrency)))
+    print('{} calls, {} in flight, {} rpc connections'.format(
+        calls, concurrency, pool))
+    for name, coro in cases:
+        start = time.perf_counter()
+        loop.run_until_complete(coro)
+        elapsed = time.perf_counter() - start
+        print('{:14s} {:9.0f} calls/s {:8.1f} us/call'.format(
+            name, calls / elapsed, elapsed / calls * 1e6))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
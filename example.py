@@ -14,9 +14,7 @@ class Child(route.Resource):
     def page2(self):
         return 'page2'
 
-    @route.page
-    def index(self):
-        raise route.PathRewrite('/child/page1')
+    index = route.alias('page1')
 
 
 class Root(route.Resource):